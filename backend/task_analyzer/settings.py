@@ -29,15 +29,28 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "tasks.guard.RequestGuardMiddleware",
 ]
 
 ROOT_URLCONF = "task_analyzer.urls"
 
+# Connections are kept for CONN_MAX_AGE seconds instead of reopened per
+# request. "replica" is a second, query-only connection to the same file
+# that serves ranking reads; under WAL it never waits on a writer.
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+        "CONN_MAX_AGE": 60,
+        "CONN_HEALTH_CHECKS": True,
+    },
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.sqlite3",
+        "CONN_MAX_AGE": 60,
+        "CONN_HEALTH_CHECKS": True,
+        "TEST": {"MIRROR": "default"},
+    },
 }
 
 LANGUAGE_CODE = "en-us"
@@ -50,6 +63,125 @@ USE_TZ = True
 
 STATIC_URL = "/static/"
 
+# Analyze payloads carry whole backlogs; 100k tasks is roughly 15 MB of JSON
+DATA_UPLOAD_MAX_MEMORY_SIZE = 64 * 1024 * 1024
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Score cache, one entry per analyzed batch; swap in FileBasedCache to
+    # share it between processes
+    "scores": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "task-scores",
+        "OPTIONS": {"MAX_ENTRIES": 300},
+    },
+}
+
+# Cache alias used for task scores, or None to always rescore
+TASK_SCORE_CACHE = "scores"
+
+# Extra strategy profiles, compiled at startup next to the built-in ones.
+# Example:
+# TASK_STRATEGIES = {
+#     "crunch_time": {
+#         "weights": {"urgency": 0.7, "importance": 0.2, "effort": 0.1},
+#         "urgency": {"breakpoints": [[0, 100], [2, 85], [5, 60]], "later": 20},
+#         "effort": {"breakpoints": [[1, 100], [8, 20]]},
+#     },
+#     # Continuous urgency instead of steps, so due dates a week and a
+#     # year out no longer tie; also "logistic" with midpoint/steepness
+#     "smooth_deadlines": {
+#         "weights": {"urgency": 0.4, "importance": 0.3, "effort": 0.2},
+#         "urgency": {"curve": "exponential", "half_life": 14, "floor": 10},
+#     },
+# }
+TASK_STRATEGIES = {}
+
+# Per-stage timings for analyze/suggest: Server-Timing header, ?debug=1
+# block and histograms at /api/tasks/metrics/. Off costs one settings check.
+TASK_INSTRUMENTATION = True
+
+# Async analyze (/api/tasks/analyze/async/) scores batches of at least
+# TASK_POOL_MIN_TASKS tasks in a process pool, TASK_POOL_CHUNK_SIZE tasks
+# per job; None disables the pool. Workers default to one per CPU.
+TASK_POOL_MIN_TASKS = 50000
+TASK_POOL_CHUNK_SIZE = 20000
+TASK_POOL_WORKERS = None
+
+# Background analysis jobs (/api/tasks/jobs/): worker threads (0 runs
+# jobs inside the request), tasks ranked per progress step and how many
+# of the best tasks so far a running job reports.
+TASK_JOB_WORKERS = 2
+TASK_JOB_CHUNK_SIZE = 10000
+TASK_JOB_PARTIAL_SIZE = 10
+# Jobs without a worker heartbeat for TASK_JOB_TIMEOUT seconds (lost in a
+# restart) are failed; finished jobs and their results are deleted
+# TASK_JOB_RETENTION seconds after finishing, or kept with None.
+TASK_JOB_TIMEOUT = 600
+TASK_JOB_RETENTION = 24 * 60 * 60
+
+# Day/week planner (/api/tasks/schedule/): hours are budgeted in steps of
+# TASK_PLAN_RESOLUTION hours; after TASK_PLAN_TIME_LIMIT seconds the exact
+# knapsack gives way to a greedy fill.
+TASK_PLAN_RESOLUTION = 0.25
+TASK_PLAN_TIME_LIMIT = 0.5
+
+# Ranking sessions (/api/tasks/rankings/) live in this process's memory;
+# idle ones expire after the TTL in seconds, the oldest beyond the limit.
+TASK_RANKING_SESSION_TTL = 3600
+TASK_RANKING_SESSION_LIMIT = 1000
+
+# Large JSON responses are gzip or deflate compressed when the client
+# accepts it; bodies under TASK_COMPRESS_MIN_BYTES go out as they are.
+# orjson encodes responses when installed, the stdlib json otherwise.
+TASK_COMPRESS_MIN_BYTES = 16384
+TASK_COMPRESS_LEVEL = 3
+
+# Paged analyze requests (page_size or cursor) keep the scores of the last
+# TASK_RANKING_CACHE_SIZE rankings in memory, so deeper pages are sliced
+# from them instead of rescoring; TASK_PAGE_SIZE is the default page.
+TASK_RANKING_CACHE_SIZE = 8
+TASK_PAGE_SIZE = 100
+
+# Stored tasks (/api/tasks/) belong to the signed-in user. The X-Task-Owner
+# header is only honoured from the reverse proxy addresses listed in
+# TASK_OWNER_HEADER_PROXIES, which must authenticate users and strip the
+# header from client requests. Imports and rescoring write rows in batches
+# of TASK_IMPORT_BATCH_SIZE.
+TASK_OWNER_HEADER_PROXIES = []
+TASK_IMPORT_BATCH_SIZE = 1000
+
+# PRAGMAs run on every new SQLite connection (see tasks/db.py); {} keeps
+# SQLite's defaults. Ranking reads go to TASK_READ_DATABASE, or to
+# "default" when it is None.
+TASK_SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 5000,
+    "mmap_size": 128 * 1024 * 1024,
+}
+TASK_READ_DATABASE = "replica"
+
+# Tasks API guards (tasks/guard.py). Each client, the signed-in user or
+# else the remote address, may make TASK_RATE_LIMIT requests per second
+# in bursts of up to TASK_RATE_LIMIT_BURST before getting 429; None turns
+# the limit off. Buckets live in process memory unless
+# TASK_RATE_LIMIT_STORE names a SQLite file every server process shares.
+TASK_RATE_LIMIT = 100
+TASK_RATE_LIMIT_BURST = 400
+TASK_RATE_LIMIT_STORE = None
+
+# Bodies over TASK_MAX_BODY_BYTES or with more than TASK_MAX_TASKS tasks
+# get 413, checked before JSON is parsed (NDJSON as it streams); JSON
+# nested deeper than TASK_MAX_JSON_DEPTH is refused.
+TASK_MAX_BODY_BYTES = 32 * 1024 * 1024
+TASK_MAX_TASKS = 200000
+TASK_MAX_JSON_DEPTH = 32
+
+ASGI_APPLICATION = "task_analyzer.asgi.application"
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 TEMPLATES = [
@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class TasksConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "tasks"
+
+    def ready(self):
+        # Compile every strategy profile once, failing fast on invalid ones
+        from .strategies import load_strategies
+        load_strategies()
+
+        from django.db.backends.signals import connection_created
+        from .db import configure_connection
+        connection_created.connect(configure_connection, dispatch_uid="tasks.sqlite_pragmas")
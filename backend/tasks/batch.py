@@ -0,0 +1,123 @@
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, fall back to plain Python loops
+    np = None
+
+from .validation import as_records
+
+
+class TaskColumns:
+    """Column-oriented view of a task list for scoring a whole batch at once.
+
+    Built from validated ``TaskRecord``s, whose due dates are already
+    ordinals, so ``today`` is read once per batch and each column is a
+    single list comprehension. Plain task dicts are validated first.
+    """
+
+    def __init__(self, tasks, today=None, multipliers=None):
+        records = as_records(tasks)
+        today = (today or date.today()).toordinal()
+
+        # Cycle-aware multipliers from a DependencyIndex, when one was built
+        self.multipliers = multipliers
+
+        self.size = len(records)
+        self.has_due_date = [r.due is not None for r in records]
+        self.days = [r.due - today if r.due is not None else 0 for r in records]
+        self.importance = [r.importance for r in records]
+        self.hours = [r.hours for r in records]
+        self.dependency_count = [len(r.dependencies) for r in records]
+
+    def slice(self, start, stop):
+        """Columns for tasks ``start`` to ``stop``, e.g. to score in another process"""
+        part = TaskColumns.__new__(TaskColumns)
+        part.size = len(self.days[start:stop])
+        part.multipliers = None if self.multipliers is None else self.multipliers[start:stop]
+        for name in ('has_due_date', 'days', 'importance', 'hours', 'dependency_count'):
+            setattr(part, name, getattr(self, name)[start:stop])
+        return part
+
+    def explanation_fields(self, position):
+        """Arguments for ``describe_score`` for the task at ``position``"""
+        return (self.days[position] if self.has_due_date[position] else None,
+                self.importance[position],
+                self.hours[position],
+                self.dependency_count[position])
+
+    def components(self, strategy):
+        """Return the (urgency, importance, effort, dependency) columns"""
+        if np is None:
+            return self._components_python(strategy)
+
+        days = np.asarray(self.days, dtype=np.int64)
+        has_due = np.asarray(self.has_due_date, dtype=bool)
+        urgency = strategy.urgency_curve.evaluate(days)
+        urgency = np.where(days < 0, strategy.overdue, urgency)
+        urgency = np.where(has_due, urgency, strategy.no_due_date)
+
+        importance = strategy.importance.evaluate(self.importance)
+        effort = strategy.effort.evaluate(self.hours)
+
+        if self.multipliers is not None:
+            dependency = np.asarray(self.multipliers, dtype=np.float64)
+        else:
+            count = np.asarray(self.dependency_count, dtype=np.int64)
+            dependency = np.where(count == 0, 1.0, np.where(count == 1, 1.2, 1.5))
+
+        return urgency, importance, effort, dependency
+
+    def _components_python(self, strategy):
+        urgency_of = strategy.urgency
+        urgency = [urgency_of(days if has_due else None)
+                   for has_due, days in zip(self.has_due_date, self.days)]
+        importance = list(map(strategy.importance, self.importance))
+        effort = list(map(strategy.effort, self.hours))
+
+        if self.multipliers is not None:
+            dependency = self.multipliers
+        else:
+            dependency = [1.0 if c == 0 else 1.2 if c == 1 else 1.5
+                          for c in self.dependency_count]
+
+        return urgency, importance, effort, dependency
+
+    def priority_scores(self, strategy):
+        """Weighted final score for every task under a compiled strategy"""
+        return self.priority_score_matrix([strategy])[0]
+
+    def priority_score_matrix(self, strategies):
+        """Scores for several strategies, one components pass per distinct curve set.
+
+        Returns one score list per strategy. The components are projected
+        onto all weight vectors at once (an n x 3 by 3 x S product written
+        out term by term), keeping the operation order of
+        ``calculate_priority_score`` so every path produces the same
+        floats. The final ``round`` stays in Python because
+        ``numpy.round`` rounds halves differently.
+        """
+        groups = {}
+        for position, strategy in enumerate(strategies):
+            groups.setdefault(strategy.curves, []).append(position)
+
+        results = [None] * len(strategies)
+        for positions in groups.values():
+            group = [strategies[p] for p in positions]
+            urgency, importance, effort, dependency = self.components(group[0])
+
+            if np is None:
+                for p, strategy in zip(positions, group):
+                    score = strategy.score
+                    results[p] = list(map(score, urgency, importance, effort, dependency))
+                continue
+
+            matrix = np.array([[s.weights["urgency"] for s in group],
+                               [s.weights["importance"] for s in group],
+                               [s.weights["effort"] for s in group]], dtype=np.float64)
+            raw = (urgency[:, None] * matrix[0] +
+                   importance[:, None] * matrix[1] +
+                   effort[:, None] * matrix[2]) * dependency[:, None]
+            for p, column in zip(positions, raw.T.tolist()):
+                results[p] = [min(100, round(score, 2)) for score in column]
+        return results
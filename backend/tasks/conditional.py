@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotModified
+from django.utils.cache import parse_etags, patch_cache_control, quote_etag
+
+from .cache import seconds_until_rollover
+from .scoring import SCORING_VERSION
+from .serializers import accepted_encoding
+from .strategies import registry
+from .streaming import NDJSON_CONTENT_TYPE
+
+
+def request_etag(request, today=None):
+    """Strong ETag for a request's ranking.
+
+    Hashes everything the response depends on: the exact body and query
+    string, the scoring date, ``SCORING_VERSION``, the compiled
+    strategies and the content coding the response would be sent with.
+    The body is hashed as sent, so a client resending the same payload
+    matches without it being decoded; equivalent JSON with different
+    formatting simply gets its own tag.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (str(SCORING_VERSION), (today or date.today()).isoformat(),
+                 registry.fingerprint(), request.method, request.content_type or "",
+                 request.META.get("QUERY_STRING", ""), accepted_encoding(request) or ""):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    if request.method == "POST":
+        digest.update(request.body)
+    return quote_etag(digest.hexdigest())
+
+
+def _not_modified(request, etag):
+    header = request.META.get("HTTP_IF_NONE_MATCH")
+    if not header:
+        return False
+    etags = [tag.removeprefix("W/") for tag in parse_etags(header)]
+    return etags == ["*"] or etag in etags
+
+
+def _tag(response, etag, cache_until_midnight):
+    if response.status_code == 200 and not response.streaming:
+        response["ETag"] = etag
+        if cache_until_midnight:
+            patch_cache_control(response, max_age=seconds_until_rollover())
+    return response
+
+
+def conditional(cache_until_midnight=False):
+    """Answer ``If-None-Match`` with 304 before the view decodes or scores anything.
+
+    Successful responses carry the request's ETag; with
+    ``cache_until_midnight`` they may also be cached until the date rolls
+    over, when every urgency score can change. Tagging POST bodies, and
+    answering them with 304, serves clients that post the same analyze
+    request repeatedly. NDJSON streams are passed straight through, and so
+    are ``?debug=1`` requests, whose timings differ on every response.
+    """
+    def decorator(view):
+        def check(request):
+            if (request.method not in ("GET", "HEAD", "POST") or
+                    request.content_type == NDJSON_CONTENT_TYPE or
+                    request.GET.get("debug") == "1"):
+                return None, None
+            etag = request_etag(request)
+            if _not_modified(request, etag):
+                response = HttpResponseNotModified()
+                response["ETag"] = etag
+                if cache_until_midnight:
+                    patch_cache_control(response, max_age=seconds_until_rollover())
+                return etag, response
+            return etag, None
+
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # Hashing a large body would block the event loop
+                etag, response = await sync_to_async(check, thread_sensitive=False)(request)
+                if response is not None:
+                    return response
+                response = await view(request, *args, **kwargs)
+                return _tag(response, etag, cache_until_midnight) if etag else response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag, response = check(request)
+            if response is not None:
+                return response
+            response = view(request, *args, **kwargs)
+            return _tag(response, etag, cache_until_midnight) if etag else response
+        return wrapper
+    return decorator
@@ -0,0 +1,64 @@
+from bisect import bisect_left
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, fall back to bisect
+    np = None
+
+
+class PiecewiseLinear:
+    """A curve through ``(x, y)`` breakpoints: linear between them, flat outside.
+
+    Segments are found with ``bisect`` for single values and with
+    ``numpy.searchsorted`` for whole columns, and both evaluate the same
+    expression as ``calculate_effort_score``, so every path yields the
+    same floats. Curves over consecutive whole numbers (day tables,
+    importance levels) read whole-number inputs straight from ``ys``.
+    """
+
+    def __init__(self, xs, ys):
+        self.xs = list(xs)
+        self.ys = list(ys)
+        if not self.xs or len(self.xs) != len(self.ys):
+            raise ValueError("A curve needs as many scores as breakpoints, at least one")
+        if any(b <= a for a, b in zip(self.xs, self.xs[1:])):
+            raise ValueError("Curve breakpoints must be strictly increasing")
+        self.low, self.high = self.xs[0], self.xs[-1]
+        self.first, self.final = self.ys[0], self.ys[-1]
+        self.unit = (isinstance(self.low, int) and
+                     self.xs == list(range(self.low, self.low + len(self.xs))))
+        self.segments = list(zip(self.xs, self.xs[1:], self.ys, self.ys[1:]))
+
+    def __call__(self, x):
+        if x <= self.low:
+            return self.first
+        if x >= self.high:
+            return self.final
+        if self.unit and type(x) is int:
+            return self.ys[x - self.low]
+        x0, x1, y0, y1 = self.segments[bisect_left(self.xs, x) - 1]
+        return y0 - ((x - x0) / (x1 - x0) * (y0 - y1))
+
+    def evaluate(self, values):
+        """The curve at every value: a float array with NumPy, a list without"""
+        if np is None:
+            return list(map(self, values))
+
+        values = np.asarray(values)
+        ys = np.asarray(self.ys, dtype=np.float64)
+        if self.unit and values.dtype.kind in "iu":
+            return ys[np.clip(values, self.low, self.high) - self.low]
+
+        xs = np.asarray(self.xs, dtype=np.float64)
+        values = np.clip(values.astype(np.float64), xs[0], xs[-1])
+        if len(xs) == 1:
+            return np.full(len(values), ys[0])
+        segment = np.clip(np.searchsorted(xs, values, side="left") - 1, 0, len(xs) - 2)
+        x0, x1 = xs[segment], xs[segment + 1]
+        y0, y1 = ys[segment], ys[segment + 1]
+        curve = y0 - ((values - x0) / (x1 - x0) * (y0 - y1))
+        # The last breakpoint's score exactly, as the scalar path returns it
+        return np.where(values >= xs[-1], ys[-1], curve)
+
+    def points(self):
+        return [[x, y] for x, y in zip(self.xs, self.ys)]
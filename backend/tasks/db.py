@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import transaction
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 5000,
+    "mmap_size": 128 * 1024 * 1024,
+}
+
+
+def sqlite_pragmas():
+    pragmas = getattr(settings, "TASK_SQLITE_PRAGMAS", DEFAULT_PRAGMAS)
+    return pragmas or {}
+
+
+def apply_pragmas(cursor, pragmas):
+    """Run ``PRAGMA name = value`` for each entry on a DB-API cursor"""
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def read_alias():
+    """Database alias for read-only ranking queries.
+
+    ``TASK_READ_DATABASE`` when configured, except inside a transaction on
+    the default database: a separate connection would not see its
+    uncommitted writes.
+    """
+    alias = getattr(settings, "TASK_READ_DATABASE", None)
+    if alias is None or transaction.get_connection().in_atomic_block:
+        return "default"
+    return alias
+
+
+def configure_connection(sender, connection, **kwargs):
+    """``connection_created`` hook tuning every new SQLite connection.
+
+    WAL lets readers run alongside a writer, ``synchronous=normal`` is
+    durable enough under WAL with one fsync per checkpoint, and the busy
+    timeout makes a writer wait for the lock instead of failing with
+    "database is locked". The read connection is also made query-only.
+    The journal mode is stored in the database file itself, which is why
+    ``db.sqlite3`` is not tracked.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, sqlite_pragmas())
+        if connection.alias == getattr(settings, "TASK_READ_DATABASE", None):
+            cursor.execute("PRAGMA query_only = 1")
+
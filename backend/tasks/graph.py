@@ -0,0 +1,165 @@
+def build_adjacency(dependency_lists):
+    """Dependency edges by position; ids are 1-based like the API's dependency lists"""
+    size = len(dependency_lists)
+    adjacency = []
+    for dependencies in dependency_lists:
+        edges = []
+        seen = set()
+        for dep in dependencies:
+            # Ignore references that do not point at a task in this batch
+            if isinstance(dep, bool) or not isinstance(dep, int) or not 1 <= dep <= size:
+                continue
+            if dep not in seen:
+                seen.add(dep)
+                edges.append(dep - 1)
+        adjacency.append(edges)
+    return adjacency
+
+def strongly_connected_components(adjacency):
+    """Iterative Tarjan SCC; components come out in reverse topological order"""
+    size = len(adjacency)
+    order = [-1] * size
+    low = [0] * size
+    on_stack = [False] * size
+    stack = []
+    components = []
+    counter = 0
+
+    for root in range(size):
+        if order[root] != -1:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, 0)]
+
+        while work:
+            node, edge = work[-1]
+            edges = adjacency[node]
+            if edge < len(edges):
+                work[-1] = (node, edge + 1)
+                nxt = edges[edge]
+                if order[nxt] == -1:
+                    order[nxt] = low[nxt] = counter
+                    counter += 1
+                    stack.append(nxt)
+                    on_stack[nxt] = True
+                    work.append((nxt, 0))
+                elif on_stack[nxt] and order[nxt] < low[node]:
+                    low[node] = order[nxt]
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[node] < low[parent]:
+                    low[parent] = low[node]
+            if low[node] == order[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+
+    return components
+
+
+class DependencyIndex:
+    """Dependency graph facts for a whole task list, computed once per request.
+
+    For every task position this records whether the task sits on a cycle,
+    how many tasks list it as a dependency (``blocks``), the length of the
+    longest dependency chain beneath it (``depth``) and the resulting
+    dependency multiplier, so per-task lookups are O(1). ``dependencies``
+    can pass the dependency lists when they were already extracted.
+    """
+
+    def __init__(self, tasks, dependencies=None):
+        size = len(tasks)
+        self.tasks = tasks
+        if dependencies is None:
+            dependencies = [task.get('dependencies') or () for task in tasks]
+        self.adjacency = build_adjacency(dependencies)
+        self.components = strongly_connected_components(self.adjacency)
+
+        self.component = [0] * size
+        for number, members in enumerate(self.components):
+            for member in members:
+                self.component[member] = number
+
+        self.in_cycle = [False] * size
+        self.cycles = []
+        for members in self.components:
+            if len(members) > 1 or members[0] in self.adjacency[members[0]]:
+                self.cycles.append(sorted(members))
+                for member in members:
+                    self.in_cycle[member] = True
+
+        self.blocks = [0] * size
+        for edges in self.adjacency:
+            for dep in edges:
+                self.blocks[dep] += 1
+
+        # Dependencies are emitted before their dependents, so one pass works
+        component_depth = [0] * len(self.components)
+        for number, members in enumerate(self.components):
+            deepest = 0
+            for member in members:
+                for dep in self.adjacency[member]:
+                    other = self.component[dep]
+                    if other != number and component_depth[other] + 1 > deepest:
+                        deepest = component_depth[other] + 1
+            component_depth[number] = deepest
+        self.depth = [component_depth[c] for c in self.component]
+
+        self.multipliers = []
+        for position, deps in enumerate(dependencies):
+            count = len(deps)
+            if count == 0:
+                self.multipliers.append(1.0)
+            elif self.in_cycle[position]:
+                self.multipliers.append(0.5)  # Heavy penalty for circular dependencies
+            elif count == 1:
+                self.multipliers.append(1.2)  # Blocks 1 task
+            else:
+                self.multipliers.append(1.5)  # Blocks multiple tasks
+
+        # Built on first lookup; batch scoring reads positions directly
+        self._by_identity = None
+        self._by_title = None
+
+    @property
+    def has_cycle(self):
+        return bool(self.cycles)
+
+    def position(self, task):
+        """Position of ``task`` in the indexed list, matching by identity then title"""
+        if self._by_identity is None:
+            self._by_identity = {id(t): position for position, t in enumerate(self.tasks)}
+            self._by_title = {}
+            for position, t in enumerate(self.tasks):
+                self._by_title.setdefault(t.get('title'), position)
+
+        position = self._by_identity.get(id(task))
+        if position is not None and self.tasks[position] is task:
+            return position
+        return self._by_title.get(task.get('title'))
+
+
+def multipliers_by_id(items):
+    """Cycle-aware dependency multipliers for ``(id, dependency ids)`` pairs.
+
+    Dependency lists that hold ids rather than positions are mapped to
+    positions so a DependencyIndex can run over them; unknown ids keep
+    counting towards the multiplier but add no edge.
+    """
+    items = list(items)
+    positions = {pk: position for position, (pk, _) in enumerate(items, 1)}
+    dependencies = [[positions.get(dep, 0) if type(dep) is int else 0 for dep in deps]
+                    for _, deps in items]
+    index = DependencyIndex(items, dependencies)
+    return {pk: index.multipliers[position] for position, (pk, _) in enumerate(items)}
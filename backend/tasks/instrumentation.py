@@ -0,0 +1,192 @@
+import asyncio
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+# Upper bounds in seconds, Prometheus style; +Inf is implied
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TASK_COUNT_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+class RequestTimer:
+    """Stage timings and counts collected while one request is handled"""
+
+    def __init__(self):
+        self.stages = []
+        self.counts = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    def count(self, name, value):
+        self.counts[name] = value
+
+    def server_timing(self):
+        return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages)
+
+    def as_dict(self):
+        return {
+            "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in self.stages},
+            "counts": dict(self.counts),
+        }
+
+
+class NullTimer:
+    """Stand-in used when instrumentation is off; every call is a no-op"""
+
+    _context = nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+    def count(self, name, value):
+        pass
+
+
+NULL_TIMER = NullTimer()
+_current = ContextVar("task_request_timer", default=NULL_TIMER)
+
+def current_timer():
+    return _current.get()
+
+def stage(name):
+    """Time a block against the current request, if it is being instrumented"""
+    return _current.get().stage(name)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.samples = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.samples += 1
+
+
+class MetricsRegistry:
+    """Process-wide histograms of stage timings and task counts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.stage_seconds = {}
+        self.task_counts = {}
+
+    def record(self, endpoint, timer):
+        with self._lock:
+            for name, seconds in timer.stages:
+                histogram = self.stage_seconds.get((endpoint, name))
+                if histogram is None:
+                    histogram = self.stage_seconds[(endpoint, name)] = Histogram(SECONDS_BUCKETS)
+                histogram.observe(seconds)
+            if "tasks" in timer.counts:
+                histogram = self.task_counts.get(endpoint)
+                if histogram is None:
+                    histogram = self.task_counts[endpoint] = Histogram(TASK_COUNT_BUCKETS)
+                histogram.observe(timer.counts["tasks"])
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = [
+            "# HELP task_analyzer_stage_seconds Time spent in each request stage.",
+            "# TYPE task_analyzer_stage_seconds histogram",
+        ]
+        with self._lock:
+            for (endpoint, name), histogram in sorted(self.stage_seconds.items()):
+                labels = f'endpoint="{endpoint}",stage="{name}"'
+                lines.extend(_histogram_lines("task_analyzer_stage_seconds", labels, histogram))
+            lines.append("# HELP task_analyzer_request_tasks Tasks received per request.")
+            lines.append("# TYPE task_analyzer_request_tasks histogram")
+            for endpoint, histogram in sorted(self.task_counts.items()):
+                labels = f'endpoint="{endpoint}"'
+                lines.extend(_histogram_lines("task_analyzer_request_tasks", labels, histogram))
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(metric, labels, histogram):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        yield f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}'
+    yield f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.samples}'
+    yield f"{metric}_sum{{{labels}}} {histogram.total}"
+    yield f"{metric}_count{{{labels}}} {histogram.samples}"
+
+
+metrics = MetricsRegistry()
+
+def instrumentation_enabled():
+    return getattr(settings, "TASK_INSTRUMENTATION", False)
+
+
+def instrumented(endpoint):
+    """Collect per-stage timings for a view.
+
+    Adds a ``Server-Timing`` header, feeds the metrics histograms and, when
+    the request has ``?debug=1``, adds a ``debug`` block to JSON
+    responses. Does nothing beyond one settings check when
+    ``TASK_INSTRUMENTATION`` is off. Works on sync and async views.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if not instrumentation_enabled():
+                    return await view(request, *args, **kwargs)
+
+                timer = RequestTimer()
+                token = _current.set(timer)
+                try:
+                    with timer.stage("total"):
+                        response = await view(request, *args, **kwargs)
+                finally:
+                    _current.reset(token)
+                return _finish(endpoint, timer, request, response)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not instrumentation_enabled():
+                return view(request, *args, **kwargs)
+
+            timer = RequestTimer()
+            token = _current.set(timer)
+            try:
+                with timer.stage("total"):
+                    response = view(request, *args, **kwargs)
+            finally:
+                _current.reset(token)
+            return _finish(endpoint, timer, request, response)
+        return wrapper
+    return decorator
+
+
+def _finish(endpoint, timer, request, response):
+    metrics.record(endpoint, timer)
+    response["Server-Timing"] = timer.server_timing()
+    if (request.GET.get("debug") == "1" and not response.streaming and
+            response.get("Content-Type", "").startswith("application/json") and
+            not response.has_header("Content-Encoding")):
+        data = json.loads(response.content)
+        if isinstance(data, dict):
+            data["debug"] = timer.as_dict()
+            response.content = json.dumps(data)
+    return response
@@ -0,0 +1,165 @@
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import get_score_cache
+from .models import AnalysisJob, AnalysisJobResult
+from .scoring import analyze_and_sort_tasks, dependency_index
+
+
+def _score_key(task):
+    return -task["priority_score"]
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Shared worker threads for jobs, or None to run jobs in the request"""
+    global _executor
+    workers = getattr(settings, "TASK_JOB_WORKERS", 2)
+    if not workers:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis-job")
+        return _executor
+
+
+def submit_job(records, strategy="smart_balance", limit=None, today=None):
+    """Create a job for validated records and queue it on the worker pool"""
+    job = AnalysisJob.objects.create(strategy=strategy, limit=limit, total=len(records))
+    executor = get_executor()
+    if executor is None:
+        run_job(job.pk, records, today)
+    else:
+        # Queue only once the job row is visible to the worker's connection
+        transaction.on_commit(lambda: executor.submit(_run_in_worker, job.pk, records, today))
+    return job
+
+
+def expire_jobs(now=None):
+    """Fail jobs whose worker went quiet and delete finished jobs past retention.
+
+    Workers are threads of the process that accepted the job, so a
+    restart loses them; a PENDING or RUNNING job without a heartbeat for
+    ``TASK_JOB_TIMEOUT`` seconds is marked FAILED instead of being polled
+    forever. DONE and FAILED jobs are deleted with their results
+    ``TASK_JOB_RETENTION`` seconds after finishing (None keeps them).
+    Returns ``(failed, deleted)``.
+    """
+    now = now or timezone.now()
+    timeout = getattr(settings, "TASK_JOB_TIMEOUT", 600)
+    failed = AnalysisJob.objects.filter(
+        status__in=(AnalysisJob.PENDING, AnalysisJob.RUNNING),
+        heartbeat_at__lt=now - timedelta(seconds=timeout),
+    ).update(status=AnalysisJob.FAILED, error="The job's worker stopped before it finished",
+             finished_at=now)
+
+    deleted = 0
+    retention = getattr(settings, "TASK_JOB_RETENTION", 86400)
+    if retention is not None:
+        finished = AnalysisJob.objects.filter(status__in=(AnalysisJob.DONE, AnalysisJob.FAILED),
+                                              finished_at__lt=now - timedelta(seconds=retention))
+        with transaction.atomic():
+            AnalysisJobResult.objects.filter(job__in=finished).delete()
+            deleted, _ = finished.delete()
+    return failed, deleted
+
+
+def _run_in_worker(job_id, records, today):
+    try:
+        run_job(job_id, records, today)
+    finally:
+        connection.close()
+
+
+def run_job(job_id, records, today=None):
+    """Rank a job's records chunk by chunk, then store the final ranking.
+
+    Dependency multipliers are computed once over the whole graph; each
+    chunk is then ranked by ``analyze_and_sort_tasks``. After every chunk
+    the best tasks so far are saved as ``partial_results``. Merging the
+    ranked chunks in order gives the same ranking as one call over all
+    records, since ``heapq.merge`` and the sort are both stable. Every
+    step refreshes the heartbeat; a job that ``expire_jobs`` already
+    failed is left alone.
+    """
+    job = AnalysisJob.objects.get(pk=job_id)
+    today = today or date.today()
+    chunk_size = getattr(settings, "TASK_JOB_CHUNK_SIZE", 10000)
+    partial_size = getattr(settings, "TASK_JOB_PARTIAL_SIZE", 10)
+    if job.limit is not None:
+        partial_size = min(partial_size, job.limit)
+
+    try:
+        started = AnalysisJob.objects.filter(pk=job_id, status=AnalysisJob.PENDING).update(
+            status=AnalysisJob.RUNNING, started_at=timezone.now(), heartbeat_at=timezone.now())
+        if not started:
+            return
+        multipliers = dependency_index(records).multipliers
+        cache = get_score_cache()
+
+        chunks = []
+        for start in range(0, len(records), chunk_size):
+            stop = start + chunk_size
+            chunks.append(analyze_and_sort_tasks(records[start:stop], job.strategy, job.limit,
+                                                 today, cache, multipliers[start:stop]))
+            partial = list(islice(heapq.merge(*chunks, key=_score_key), partial_size))
+            AnalysisJob.objects.filter(pk=job_id).update(processed=min(stop, len(records)),
+                                                         partial_results=partial,
+                                                         heartbeat_at=timezone.now())
+
+        ranked = islice(heapq.merge(*chunks, key=_score_key), job.limit)
+        with transaction.atomic():
+            AnalysisJobResult.objects.bulk_create(
+                (AnalysisJobResult(job_id=job_id, rank=rank, task=task)
+                 for rank, task in enumerate(ranked)),
+                batch_size=1000,
+            )
+            done = AnalysisJob.objects.filter(pk=job_id, status=AnalysisJob.RUNNING).update(
+                status=AnalysisJob.DONE, partial_results=[], finished_at=timezone.now())
+            if not done:
+                # Failed as stale meanwhile; its results would never be read
+                transaction.set_rollback(True)
+    except Exception as e:
+        AnalysisJob.objects.filter(pk=job_id, status=AnalysisJob.RUNNING).update(
+            status=AnalysisJob.FAILED, error=str(e), finished_at=timezone.now())
+
+
+def job_status(job):
+    """Status document for a job, with partial results while it is running"""
+    status = {
+        "id": str(job.id),
+        "status": job.status,
+        "strategy": job.strategy,
+        "limit": job.limit,
+        "progress": {
+            "processed": job.processed,
+            "total": job.total,
+            "percent": round(job.processed / job.total * 100, 1) if job.total else 100.0,
+        },
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+    if job.status == AnalysisJob.RUNNING:
+        status["partial_results"] = job.partial_results
+    elif job.status == AnalysisJob.DONE:
+        status["result_count"] = job.results.count()
+    elif job.status == AnalysisJob.FAILED:
+        status["error"] = job.error
+    return status
+
+
+def job_results(job, page, page_size):
+    """One page of a finished job's ranking, read by rank off the unique index"""
+    start = (page - 1) * page_size
+    rows = (AnalysisJobResult.objects.filter(job=job, rank__gte=start, rank__lt=start + page_size)
+            .order_by("rank").values_list("task", flat=True))
+    return list(rows)
@@ -0,0 +1,303 @@
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import django
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connections
+from django.test import Client, override_settings
+
+from tasks import batch, store
+from tasks.cache import get_score_cache
+from tasks.scoring import (
+    analyze_and_sort_tasks,
+    calculate_priority_score,
+    detect_circular_dependencies,
+)
+from tasks.serializers import Projection, compress, dumps
+from tasks.synthetic import generate_tasks
+from tasks.validation import as_records
+
+
+def time_call(func, repeat):
+    """Wall-clock seconds of ``repeat`` runs of ``func``"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def client_host():
+    """A Host header the request path accepts"""
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*":
+            return host.lstrip(".")
+    return "localhost"
+
+
+def summarize(name, size, timings):
+    return {
+        "benchmark": name,
+        "size": size,
+        "repeat": len(timings),
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+    }
+
+
+def run_in_threads(target, count):
+    pool = [threading.Thread(target=target, args=(number,)) for number in range(count)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+
+def sqlite_load(path, rows, threads, seconds, tuned):
+    """Mixed ranking reads and rescoring writes from ``threads`` threads, through the ORM.
+
+    The database and the read alias are pointed at a fresh SQLite file at
+    ``path``, migrated and seeded with ``rows`` tasks. Every fourth thread
+    writes with ``store.rescore``, 20 tasks per transaction; the others
+    read a top-10 ranking with ``store.top_tasks``, on ``read_alias()``.
+    After each operation a thread calls ``close_old_connections`` as
+    Django does at the end of a request, so ``CONN_MAX_AGE`` decides
+    whether connections are reused. Untuned runs use SQLite's defaults,
+    no read alias and ``CONN_MAX_AGE=0``; tuned ones the configured
+    settings. Returns per-operation latencies and the number of
+    operations that failed with "database is locked".
+    """
+    aliases = {"default", getattr(settings, "TASK_READ_DATABASE", None) or "default"}
+    saved = {alias: dict(connections.settings[alias]) for alias in aliases}
+    overrides = {} if tuned else {"TASK_SQLITE_PRAGMAS": {}, "TASK_READ_DATABASE": None}
+    today = date.today()
+    ids = []
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def setup(number):
+        try:
+            call_command("migrate", verbosity=0, interactive=False)
+            rng = random.Random(0)
+            ids.extend(store.import_tasks(
+                [{"title": f"Task {pk}", "due_date": today + timedelta(days=rng.randrange(-5, 30)),
+                  "estimated_hours": rng.uniform(0.5, 16), "importance": rng.randint(1, 10),
+                  "dependencies": []} for pk in range(rows)],
+                today=today))
+        finally:
+            connections.close_all()
+
+    def worker(number):
+        rng = random.Random(number)
+        writer = number % 4 == 0
+        multipliers = dict.fromkeys(ids, 1.0)
+        deadline = time.perf_counter() + seconds
+        timings = []
+        failed = 0
+        try:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    if writer:
+                        store.rescore(rng.sample(ids, 20), multipliers, today)
+                    else:
+                        store.top_tasks(limit=10, today=today)
+                except OperationalError:
+                    failed += 1
+                finally:
+                    close_old_connections()
+                timings.append(time.perf_counter() - start)
+        finally:
+            connections.close_all()
+        with lock:
+            latencies.extend(timings)
+            errors[0] += failed
+
+    try:
+        for alias in aliases:
+            connections.settings[alias]["NAME"] = path
+            if not tuned:
+                connections.settings[alias]["CONN_MAX_AGE"] = 0
+        # Threads open their own connections, from the settings changed above
+        with override_settings(**overrides):
+            run_in_threads(setup, 1)
+            run_in_threads(worker, threads)
+    finally:
+        for alias, settings_dict in saved.items():
+            connections.settings[alias].update(settings_dict)
+    return latencies, errors[0]
+
+
+def compare(results, baseline, tolerance):
+    """Benchmarks whose median got slower than the baseline by more than ``tolerance``"""
+    previous = {(r["benchmark"], r["size"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        old = previous.get((result["benchmark"], result["size"]))
+        if old and result["median"] > old["median"] * (1 + tolerance):
+            regressions.append({
+                "benchmark": result["benchmark"],
+                "size": result["size"],
+                "baseline": old["median"],
+                "current": result["median"],
+                "ratio": round(result["median"] / old["median"], 3),
+            })
+    return regressions
+
+
+class Command(BaseCommand):
+    help = "Benchmark the scoring pipeline and the analyze endpoint on synthetic task sets."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10,100,1000,10000,100000",
+                            help="Comma-separated task counts (up to 1000000)")
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--density", type=float, default=0.5,
+                            help="Average dependencies per task")
+        parser.add_argument("--cycle-rate", type=float, default=0.01,
+                            help="Share of tasks placed on a dependency cycle")
+        parser.add_argument("--strategy", default="smart_balance")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--scalar-max-size", type=int, default=100000,
+                            help="Largest size for the per-task calculate_priority_score loop")
+        parser.add_argument("--http-max-size", type=int, default=100000,
+                            help="Largest size sent through the Django test client")
+        parser.add_argument("--load-threads", type=int, default=0,
+                            help="Threads for the SQLite concurrency load test (0 skips it)")
+        parser.add_argument("--load-seconds", type=float, default=2.0)
+        parser.add_argument("--load-rows", type=int, default=10000)
+        parser.add_argument("--output", help="Write JSON results here instead of stdout")
+        parser.add_argument("--compare", help="Baseline JSON from an earlier run")
+        parser.add_argument("--tolerance", type=float, default=0.2,
+                            help="Allowed slowdown against the baseline before failing")
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",") if size.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be comma-separated integers")
+        repeat = max(1, options["repeat"])
+        strategy = options["strategy"]
+        client = Client(HTTP_HOST=client_host())
+        cache = get_score_cache()
+
+        results = []
+        for size in sizes:
+            tasks = generate_tasks(size, options["density"], options["cycle_rate"], options["seed"])
+            self.stderr.write(f"Benchmarking {size} tasks")
+
+            if size <= options["scalar_max_size"]:
+                timings = time_call(lambda: [calculate_priority_score(t, strategy) for t in tasks], repeat)
+                results.append(summarize("calculate_priority_score", size, timings))
+
+            timings = time_call(lambda: detect_circular_dependencies(tasks), repeat)
+            results.append(summarize("detect_circular_dependencies", size, timings))
+
+            timings = time_call(lambda: analyze_and_sort_tasks(tasks, strategy), repeat)
+            results.append(summarize("analyze_and_sort_tasks", size, timings))
+
+            if cache is not None:
+                # Warm hits: the same batch again, as a client re-sending a
+                # list, validated as the view does and asking for the top ten
+                records = as_records(tasks)
+                timings = time_call(lambda: analyze_and_sort_tasks(records, strategy, 10), repeat)
+                results.append(summarize("analyze_top10", size, timings))
+                uncached = results[-1]["median"]
+                cache.clear()
+                analyze_and_sort_tasks(records, strategy, 10, cache=cache)
+                timings = time_call(lambda: analyze_and_sort_tasks(records, strategy, 10, cache=cache),
+                                    repeat)
+                results.append(dict(summarize("analyze_top10_cached", size, timings),
+                                    speedup=round(uncached / statistics.median(timings), 2)))
+
+            # Response encoding: JsonResponse's stdlib encoder against the
+            # serializers module, full and compact, with the size sent
+            ranked = {"tasks": analyze_and_sort_tasks(tasks, strategy)}
+            compact = {"tasks": analyze_and_sort_tasks(tasks, strategy,
+                                                       projection=Projection(compact=True))}
+            encoders = (
+                ("serialize_stdlib", lambda: json.dumps(ranked, cls=DjangoJSONEncoder).encode()),
+                ("serialize", lambda: dumps(ranked)),
+                ("serialize_gzip", lambda: compress(dumps(ranked), "gzip")),
+                ("serialize_compact", lambda: dumps(compact)),
+            )
+            for name, encode in encoders:
+                timings = time_call(encode, repeat)
+                results.append(dict(summarize(name, size, timings), bytes=len(encode())))
+
+            if size <= options["http_max_size"]:
+                body = json.dumps({"tasks": tasks, "strategy": strategy})
+
+                def request():
+                    # Measure cold requests, not score cache hits
+                    if cache is not None:
+                        cache.clear()
+                    response = client.post("/api/tasks/analyze/", data=body,
+                                           content_type="application/json")
+                    if response.status_code != 200:
+                        raise CommandError(f"analyze returned {response.status_code}")
+
+                results.append(summarize("http_analyze", size, time_call(request, repeat)))
+
+        if options["load_threads"] > 0:
+            threads = options["load_threads"]
+            self.stderr.write(f"Load testing SQLite with {threads} threads")
+            throughput = {}
+            with tempfile.TemporaryDirectory() as directory:
+                for name, tuned in (("default", False), ("tuned", True)):
+                    latencies, errors = sqlite_load(os.path.join(directory, f"{name}.sqlite3"),
+                                                    options["load_rows"], threads,
+                                                    options["load_seconds"], tuned)
+                    throughput[name] = len(latencies) / options["load_seconds"]
+                    results.append(dict(summarize(f"sqlite_load_{name}", threads, latencies),
+                                        ops_per_second=round(throughput[name], 1),
+                                        locked_errors=errors))
+            results[-1]["speedup"] = round(throughput["tuned"] / max(throughput["default"], 1e-9), 2)
+
+        report = {
+            "meta": {
+                "created": datetime.now(timezone.utc).isoformat(),
+                "python": sys.version.split()[0],
+                "django": django.get_version(),
+                "numpy": batch.np.__version__ if batch.np is not None else None,
+                "platform": platform.platform(),
+                "options": {key: options[key] for key in
+                            ("sizes", "repeat", "density", "cycle_rate", "strategy", "seed",
+                             "load_threads", "load_seconds")},
+            },
+            "results": results,
+        }
+
+        regressions = []
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline: {e}")
+            regressions = compare(results, baseline, options["tolerance"])
+            report["regressions"] = regressions
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmark(s) regressed beyond the tolerance")
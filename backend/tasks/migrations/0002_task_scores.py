@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='estimated_hours',
+            field=models.FloatField(),
+        ),
+        migrations.CreateModel(
+            name='TaskScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('strategy', models.CharField(max_length=50)),
+                ('priority_score', models.FloatField()),
+                ('scored_on', models.DateField()),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scores', to='tasks.task')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['strategy', '-priority_score'], name='taskscore_ranking_idx'), models.Index(fields=['scored_on'], name='taskscore_scored_on_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='taskscore',
+            constraint=models.UniqueConstraint(fields=('task', 'strategy'), name='unique_task_strategy_score'),
+        ),
+    ]
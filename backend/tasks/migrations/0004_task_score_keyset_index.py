@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_analysis_jobs'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='taskscore',
+            name='taskscore_ranking_idx',
+        ),
+        migrations.AddIndex(
+            model_name='taskscore',
+            index=models.Index(fields=['strategy', '-priority_score', 'task'], name='taskscore_ranking_idx'),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_dependencies_to_edges(apps, schema_editor):
+    """One edge per distinct known id in each stored dependency list, in list order"""
+    Task = apps.get_model('tasks', 'Task')
+    TaskDependency = apps.get_model('tasks', 'TaskDependency')
+    known = set(Task.objects.values_list('id', flat=True))
+    edges = []
+    for pk, dependencies in Task.objects.values_list('id', 'dependencies').iterator():
+        for dep in dict.fromkeys(dependencies or []):
+            if type(dep) is int and dep in known:
+                edges.append(TaskDependency(task_id=pk, depends_on_id=dep))
+    TaskDependency.objects.bulk_create(edges, batch_size=1000)
+
+
+def copy_edges_to_dependencies(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    TaskDependency = apps.get_model('tasks', 'TaskDependency')
+    lists = {}
+    for pk, dep in TaskDependency.objects.order_by('id').values_list('task_id', 'depends_on_id'):
+        lists.setdefault(pk, []).append(dep)
+    tasks = list(Task.objects.filter(id__in=lists))
+    for task in tasks:
+        task.dependencies = lists[task.id]
+    Task.objects.bulk_update(tasks, ['dependencies'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_task_score_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskDependency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='taskscore',
+            name='taskscore_ranking_idx',
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='owner',
+            field=models.CharField(blank=True, default='', max_length=150),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='project',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='taskscore',
+            name='owner',
+            field=models.CharField(blank=True, default='', max_length=150),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', 'due_date'], name='task_owner_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', 'project'], name='task_owner_project_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskscore',
+            index=models.Index(fields=['owner', 'strategy', '-priority_score', 'task'], name='taskscore_ranking_idx'),
+        ),
+        migrations.AddField(
+            model_name='taskdependency',
+            name='depends_on',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependent_edges', to='tasks.task'),
+        ),
+        migrations.AddField(
+            model_name='taskdependency',
+            name='task',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependency_edges', to='tasks.task'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='depends_on',
+            field=models.ManyToManyField(blank=True, related_name='dependents', through='tasks.TaskDependency', to='tasks.task'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskdependency',
+            constraint=models.UniqueConstraint(fields=('task', 'depends_on'), name='unique_task_dependency'),
+        ),
+        migrations.RunPython(copy_dependencies_to_edges, copy_edges_to_dependencies),
+        migrations.RemoveField(
+            model_name='task',
+            name='dependencies',
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2.7 on 2026-10-18 03:31
+
+from django.db import migrations, models
+
+
+def tasks_on_cycles(lists):
+    """Ids on a dependency cycle (iterative Tarjan), frozen here for this migration"""
+    order, low, on_stack, stack, cyclic = {}, {}, set(), [], set()
+    for root in lists:
+        if root in order:
+            continue
+        order[root] = low[root] = len(order)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(lists[root]))]
+        while work:
+            node, edges = work[-1]
+            for nxt in edges:
+                if nxt not in lists:
+                    continue
+                if nxt not in order:
+                    order[nxt] = low[nxt] = len(order)
+                    stack.append(nxt)
+                    on_stack.add(nxt)
+                    work.append((nxt, iter(lists[nxt])))
+                    break
+                if nxt in on_stack:
+                    low[node] = min(low[node], order[nxt])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == order[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or node in lists[node]:
+                        cyclic.update(component)
+    return cyclic
+
+
+def multiplier(dependencies, cyclic):
+    if not dependencies:
+        return 1.0
+    if cyclic:
+        return 0.5
+    return 1.2 if len(dependencies) == 1 else 1.5
+
+
+def store_multipliers(apps, schema_editor):
+    """Multipliers of existing tasks, from each owner's dependency graph"""
+    Task = apps.get_model('tasks', 'Task')
+    TaskDependency = apps.get_model('tasks', 'TaskDependency')
+    lists = {}
+    for owner, pk in Task.objects.order_by('id').values_list('owner', 'id'):
+        lists.setdefault(owner, {})[pk] = []
+    edges = TaskDependency.objects.order_by('id').values_list('task__owner', 'task_id', 'depends_on_id')
+    for owner, pk, dep in edges:
+        lists[owner][pk].append(dep)
+    tasks = []
+    for owner_lists in lists.values():
+        cyclic = tasks_on_cycles(owner_lists)
+        for pk, dependencies in owner_lists.items():
+            value = multiplier(dependencies, pk in cyclic)
+            if value != 1.0:
+                tasks.append(Task(id=pk, dependency_multiplier=value))
+    Task.objects.bulk_update(tasks, ['dependency_multiplier'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_task_owners_and_dependency_edges'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='dependency_multiplier',
+            field=models.FloatField(default=1.0),
+        ),
+        migrations.RunPython(store_multipliers, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,108 @@
+import uuid
+
 from django.db import models 
+from django.utils import timezone
  
 class Task(models.Model): 
+    """A stored task in one owner's collection, optionally filed under a project"""
+    owner = models.CharField(max_length=150, blank=True, default="")
+    project = models.CharField(max_length=100, blank=True, default="")
     title = models.CharField(max_length=200) 
     due_date = models.DateField() 
-    estimated_hours = models.IntegerField() 
+    estimated_hours = models.FloatField() 
     importance = models.IntegerField() 
-    dependencies = models.JSONField(default=list, blank=True) 
+    depends_on = models.ManyToManyField("self", symmetrical=False, through="TaskDependency",
+                                        related_name="dependents", blank=True)
+    # Cycle-aware multiplier the stored scores used; kept by store.rescore
+    dependency_multiplier = models.FloatField(default=1.0)
     created_at = models.DateTimeField(auto_now_add=True) 
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "due_date"], name="task_owner_due_idx"),
+            models.Index(fields=["owner", "project"], name="task_owner_project_idx"),
+        ]
  
     def __str__(self): 
         return self.title 
+
+
+class TaskDependency(models.Model):
+    """Edge from a task to one task it depends on; ids are kept in list order"""
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="dependency_edges")
+    depends_on = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="dependent_edges")
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(fields=["task", "depends_on"], name="unique_task_dependency"),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id} -> {self.depends_on_id}"
+
+
+class TaskScore(models.Model):
+    """Stored priority score of a task under one strategy"""
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="scores")
+    # Copied from the task so each owner's ranking is one index range
+    owner = models.CharField(max_length=150, blank=True, default="")
+    strategy = models.CharField(max_length=50)
+    priority_score = models.FloatField()
+    scored_on = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["task", "strategy"], name="unique_task_strategy_score"),
+        ]
+        indexes = [
+            # Serves each owner's ranking and its keyset pages, ties broken by task id
+            models.Index(fields=["owner", "strategy", "-priority_score", "task"],
+                         name="taskscore_ranking_idx"),
+            models.Index(fields=["scored_on"], name="taskscore_scored_on_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id} {self.strategy}: {self.priority_score}"
+
+
+class AnalysisJob(models.Model):
+    """A large analyze request ranked in the background"""
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    strategy = models.CharField(max_length=50)
+    limit = models.PositiveIntegerField(null=True, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    # Best tasks among the chunks scored so far, while the job runs
+    partial_results = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Touched by the worker at every step; jobs.expire_jobs fails jobs gone quiet
+    heartbeat_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.id} {self.status}"
+
+
+class AnalysisJobResult(models.Model):
+    """One ranked task of a finished job; ``rank`` starts at 0"""
+    job = models.ForeignKey(AnalysisJob, on_delete=models.CASCADE, related_name="results")
+    rank = models.PositiveIntegerField()
+    task = models.JSONField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["job", "rank"], name="unique_job_result_rank"),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id} #{self.rank}"
@@ -0,0 +1,171 @@
+import base64
+import bisect
+import hashlib
+import heapq
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from django.conf import settings
+
+from .scoring import breakdowns, present_tasks, score_records
+from .serializers import dumps
+from .strategies import get_strategy, registry
+
+
+class CursorError(ValueError):
+    """A cursor that cannot be decoded, or that does not match the request"""
+
+
+class CursorExpired(CursorError):
+    """A cursor whose ranking is gone: from an earlier day, or evicted from the cache"""
+
+
+def encode_cursor(score, index, strategy, day, ranking):
+    """Opaque cursor for the page after the task with ``score`` at ``index``.
+
+    ``ranking`` identifies the ranked task list: the tasks digest for
+    analyzed lists, ``"stored"`` for the persisted tasks.
+    """
+    raw = dumps([score, index, strategy, day.isoformat(), ranking])
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(value):
+    """``(score, index, strategy, day, ranking)`` from a cursor; raises CursorError"""
+    if not isinstance(value, str) or not value:
+        raise CursorError("Invalid cursor")
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        score, index, strategy, day, ranking = json.loads(raw)
+    except (ValueError, TypeError):
+        raise CursorError("Invalid cursor")
+    if (isinstance(score, bool) or not isinstance(score, (int, float)) or
+            isinstance(index, bool) or not isinstance(index, int) or index < 0 or
+            not all(isinstance(part, str) for part in (strategy, day, ranking))):
+        raise CursorError("Invalid cursor")
+    return score, index, strategy, day, ranking
+
+
+def tasks_digest(tasks):
+    """Identifies a submitted task list, so a cursor is never used against another"""
+    return hashlib.blake2b(dumps(tasks), digest_size=16).hexdigest()
+
+
+class CachedRanking:
+    """Scores of one analyzed task list, browsed page by page.
+
+    The first page is picked with a heap, so it costs no full sort. The
+    full order is sorted once, on the first deeper page, and each page is
+    then found by bisecting for the cursor's ``(-score, index)`` key, the
+    same tie order as ``rank_tasks``.
+    """
+
+    def __init__(self, records, strategy, today, scores, multipliers, explain):
+        self.records = records
+        self.strategy = strategy
+        self.today = today
+        self.scores = scores
+        self.multipliers = multipliers
+        self.explain = explain
+        self._order = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.scores)
+
+    def page(self, size, after=None):
+        """Positions of the ``size`` tasks ranked right after ``after``, a ``(score, index)``.
+
+        Returns the positions and whether any tasks follow them.
+        """
+        count = len(self.scores)
+        if after is None and self._order is None:
+            return heapq.nlargest(size, range(count), key=self.scores.__getitem__), count > size
+        with self._lock:
+            if self._order is None:
+                self._order = sorted(zip([-score for score in self.scores], range(count)))
+        start = 0 if after is None else bisect.bisect_right(self._order, (-after[0], after[1]))
+        return [i for _, i in self._order[start:start + size]], start + size < count
+
+    def tasks(self, positions, projection=None):
+        return present_tasks(self.records, self.scores, positions, self.explain, projection,
+                             breakdowns(self.records, self.multipliers, self.strategy, self.today))
+
+
+class RankingCache:
+    """The most recently analyzed rankings, keyed by tasks digest, strategy and date"""
+
+    def __init__(self):
+        self._rankings = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            ranking = self._rankings.get(key)
+            if ranking is not None:
+                self._rankings.move_to_end(key)
+            return ranking
+
+    def put(self, key, ranking):
+        size = getattr(settings, "TASK_RANKING_CACHE_SIZE", 8)
+        with self._lock:
+            self._rankings[key] = ranking
+            self._rankings.move_to_end(key)
+            while len(self._rankings) > size:
+                self._rankings.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._rankings.clear()
+
+
+rankings = RankingCache()
+
+
+def analyze_page(records, tasks, strategy, size, cursor=None, today=None, cache=None,
+                 projection=None):
+    """One page of a ranking and the cursor to the next one.
+
+    ``tasks`` is the submitted task list, or None when only a cursor was
+    sent; then the ranking has to come from the cache. With tasks, a
+    cache miss scores them once and caches the result, so later pages
+    are sliced from the same scores. ``cursor`` is a decoded cursor; its
+    strategy replaces ``strategy``. Raises CursorError.
+    """
+    today = today or date.today()
+    after = None
+    if cursor is not None:
+        score, index, strategy, day, digest = cursor
+        if day != today.isoformat():
+            raise CursorExpired("Cursor is from an earlier day; scores have changed since")
+        if strategy not in registry:
+            raise CursorExpired(f"Unknown strategy: {strategy}")
+        if tasks is not None and tasks_digest(tasks) != digest:
+            raise CursorError("Cursor does not belong to these tasks")
+        after = (score, index)
+    else:
+        digest = tasks_digest(tasks)
+
+    key = (digest, strategy, today)
+    ranking = rankings.get(key)
+    if ranking is None:
+        if tasks is None:
+            raise CursorExpired("Ranking expired; send the tasks again with the cursor")
+        profile = get_strategy(strategy)
+        scores, multipliers, explain = score_records(records, profile, today, cache)
+        ranking = CachedRanking(records, profile, today, scores, multipliers, explain)
+        rankings.put(key, ranking)
+
+    positions, more = ranking.page(size, after)
+    next_cursor = None
+    if more and positions:
+        last = positions[-1]
+        next_cursor = encode_cursor(ranking.scores[last], last, strategy, today, digest)
+    return {
+        "strategy": strategy,
+        "total": len(ranking),
+        "tasks": ranking.tasks(positions, projection),
+        "next_cursor": next_cursor,
+    }
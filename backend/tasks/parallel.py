@@ -0,0 +1,134 @@
+import asyncio
+import heapq
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .batch import TaskColumns
+from .instrumentation import stage
+from .scoring import breakdowns, dependency_index, describe_score
+from .strategies import Strategy, get_strategy
+
+
+# Worker side: strategies are compiled once per process, keyed by fingerprint
+_worker_strategies = {}
+
+def _warm():
+    return os.getpid()
+
+def _compiled(name, profile, fingerprint):
+    strategy = _worker_strategies.get(fingerprint)
+    if strategy is None:
+        strategy = _worker_strategies[fingerprint] = Strategy(name, profile)
+    return strategy
+
+def rank_chunk(columns, profiles, offset, limit=None):
+    """Score one chunk under each strategy and sort it.
+
+    Returns one ascending list of ``(-score, index)`` per strategy, cut to
+    ``limit`` when given. Ties order by index, the same order the stable
+    sort in ``rank_tasks`` gives, so merging chunks reproduces it exactly.
+    """
+    strategies = [_compiled(*profile) for profile in profiles]
+    rankings = []
+    for scores in columns.priority_score_matrix(strategies):
+        keyed = [(-score, offset + i) for i, score in enumerate(scores)]
+        if limit is None or limit >= len(keyed):
+            keyed.sort()
+        else:
+            keyed = heapq.nsmallest(limit, keyed)
+        rankings.append(keyed)
+    return rankings
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Shared process pool, started with every worker already running"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = getattr(settings, "TASK_POOL_WORKERS", None) or os.cpu_count() or 1
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            # Spin every worker up now so the first large request does not pay for it
+            for future in [_pool.submit(_warm) for _ in range(workers)]:
+                future.result()
+        return _pool
+
+def use_pool(size):
+    """Whether a batch of ``size`` tasks is large enough to score in the pool"""
+    threshold = getattr(settings, "TASK_POOL_MIN_TASKS", None)
+    return threshold is not None and size >= threshold
+
+
+def _prepare(records, strategies, today):
+    with stage("dependency_graph"):
+        multipliers = dependency_index(records).multipliers
+    columns = TaskColumns(records, today, multipliers)
+    profiles = [(s.name, s.profile, s.fingerprint) for s in map(get_strategy, strategies)]
+    return columns, profiles
+
+def _chunks(columns):
+    size = getattr(settings, "TASK_POOL_CHUNK_SIZE", 20000)
+    for offset in range(0, columns.size, size):
+        yield offset, columns.slice(offset, offset + size)
+
+def _merge(records, columns, strategies, chunk_rankings, limit, projection=None, today=None):
+    """k-way merge of the sorted chunks into each strategy's final ranking"""
+    explanations = {}
+    def explain(i):
+        if i not in explanations:
+            explanations[i] = describe_score(*columns.explanation_fields(i))
+        return explanations[i]
+
+    rankings = {}
+    for position, strategy in enumerate(strategies):
+        with stage("sort"):
+            merged = heapq.merge(*(chunk[position] for chunk in chunk_rankings))
+            top = list(islice(merged, limit))
+        with stage("explain"):
+            if projection is not None:
+                breakdown = breakdowns(records, columns.multipliers, get_strategy(strategy), today)
+                rankings[strategy] = [projection.task(records[i], i, -negated, explain, breakdown)
+                                      for negated, i in top]
+            else:
+                rankings[strategy] = [
+                    dict(records[i].task, priority_score=-negated, explanation=explain(i))
+                    for negated, i in top
+                ]
+    return rankings
+
+def analyze_in_pool(records, strategies, limit=None, today=None, projection=None):
+    """Rank records under several strategies with chunks scored in the process pool.
+
+    Dependency multipliers need the whole graph, so they are computed here
+    first; workers only score and sort their chunk. The result is the same
+    as ``analyze_with_strategies``.
+    """
+    today = today or date.today()
+    columns, profiles = _prepare(records, strategies, today)
+    pool = get_pool()
+    with stage("score"):
+        futures = [pool.submit(rank_chunk, chunk, profiles, offset, limit)
+                   for offset, chunk in _chunks(columns)]
+        chunk_rankings = [future.result() for future in futures]
+    return _merge(records, columns, strategies, chunk_rankings, limit, projection, today)
+
+async def analyze_in_pool_async(records, strategies, limit=None, today=None, projection=None):
+    """``analyze_in_pool`` for async views; the event loop is never blocked on scoring"""
+    today = today or date.today()
+    columns, profiles = await sync_to_async(_prepare, thread_sensitive=False)(
+        records, strategies, today)
+    pool = await sync_to_async(get_pool, thread_sensitive=False)()
+    with stage("score"):
+        futures = [asyncio.wrap_future(pool.submit(rank_chunk, chunk, profiles, offset, limit))
+                   for offset, chunk in _chunks(columns)]
+        chunk_rankings = await asyncio.gather(*futures)
+    return await sync_to_async(_merge, thread_sensitive=False)(
+        records, columns, strategies, chunk_rankings, limit, projection, today)
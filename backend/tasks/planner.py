@@ -0,0 +1,255 @@
+import heapq
+import math
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+
+from .batch import TaskColumns
+from .instrumentation import stage
+from .scoring import dependency_index
+from .strategies import get_strategy
+from .validation import as_records
+
+
+def execution_order(adjacency, scores):
+    """Kahn's algorithm taking the best-scoring ready task first.
+
+    ``adjacency[i]`` lists the positions task ``i`` depends on. Returns
+    the executable order and the positions that never become ready
+    because they sit on, or depend on, a cycle. Each task is pushed and
+    popped once, so this runs in O((V + E) log V).
+    """
+    size = len(adjacency)
+    waiting = [len(deps) for deps in adjacency]
+    dependents = [[] for _ in range(size)]
+    for position, deps in enumerate(adjacency):
+        for dep in deps:
+            dependents[dep].append(position)
+
+    # Ties go to the earlier task, as in the ranking
+    ready = [(-scores[position], position) for position in range(size) if not waiting[position]]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        _, position = heapq.heappop(ready)
+        order.append(position)
+        for dependent in dependents[position]:
+            waiting[dependent] -= 1
+            if not waiting[dependent]:
+                heapq.heappush(ready, (-scores[dependent], dependent))
+
+    blocked = [position for position in range(size) if waiting[position]]
+    return order, blocked
+
+
+def critical_path(adjacency, hours, order):
+    """Earliest finish times and the longest chain of work, by estimated hours.
+
+    ``order`` must be topological, as returned by ``execution_order``;
+    blocked tasks are left out.
+    """
+    finish = {}
+    previous = {}
+    for position in order:
+        start, before = 0, None
+        for dep in adjacency[position]:
+            if finish[dep] > start:
+                start, before = finish[dep], dep
+        finish[position] = start + max(0, hours[position])
+        previous[position] = before
+
+    if not finish:
+        return finish, 0, []
+    last = max(order, key=finish.__getitem__)
+    path = []
+    while last is not None:
+        path.append(last)
+        last = previous[last]
+    path.reverse()
+    return finish, finish[path[-1]], path
+
+
+def plan_tasks(tasks, strategy="smart_balance", today=None, limit=None):
+    """Executable order of a task list, best tasks first whenever they are ready.
+
+    Positions in the result are 1-based, like the ``dependencies`` lists.
+    With ``limit`` only the first steps of the order are returned.
+    """
+    today = today or date.today()
+    records = as_records(tasks)
+    with stage("dependency_graph"):
+        index = dependency_index(records)
+    with stage("score"):
+        columns = TaskColumns(records, today, index.multipliers)
+        scores = columns.priority_scores(get_strategy(strategy))
+    with stage("sort"):
+        order, blocked = execution_order(index.adjacency, scores)
+        finish, length, path = critical_path(index.adjacency, columns.hours, order)
+
+    hours = columns.hours
+    return {
+        "strategy": strategy,
+        "order": [
+            dict(records[position].task,
+                 position=position + 1,
+                 priority_score=scores[position],
+                 earliest_start=finish[position] - max(0, hours[position]),
+                 earliest_finish=finish[position])
+            for position in order[:limit]
+        ],
+        "critical_path": {
+            "hours": length,
+            "positions": [position + 1 for position in path],
+        },
+        "cycles": [[position + 1 for position in cycle] for cycle in index.cycles],
+        "blocked": [position + 1 for position in blocked],
+    }
+
+
+def _units(hours, resolution, round_up):
+    units = round(hours / resolution, 6)
+    return math.ceil(units) if round_up else math.floor(units)
+
+
+def knapsack(items, capacity, deadline):
+    """0/1 knapsack over ``(weight, value, position)`` items with positive weights.
+
+    Returns the chosen positions, or None when ``deadline`` passes first.
+    """
+    best = [0.0] * (capacity + 1)
+    keep = []
+    for count, (weight, value, _) in enumerate(items):
+        if count % 32 == 0 and time.monotonic() > deadline:
+            return None
+        row = bytearray(capacity + 1)
+        for room in range(capacity, weight - 1, -1):
+            candidate = best[room - weight] + value
+            if candidate > best[room]:
+                best[room] = candidate
+                row[room] = 1
+        keep.append(row)
+
+    chosen = []
+    room = capacity
+    for count in range(len(items) - 1, -1, -1):
+        if keep[count][room]:
+            weight, _, position = items[count]
+            chosen.append(position)
+            room -= weight
+    return chosen
+
+
+def greedy_fill(items, capacity):
+    """Best score per hour first; the fallback when the DP runs out of time"""
+    chosen = []
+    for weight, value, position in sorted(items, key=lambda item: (-item[1] / item[0], item[2])):
+        if weight <= capacity:
+            chosen.append(position)
+            capacity -= weight
+    return chosen
+
+
+def choose(candidates, weights, scores, capacity, deadline):
+    """Best-scoring set of ready tasks that fits ``capacity`` units.
+
+    Only the ``capacity // w`` best tasks of each weight ``w`` can be in an
+    optimal set, so the DP sees at most about ``capacity * ln(capacity)``
+    items however long the backlog is. Returns the positions and whether
+    the exact solver finished in time.
+    """
+    free = [position for position in candidates if weights[position] == 0]
+    by_weight = {}
+    for position in candidates:
+        weight = weights[position]
+        if 0 < weight <= capacity:
+            by_weight.setdefault(weight, []).append((-scores[position], position))
+
+    items = []
+    for weight, group in sorted(by_weight.items()):
+        for negated, position in heapq.nsmallest(capacity // weight, group):
+            items.append((weight, -negated, position))
+
+    chosen = knapsack(items, capacity, deadline)
+    if chosen is None:
+        return free + greedy_fill(items, capacity), False
+    return free + chosen, True
+
+
+def plan_days(tasks, hours_per_day, strategy="smart_balance", start=None, time_limit=None):
+    """Fill each day's hours with the best set of tasks whose dependencies are done.
+
+    Each day is solved as a knapsack over the ready tasks; tasks freed by
+    today's picks compete for the hours left in later rounds of the same
+    day, so a dependency always comes earlier in the plan than its
+    dependents. Hours are counted in ``TASK_PLAN_RESOLUTION`` steps,
+    rounding task estimates up. When ``time_limit`` seconds of solving run
+    out the remaining choices fall back to a greedy fill.
+    """
+    start = start or date.today()
+    resolution = getattr(settings, "TASK_PLAN_RESOLUTION", 0.25)
+    if time_limit is None:
+        time_limit = getattr(settings, "TASK_PLAN_TIME_LIMIT", 0.5)
+
+    records = as_records(tasks)
+    with stage("dependency_graph"):
+        index = dependency_index(records)
+    with stage("score"):
+        columns = TaskColumns(records, start, index.multipliers)
+        scores = columns.priority_scores(get_strategy(strategy))
+
+    size = len(records)
+    weights = [_units(max(0, hours), resolution, True) for hours in columns.hours]
+    waiting = [len(deps) for deps in index.adjacency]
+    dependents = [[] for _ in range(size)]
+    for position, deps in enumerate(index.adjacency):
+        for dep in deps:
+            dependents[dep].append(position)
+    ready = {position for position in range(size) if not waiting[position]}
+
+    exact = True
+    days = []
+    deadline = time.monotonic() + time_limit
+    with stage("solve"):
+        for offset, available in enumerate(hours_per_day):
+            remaining = _units(available, resolution, False)
+            planned = []
+            while ready:
+                candidates = [position for position in ready if weights[position] <= remaining]
+                chosen, finished = choose(candidates, weights, scores, remaining, deadline)
+                exact = exact and finished
+                if not chosen:
+                    break
+                # Picks of one round are independent of each other
+                chosen.sort(key=lambda position: (-scores[position], position))
+                released = False
+                for position in chosen:
+                    ready.discard(position)
+                    remaining -= weights[position]
+                    planned.append(position)
+                    for dependent in dependents[position]:
+                        waiting[dependent] -= 1
+                        if not waiting[dependent]:
+                            ready.add(dependent)
+                            released = True
+                if not released:
+                    break
+
+            days.append({
+                "date": (start + timedelta(days=offset)).isoformat(),
+                "hours_available": available,
+                "hours_planned": round(sum(max(0, columns.hours[p]) for p in planned), 2),
+                "total_score": round(sum(scores[p] for p in planned), 2),
+                "tasks": [dict(records[p].task, position=p + 1, priority_score=scores[p])
+                          for p in planned],
+            })
+
+    planned_count = sum(len(day["tasks"]) for day in days)
+    return {
+        "strategy": strategy,
+        "solver": "dp" if exact else "greedy",
+        "total_score": round(sum(day["total_score"] for day in days), 2),
+        "days": days,
+        "unplanned": size - planned_count,
+        "cycles": [[position + 1 for position in cycle] for cycle in index.cycles],
+    }
@@ -0,0 +1,381 @@
+import secrets
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import date
+
+from django.conf import settings
+
+from .batch import TaskColumns
+from .graph import multipliers_by_id
+from .scoring import describe_score
+from .strategies import get_strategy
+from .validation import TaskValidationError, task_record
+
+
+class RankedList:
+    """Sorted list of keys with O(log n) rank lookups.
+
+    Keys live in sorted buckets of up to ``2 * LOAD`` entries; a Fenwick
+    tree over the bucket sizes turns "how many keys come before this
+    bucket" into a logarithmic prefix sum. Inserting or removing a key
+    only shifts entries inside one small bucket.
+    """
+
+    LOAD = 256
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self._buckets = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+        self._size = len(keys)
+        self._rebuild_tree()
+
+    def _rebuild_tree(self):
+        tree = [0] * (len(self._buckets) + 1)
+        for number, bucket in enumerate(self._buckets, 1):
+            tree[number] += len(bucket)
+            parent = number + (number & -number)
+            if parent <= len(self._buckets):
+                tree[parent] += tree[number]
+        self._tree = tree
+
+    def _update(self, bucket, delta):
+        number = bucket + 1
+        while number < len(self._tree):
+            self._tree[number] += delta
+            number += number & -number
+
+    def _before(self, bucket):
+        total = 0
+        while bucket:
+            total += self._tree[bucket]
+            bucket -= bucket & -bucket
+        return total
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for bucket in self._buckets:
+            yield from bucket
+
+    def add(self, key):
+        """Insert ``key`` and return its rank"""
+        self._size += 1
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            self._rebuild_tree()
+            return 0
+
+        number = min(bisect_left(self._maxes, key), len(self._buckets) - 1)
+        bucket = self._buckets[number]
+        insort(bucket, key)
+        self._maxes[number] = bucket[-1]
+        rank = self._before(number) + bisect_left(bucket, key)
+
+        if len(bucket) > 2 * self.LOAD:
+            self._buckets[number:number + 1] = [bucket[:self.LOAD], bucket[self.LOAD:]]
+            self._maxes[number:number + 1] = [bucket[self.LOAD - 1], bucket[-1]]
+            self._rebuild_tree()
+        else:
+            self._update(number, 1)
+        return rank
+
+    def remove(self, key):
+        """Remove ``key`` and return the rank it had; raises KeyError if absent"""
+        number = bisect_left(self._maxes, key)
+        if number == len(self._buckets):
+            raise KeyError(key)
+        bucket = self._buckets[number]
+        position = bisect_left(bucket, key)
+        if position == len(bucket) or bucket[position] != key:
+            raise KeyError(key)
+
+        rank = self._before(number) + position
+        del bucket[position]
+        self._size -= 1
+        if bucket:
+            self._maxes[number] = bucket[-1]
+            self._update(number, -1)
+        else:
+            del self._buckets[number]
+            del self._maxes[number]
+            self._rebuild_tree()
+        return rank
+
+    def rank(self, key):
+        number = bisect_left(self._maxes, key)
+        if number == len(self._buckets):
+            raise KeyError(key)
+        position = bisect_left(self._buckets[number], key)
+        if self._buckets[number][position] != key:
+            raise KeyError(key)
+        return self._before(number) + position
+
+    def slice(self, start, stop):
+        """Keys from rank ``start`` up to ``stop``"""
+        keys = []
+        seen = 0
+        for bucket in self._buckets:
+            if seen + len(bucket) > start:
+                keys.extend(bucket[max(0, start - seen):stop - seen])
+                if seen + len(bucket) >= stop:
+                    break
+            seen += len(bucket)
+        return keys
+
+
+class RankingSession:
+    """A ranked task list kept on the server and edited with diffs.
+
+    Tasks get stable integer ids; the initial tasks are numbered from 1 in
+    list order, so ids match the positions used by ``dependencies``, and
+    later ``dependencies`` refer to these ids. Ties rank by id, which
+    reproduces the order of ``analyze_and_sort_tasks`` for the initial
+    list.
+    """
+
+    def __init__(self, records, strategy="smart_balance", today=None):
+        self.strategy = get_strategy(strategy)
+        self.lock = threading.Lock()
+        self.tasks = {pk: record for pk, record in enumerate(records, 1)}
+        self.next_id = len(records) + 1
+        self.rescore_all(today)
+
+    def rescore_all(self, today=None):
+        self.today = today or date.today()
+        self.multipliers = multipliers_by_id(
+            (pk, record.dependencies) for pk, record in self.tasks.items())
+        self.dependents = {}
+        for pk, record in self.tasks.items():
+            self._link(pk, record.dependencies)
+        self.scores = self._score(list(self.tasks))
+        self.ranking = RankedList((-score, pk) for pk, score in self.scores.items())
+
+    def refresh(self, today=None):
+        """Rescore everything once the date has rolled over; True when it did"""
+        today = today or date.today()
+        if today == self.today:
+            return False
+        self.rescore_all(today)
+        return True
+
+    def _score(self, ids):
+        records = [self.tasks[pk] for pk in ids]
+        columns = TaskColumns(records, self.today, [self.multipliers[pk] for pk in ids])
+        return dict(zip(ids, columns.priority_scores(self.strategy)))
+
+    def entry(self, pk):
+        record = self.tasks[pk]
+        days = record.due - self.today.toordinal() if record.due is not None else None
+        explanation = describe_score(days, record.importance, record.hours,
+                                     len(record.dependencies))
+        return dict(record.task, task_id=pk, priority_score=self.scores[pk],
+                    explanation=explanation)
+
+    def view(self, start=0, stop=None):
+        stop = len(self.ranking) if stop is None else stop
+        return [self.entry(pk) for _, pk in self.ranking.slice(start, stop)]
+
+    def validate(self, add=(), update=(), remove=()):
+        """Records for a diff; raises TaskValidationError listing every bad entry"""
+        errors = []
+        dates = {}
+        added = []
+        for index, task in enumerate(add):
+            record, error = task_record(task, dates)
+            if error:
+                errors.append({"op": "add", "index": index, "error": error})
+            added.append(record)
+
+        updated = {}
+        for index, change in enumerate(update):
+            pk = change.get("task_id") if isinstance(change, dict) else None
+            if not isinstance(pk, int) or pk not in self.tasks or pk in updated:
+                errors.append({"op": "update", "index": index, "error": "Unknown task_id"})
+                continue
+            fields = {key: value for key, value in change.items() if key != "task_id"}
+            record, error = task_record(dict(self.tasks[pk].task, **fields), dates)
+            if error:
+                errors.append({"op": "update", "index": index, "error": error})
+            updated[pk] = record
+
+        removed = []
+        for index, pk in enumerate(remove):
+            if not isinstance(pk, int) or pk not in self.tasks or pk in removed:
+                errors.append({"op": "remove", "index": index, "error": "Unknown task_id"})
+            removed.append(pk)
+
+        if errors:
+            raise TaskValidationError(errors)
+        return added, updated, removed
+
+    def _link(self, pk, dependencies, linked=True):
+        for dep in dependencies:
+            if type(dep) is int:
+                if linked:
+                    self.dependents.setdefault(dep, set()).add(pk)
+                else:
+                    self.dependents.get(dep, set()).discard(pk)
+
+    def _edges(self, pk):
+        tasks = self.tasks
+        return [dep for dep in tasks[pk].dependencies if type(dep) is int and dep in tasks]
+
+    def _cycle_through(self, pk):
+        """Members of ``pk``'s strongly connected component if it lies on a cycle.
+
+        Everything on a cycle with ``pk`` is both reachable from it and
+        reaches it, so the backward search only walks the forward set.
+        """
+        forward = {pk}
+        stack = [pk]
+        while stack:
+            for dep in self._edges(stack.pop()):
+                if dep not in forward:
+                    forward.add(dep)
+                    stack.append(dep)
+
+        component = {pk}
+        stack = [pk]
+        while stack:
+            for dependent in self.dependents.get(stack.pop(), ()):
+                if dependent in forward and dependent not in component:
+                    component.add(dependent)
+                    stack.append(dependent)
+        if len(component) > 1 or pk in self._edges(pk):
+            return component
+        return set()
+
+    def _multiplier(self, pk, in_cycle):
+        count = len(self.tasks[pk].dependencies)
+        if count == 0:
+            return 1.0
+        if in_cycle:
+            return 0.5
+        return 1.2 if count == 1 else 1.5
+
+    def apply(self, add=(), update=(), remove=()):
+        """Apply a diff and return the rank moves it caused.
+
+        Each move is ``{"task_id", "from", "to"}`` plus the task's new
+        entry; applying them in order to the previous ranking (remove at
+        ``from``, then insert at ``to``) gives the new one. Only the edited
+        tasks, the dependents whose lists lost a removed task and tasks
+        whose cycle multiplier changed are rescored.
+
+        Only cycles through a task whose dependency list changed can
+        appear or disappear, so cycle membership is re-checked just for
+        those tasks' components before and after the edit instead of
+        re-running the whole graph.
+        """
+        added, updated, removed = self.validate(add, update, remove)
+        new_ids = list(range(self.next_id, self.next_id + len(added)))
+
+        # Tasks whose outgoing dependency edges change with this diff
+        sources = {pk for pk, record in updated.items()
+                   if record.dependencies != self.tasks[pk].dependencies}
+        sources |= set(removed)
+        for pk in removed + new_ids:
+            sources |= self.dependents.get(pk, set())
+        sources &= set(self.tasks)
+        was_cyclic = set()
+        for pk in sources:
+            if pk not in was_cyclic:
+                was_cyclic |= self._cycle_through(pk)
+
+        touched = set(updated)
+        for pk, record in updated.items():
+            self._link(pk, self.tasks[pk].dependencies, linked=False)
+            self._link(pk, record.dependencies)
+            self.tasks[pk] = record
+        gone = set(removed)
+        for pk in removed:
+            self._link(pk, self.tasks.pop(pk).dependencies, linked=False)
+        for pk in removed:
+            for dependent in self.dependents.pop(pk, set()):
+                if dependent in self.tasks:
+                    record = self.tasks[dependent]
+                    record.dependencies = [dep for dep in record.dependencies if dep not in gone]
+                    record.task = dict(record.task, dependencies=record.dependencies)
+                    touched.add(dependent)
+        for pk, record in zip(new_ids, added):
+            self.tasks[pk] = record
+            self._link(pk, record.dependencies)
+        self.next_id += len(added)
+
+        candidates = (was_cyclic | sources | set(new_ids)) - gone
+        is_cyclic = set()
+        for pk in candidates:
+            if pk not in is_cyclic:
+                is_cyclic |= self._cycle_through(pk)
+        for pk in candidates | is_cyclic | touched:
+            multiplier = self._multiplier(pk, pk in is_cyclic)
+            if self.multipliers.get(pk) != multiplier:
+                self.multipliers[pk] = multiplier
+                touched.add(pk)
+
+        moves = []
+        for pk in removed:
+            moves.append({"task_id": pk, "from": self.ranking.remove((-self.scores.pop(pk), pk)),
+                          "to": None})
+            self.multipliers.pop(pk, None)
+
+        touched = sorted(touched - gone - set(new_ids))
+        fresh = self._score(touched + new_ids)
+        for pk in touched:
+            old = self.ranking.remove((-self.scores[pk], pk))
+            self.scores[pk] = fresh[pk]
+            moves.append({"task_id": pk, "from": old,
+                          "to": self.ranking.add((-fresh[pk], pk)), "task": self.entry(pk)})
+        for pk in new_ids:
+            self.scores[pk] = fresh[pk]
+            moves.append({"task_id": pk, "from": None,
+                          "to": self.ranking.add((-fresh[pk], pk)), "task": self.entry(pk)})
+        return moves
+
+
+class RankingSessionStore:
+    """In-process sessions, dropped when idle longer than the TTL or least recently used"""
+
+    def __init__(self):
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, session):
+        key = secrets.token_urlsafe(16)
+        limit = getattr(settings, "TASK_RANKING_SESSION_LIMIT", 1000)
+        with self._lock:
+            self._expire()
+            self._sessions[key] = (session, time.monotonic())
+            while len(self._sessions) > limit:
+                self._sessions.popitem(last=False)
+        return key
+
+    def get(self, key):
+        with self._lock:
+            self._expire()
+            entry = self._sessions.get(key)
+            if entry is None:
+                return None
+            self._sessions[key] = (entry[0], time.monotonic())
+            self._sessions.move_to_end(key)
+            return entry[0]
+
+    def delete(self, key):
+        with self._lock:
+            return self._sessions.pop(key, None) is not None
+
+    def _expire(self):
+        cutoff = time.monotonic() - getattr(settings, "TASK_RANKING_SESSION_TTL", 3600)
+        while self._sessions:
+            key, (_, used) = next(iter(self._sessions.items()))
+            if used >= cutoff:
+                break
+            del self._sessions[key]
+
+
+sessions = RankingSessionStore()
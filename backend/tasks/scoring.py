@@ -1,5 +1,19 @@
+import heapq
+import itertools
+import sys
 from datetime import datetime, date
 
+from .batch import TaskColumns
+from .graph import DependencyIndex
+from .instrumentation import stage
+from .strategies import get_strategy
+from .validation import as_records
+
+# Bump whenever the same input would score or explain differently, so
+# cached scores and ETags from earlier code are never reused
+SCORING_VERSION = 1
+
+
 def calculate_urgency_score(task):
     if not task.get('due_date'):
         return 50
@@ -38,57 +52,23 @@ def calculate_effort_score(task):
 
 def detect_circular_dependencies(tasks):
     """Detect circular dependencies in tasks"""
-    graph = {}
-
-    # Build dependency graph
-    for i, task in enumerate(tasks):
-        task_id = i + 1  # Use index + 1 as task ID
-        graph[task_id] = task.get('dependencies', [])
-
-    # Check for cycles using DFS
-    def has_cycle(node, visited, stack):
-        visited[node] = True
-        stack[node] = True
-
-        for neighbor in graph.get(node, []):
-            if not visited.get(neighbor, False):
-                if has_cycle(neighbor, visited, stack):
-                    return True
-            elif stack.get(neighbor, False):
-                return True
-
-        stack[node] = False
-        return False
+    return DependencyIndex(tasks).has_cycle
 
-    # Check each node for cycles
-    visited = {}
-    stack = {}
-
-    for node in graph:
-        if not visited.get(node, False):
-            if has_cycle(node, visited, stack):
-                return True
-
-    return False
-
-def calculate_dependency_score(task, all_tasks=None):
+def calculate_dependency_score(task, all_tasks=None, index=None):
     """Calculate dependency multiplier based on blocking tasks"""
     dependencies = task.get('dependencies', [])
 
     if not dependencies:
         return 1.0
 
-    # If we have all tasks, check for circular dependencies
-    if all_tasks and detect_circular_dependencies(all_tasks):
-        # Penalize tasks involved in circular dependencies
-        task_index = None
-        for i, t in enumerate(all_tasks):
-            if t.get('title') == task.get('title'):
-                task_index = i + 1
-                break
-
-        if task_index and any(dep == task_index for dep in dependencies):
-            return 0.5  # Heavy penalty for circular dependencies
+    # With the whole batch available, read the multiplier from the
+    # precomputed index; it penalizes tasks that sit on a cycle
+    if index is None and all_tasks:
+        index = DependencyIndex(all_tasks)
+    if index is not None:
+        position = index.position(task)
+        if position is not None:
+            return index.multipliers[position]
 
     # Count how many tasks this task blocks
     blocking_count = len(dependencies)
@@ -100,72 +80,198 @@ def calculate_dependency_score(task, all_tasks=None):
     else:
         return 1.0  # Fallback
 
-def calculate_priority_score(task, strategy="smart_balance"):
-    weights = {
-        "fastest_wins": {"urgency": 0.2, "importance": 0.2, "effort": 0.5, "dependency": 0.1},
-        "high_impact": {"urgency": 0.1, "importance": 0.7, "effort": 0.1, "dependency": 0.1},
-        "deadline_driven": {"urgency": 0.6, "importance": 0.2, "effort": 0.1, "dependency": 0.1},
-        "smart_balance": {"urgency": 0.4, "importance": 0.3, "effort": 0.2, "dependency": 0.1}
-    }
-    
-    w = weights.get(strategy, weights["smart_balance"])
-    
-    urgency = calculate_urgency_score(task)
-    importance = calculate_importance_score(task)
-    effort = calculate_effort_score(task)
-    dependency = calculate_dependency_score(task)
+def days_until_due(task, today=None):
+    """Days from today to the task's due date, or None when it has none"""
+    if not task.get('due_date'):
+        return None
+    due_date = datetime.strptime(task['due_date'], '%Y-%m-%d').date()
+    return (due_date - (today or date.today())).days
+
+def calculate_priority_score(task, strategy="smart_balance", index=None):
+    profile = get_strategy(strategy)
     
-    # Simple calculation that won't exceed 100
-    final_score = (urgency * w["urgency"] + 
-                   importance * w["importance"] + 
-                   effort * w["effort"]) * dependency
+    urgency = profile.urgency(days_until_due(task))
+    importance = profile.importance(task.get('importance', 5))
+    effort = profile.effort(task.get('estimated_hours', 0))
+    dependency = calculate_dependency_score(task, index=index)
     
-    return min(100, round(final_score, 2))  # Never above 100
+    # Never above 100
+    return profile.score(urgency, importance, effort, dependency)
 
 def generate_score_explanation(task, score):
-    explanations = []
-    
-    # Urgency
-    if task.get('due_date'):
-        due_date = datetime.strptime(task['due_date'], '%Y-%m-%d').date()
-        today = date.today()
-        days_diff = (due_date - today).days
-        
-        if days_diff < 0:
-            explanations.append("OVERDUE - Critical")
-        elif days_diff == 0:
-            explanations.append("Due TODAY")
-        elif days_diff <= 2:
-            explanations.append("Due soon")
-    
-    # Importance
-    imp = task.get('importance', 5)
-    if imp >= 9:
-        explanations.append("Very important")
-    elif imp >= 7:
-        explanations.append("Important")
-    
-    # Effort
-    hours = task.get('estimated_hours', 0)
-    if hours <= 1:
-        explanations.append("Quick task")
-    elif hours >= 4:
-        explanations.append("Takes time")
-    
-    # Dependencies
-    deps = task.get('dependencies', [])
-    if deps:
-        explanations.append(f"Blocks {len(deps)} tasks")
-    
-    return " + ".join(explanations) if explanations else "Balanced priority"
-
-def analyze_and_sort_tasks(tasks, strategy="smart_balance"):
-    analyzed_tasks = []
-    for task in tasks:
-        task_copy = task.copy()
-        priority_score = calculate_priority_score(task_copy, strategy)
-        task_copy['priority_score'] = priority_score
-        task_copy['explanation'] = generate_score_explanation(task_copy, priority_score)
-        analyzed_tasks.append(task_copy)
-    analyzed_tasks.sort(key=lambda x: x['priority_score'], reverse=True)
-    return analyzed_tasks
+    return describe_score(days_until_due(task),
+                          task.get('importance', 5),
+                          task.get('estimated_hours', 0),
+                          len(task.get('dependencies') or ()))
+
+def explanation_key(days_diff, imp, hours, dependency_count):
+    """The (urgency, importance, effort, dependency count) buckets behind an explanation"""
+    # Urgency: none, overdue, today, soon
+    if days_diff is None or days_diff > 2:
+        urgency = 0
+    elif days_diff < 0:
+        urgency = 1
+    elif days_diff == 0:
+        urgency = 2
+    else:
+        urgency = 3
+
+    # Importance: plain, important, very important
+    importance = 2 if imp >= 9 else 1 if imp >= 7 else 0
+
+    # Effort: medium, quick, takes time
+    effort = 1 if hours <= 1 else 2 if hours >= 4 else 0
+
+    return urgency, importance, effort, dependency_count
+
+URGENCY_NOTES = (None, "OVERDUE - Critical", "Due TODAY", "Due soon")
+IMPORTANCE_NOTES = (None, "Important", "Very important")
+EFFORT_NOTES = (None, "Quick task", "Takes time")
+
+def _explanation_text(key):
+    urgency, importance, effort, dependency_count = key
+    notes = [note for note in (URGENCY_NOTES[urgency], IMPORTANCE_NOTES[importance],
+                               EFFORT_NOTES[effort]) if note]
+    if dependency_count:
+        notes.append(f"Blocks {dependency_count} tasks")
+    return sys.intern(" + ".join(notes) if notes else "Balanced priority")
+
+# Every explanation for up to this many dependencies is built at import;
+# longer dependency lists are added the first time one is explained
+TABLE_DEPENDENCIES = 16
+EXPLANATIONS = {
+    key: _explanation_text(key)
+    for key in itertools.product(range(4), range(3), range(3), range(TABLE_DEPENDENCIES + 1))
+}
+
+def describe_score(days_diff, imp, hours, dependency_count):
+    """Explanation text for already-extracted task fields, read from ``EXPLANATIONS``"""
+    key = explanation_key(days_diff, imp, hours, dependency_count)
+    text = EXPLANATIONS.get(key)
+    if text is None:
+        text = EXPLANATIONS.setdefault(key, _explanation_text(key))
+    return text
+
+def score_breakdown(strategy, days_diff, imp, hours, multiplier):
+    """Component scores of one task and their weighted share of its priority score.
+
+    The weighted shares include the dependency multiplier, so they add up
+    to the priority score before it is capped at 100, up to rounding.
+    """
+    components = {
+        "urgency": strategy.urgency(days_diff),
+        "importance": strategy.importance(imp),
+        "effort": strategy.effort(hours),
+    }
+    breakdown = {name: round(value, 2) for name, value in components.items()}
+    breakdown["dependency_multiplier"] = multiplier
+    breakdown["weighted"] = {name: round(value * strategy.weights[name] * multiplier, 2)
+                             for name, value in components.items()}
+    return breakdown
+
+def breakdowns(records, multipliers, strategy, today):
+    """``score_breakdown`` by position for a batch, computed only when called"""
+    today = today.toordinal()
+    def breakdown(i):
+        record = records[i]
+        days_diff = None if record.due is None else record.due - today
+        return score_breakdown(strategy, days_diff, record.importance, record.hours,
+                               multipliers[i])
+    return breakdown
+
+def rank_tasks(records, scores, explain, limit=None, projection=None, breakdown=None):
+    """The tasks best first, with score and explanation attached.
+
+    With ``limit`` only the top tasks are selected, using a heap instead of
+    a full sort; ``heapq.nlargest`` keeps the stable-sort tie order. Output
+    dicts, explanations and ``breakdown``s are built only for the tasks
+    that are returned, in the shape given by ``projection``.
+    """
+    with stage("sort"):
+        if limit is None:
+            order = sorted(range(len(records)), key=scores.__getitem__, reverse=True)
+        else:
+            order = heapq.nlargest(limit, range(len(records)), key=scores.__getitem__)
+
+    return present_tasks(records, scores, order, explain, projection, breakdown)
+
+def present_tasks(records, scores, order, explain, projection=None, breakdown=None):
+    """Output tasks for the positions in ``order``, shaped by ``projection``"""
+    with stage("explain"):
+        if projection is not None:
+            return [projection.task(records[i], i, scores[i], explain, breakdown) for i in order]
+        return [dict(records[i].task, priority_score=scores[i], explanation=explain(i))
+                for i in order]
+
+def dependency_index(records):
+    """DependencyIndex over validated records"""
+    return DependencyIndex(records, [record.dependencies for record in records])
+
+def analyze_and_sort_tasks(tasks, strategy="smart_balance", limit=None, today=None, cache=None,
+                           multipliers=None, projection=None):
+    """Score tasks and return them best first.
+
+    ``tasks`` are TaskRecords or plain dicts, which are validated first.
+    Explanations are built only for the tasks that are returned. A
+    ``ScoreCache`` can be passed to reuse the scores of a repeated batch, and
+    ``multipliers`` when ``tasks`` is a slice of a larger dependency graph.
+    A ``serializers.Projection`` picks the fields of each returned task.
+    """
+    today = today or date.today()
+    profile = get_strategy(strategy)
+    records = as_records(tasks)
+    scores, multipliers, explain = score_records(records, profile, today, cache, multipliers)
+    return rank_tasks(records, scores, explain, limit, projection,
+                      breakdowns(records, multipliers, profile, today))
+
+def score_records(records, profile, today, cache=None, multipliers=None):
+    """Scores of validated records under one compiled strategy.
+
+    Returns ``(scores, multipliers, explain)``, where ``explain(i)`` builds
+    the explanation of the task at position ``i`` when it is needed. A
+    ``ScoreCache`` hit supplies the scores and multipliers of the whole
+    batch, skipping the dependency graph as well.
+    """
+    cached = key = None
+    if cache is not None:
+        key = cache.key(records, multipliers, profile, today)
+        cached = cache.get(key)
+    if cached is not None:
+        scores, multipliers = cached
+    elif multipliers is None:
+        with stage("dependency_graph"):
+            multipliers = dependency_index(records).multipliers
+
+    with stage("score"):
+        columns = TaskColumns(records, today, multipliers)
+        if cached is None:
+            scores = columns.priority_scores(profile)
+            if cache is not None:
+                cache.set(key, scores, multipliers)
+    return scores, multipliers, lambda i: describe_score(*columns.explanation_fields(i))
+
+def analyze_with_strategies(tasks, strategies, limit=None, today=None, projection=None):
+    """Rank the same tasks under several strategies in a single pass.
+
+    Dates, components and dependency multipliers are computed once and
+    projected onto every strategy's weights; explanations do not depend on
+    the strategy, so each task's is built at most once.
+    """
+    today = today or date.today()
+    records = as_records(tasks)
+    with stage("dependency_graph"):
+        multipliers = dependency_index(records).multipliers
+    with stage("score"):
+        columns = TaskColumns(records, today, multipliers)
+        compiled = [get_strategy(name) for name in strategies]
+        score_lists = columns.priority_score_matrix(compiled)
+
+    explanations = {}
+    def explain(i):
+        if i not in explanations:
+            explanations[i] = describe_score(*columns.explanation_fields(i))
+        return explanations[i]
+
+    return {strategy: rank_tasks(records, scores, explain, limit, projection,
+                                 breakdowns(records, multipliers, profile, today))
+            for strategy, profile, scores in zip(strategies, compiled, score_lists)}
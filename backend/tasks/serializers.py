@@ -0,0 +1,154 @@
+import gzip
+import json
+import zlib
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used without it
+    orjson = None
+
+JSON_CONTENT_TYPE = "application/json"
+FORMATS = ("full", "compact")
+COMPACT_FIELDS = ("position", "priority_score")
+
+
+def dumps(data):
+    """Compact UTF-8 JSON bytes, encoded by orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            # orjson refuses integers beyond 64 bits and lone surrogates
+            pass
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+
+
+def _ranked_field(name):
+    if name == "position":
+        return lambda record, index, score, explain, breakdown: index + 1
+    if name == "priority_score":
+        return lambda record, index, score, explain, breakdown: score
+    if name == "explanation":
+        return lambda record, index, score, explain, breakdown: explain(index)
+    if name == "score_breakdown":
+        return lambda record, index, score, explain, breakdown: breakdown(index)
+    return lambda record, index, score, explain, breakdown: record.task.get(name)
+
+
+class Projection:
+    """How each ranked task is written into a response.
+
+    By default a task is its input dict plus ``priority_score`` and, unless
+    ``explain`` is False, ``explanation``. With ``fields`` it carries only
+    those: input fields by name, ``position`` (its 1-based place in the
+    request, as used by ``dependencies``), ``priority_score``,
+    ``explanation`` and ``score_breakdown``. Compact rankings are lists of
+    rows with the fields in order, by default ``position`` and
+    ``priority_score``. ``explain`` and ``breakdown`` add their field to
+    any layout; neither is computed unless it is returned.
+    """
+
+    def __init__(self, fields=None, compact=False, explain=None, breakdown=False):
+        if compact and not fields:
+            fields = COMPACT_FIELDS
+        self.fields = list(fields) if fields else None
+        self.compact = compact
+        self.explain = explain is not False
+        self.breakdown = breakdown
+        if self.fields is not None:
+            for name, wanted in (("explanation", explain), ("score_breakdown", breakdown)):
+                if wanted and name not in self.fields:
+                    self.fields.append(name)
+            self._getters = [_ranked_field(name) for name in self.fields]
+
+    def task(self, record, index, score, explain, breakdown=None):
+        if self.fields is None:
+            task = dict(record.task, priority_score=score)
+            if self.explain:
+                task["explanation"] = explain(index)
+            if self.breakdown:
+                task["score_breakdown"] = breakdown(index)
+            return task
+        values = [get(record, index, score, explain, breakdown) for get in self._getters]
+        if self.compact:
+            return values
+        return dict(zip(self.fields, values))
+
+
+def parse_flag(value, name):
+    """A boolean option given as JSON or as a query string value; None when absent"""
+    if value is None or isinstance(value, bool):
+        return value
+    if value in ("true", "1"):
+        return True
+    if value in ("false", "0"):
+        return False
+    raise ValueError(f"{name} must be true or false")
+
+
+def parse_projection(fields=None, format=None, explain=None, breakdown=None):
+    """Projection from request values; ``fields`` is a list or comma-separated string"""
+    if format is None:
+        format = "full"
+    if format not in FORMATS:
+        raise ValueError("Format must be \"full\" or \"compact\"")
+    if isinstance(fields, str):
+        fields = [name.strip() for name in fields.split(",") if name.strip()]
+    if fields is not None and (not isinstance(fields, list) or not fields or
+                               not all(isinstance(name, str) and name for name in fields)):
+        raise ValueError("Fields must be a list of field names")
+    return Projection(fields, format == "compact", parse_flag(explain, "explain"),
+                      bool(parse_flag(breakdown, "breakdown")))
+
+
+def accepted_encoding(request):
+    """``gzip`` or ``deflate`` when the request accepts it, otherwise None"""
+    qualities = {}
+    for part in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    for coding in ("gzip", "deflate"):
+        if qualities.get(coding, qualities.get("*", 0)) > 0:
+            return coding
+    return None
+
+
+def compress(content, coding):
+    level = getattr(settings, "TASK_COMPRESS_LEVEL", 3)
+    if coding == "gzip":
+        return gzip.compress(content, compresslevel=level, mtime=0)
+    return zlib.compress(content, level)
+
+
+def json_response(request, data, status=200):
+    """JSON response through ``dumps``, compressed when large and the client accepts it.
+
+    Bodies under ``TASK_COMPRESS_MIN_BYTES`` are sent as they are; with
+    the setting at None nothing is compressed. ``?debug=1`` responses stay
+    uncompressed so the timings block can be added to them.
+    """
+    content = dumps(data)
+    response = HttpResponse(content, content_type=JSON_CONTENT_TYPE, status=status)
+    minimum = getattr(settings, "TASK_COMPRESS_MIN_BYTES", None)
+    if minimum is None or len(content) < minimum or request.GET.get("debug") == "1":
+        return response
+
+    patch_vary_headers(response, ("Accept-Encoding",))
+    coding = accepted_encoding(request)
+    if coding is not None:
+        response.content = compress(content, coding)
+        response["Content-Encoding"] = coding
+        response["Content-Length"] = str(len(response.content))
+    return response
@@ -0,0 +1,225 @@
+from datetime import date
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, Q
+
+from .batch import TaskColumns
+from .db import read_alias
+from .graph import multipliers_by_id
+from .models import Task, TaskDependency, TaskScore
+from .scoring import describe_score
+from .strategies import registry
+
+
+def batch_size():
+    return getattr(settings, "TASK_IMPORT_BATCH_SIZE", 1000)
+
+
+def with_dependencies(tasks, prefix=""):
+    """Prefetch the dependency edges ``task_as_dict`` reads, in list order"""
+    return tasks.prefetch_related(Prefetch(prefix + "dependency_edges",
+                                           queryset=TaskDependency.objects.order_by("id")))
+
+
+def dependency_ids(task):
+    return [edge.depends_on_id for edge in task.dependency_edges.all()]
+
+
+def task_as_dict(task):
+    """Plain dict of a stored task, as the API and scoring functions expect"""
+    return {
+        "id": task.id,
+        "project": task.project,
+        "title": task.title,
+        "due_date": task.due_date.isoformat(),
+        "estimated_hours": task.estimated_hours,
+        "importance": task.importance,
+        "dependencies": dependency_ids(task),
+    }
+
+
+def dependency_multipliers(owner=""):
+    """Cycle-aware dependency multiplier of every task of one owner, keyed by id.
+
+    Only the owner's task ids and dependency edges are loaded, both read
+    off indexes.
+    """
+    lists = {pk: [] for pk in Task.objects.filter(owner=owner).order_by("id")
+                                          .values_list("id", flat=True)}
+    edges = (TaskDependency.objects.filter(task__owner=owner).order_by("id")
+             .values_list("task_id", "depends_on_id"))
+    for pk, dep in edges:
+        lists[pk].append(dep)
+    return multipliers_by_id(lists.items())
+
+
+def stored_multipliers(owner=""):
+    """Dependency multiplier each task of an owner was last scored with, keyed by id"""
+    return dict(Task.objects.filter(owner=owner).values_list("id", "dependency_multiplier"))
+
+
+def rescore(task_ids, multipliers=None, today=None):
+    """Recompute and store every strategy's score for tasks of one owner.
+
+    Tasks are loaded and written ``TASK_IMPORT_BATCH_SIZE`` at a time, so
+    any number of ids can be passed. Each task's multiplier is stored with
+    it, so later edits that leave the graph alone can reuse it.
+    """
+    today = today or date.today()
+    task_ids = sorted(task_ids)
+    strategies = list(registry)
+    count = 0
+    for start in range(0, len(task_ids), batch_size()):
+        tasks = list(with_dependencies(Task.objects.filter(
+            id__in=task_ids[start:start + batch_size()])).order_by("id"))
+        if not tasks:
+            continue
+        if multipliers is None:
+            multipliers = dependency_multipliers(tasks[0].owner)
+
+        columns = TaskColumns([task_as_dict(task) for task in tasks], today,
+                              [multipliers[task.id] for task in tasks])
+        moved = []
+        for task in tasks:
+            if task.dependency_multiplier != multipliers[task.id]:
+                task.dependency_multiplier = multipliers[task.id]
+                moved.append(task)
+        rows = []
+        for strategy, scores in zip(strategies, columns.priority_score_matrix(strategies)):
+            for task, score in zip(tasks, scores):
+                rows.append(TaskScore(task=task, owner=task.owner, strategy=strategy.name,
+                                      priority_score=score, scored_on=today))
+
+        with transaction.atomic():
+            TaskScore.objects.filter(task_id__in=[task.id for task in tasks]).delete()
+            TaskScore.objects.bulk_create(rows, batch_size=batch_size())
+            Task.objects.bulk_update(moved, ["dependency_multiplier"], batch_size=batch_size())
+        count += len(tasks)
+    return count
+
+
+def changed_multipliers(before, after):
+    """Ids of tasks whose dependency multiplier differs between two graphs"""
+    return {pk for pk, multiplier in after.items() if before.get(pk) != multiplier}
+
+
+def set_dependencies(task, dependencies):
+    TaskDependency.objects.filter(task=task).delete()
+    TaskDependency.objects.bulk_create(TaskDependency(task=task, depends_on_id=dep)
+                                       for dep in dependencies)
+
+
+def save_task(task, fields):
+    """Create or update a task and refresh only the scores it affects.
+
+    Editing a task's own fields only changes its own scores, under the
+    multiplier stored with it, so the graph is not reloaded. Editing its
+    dependencies can also move other tasks onto or off a cycle, so the
+    graph is rebuilt once and every task whose multiplier changes is
+    rescored with it.
+    """
+    fields = dict(fields)
+    dependencies = fields.pop("dependencies", None)
+    dependencies_changed = task.pk is None or (
+        dependencies is not None and dependencies != dependency_ids(task)
+    )
+
+    for name, value in fields.items():
+        setattr(task, name, value)
+
+    with transaction.atomic():
+        task.save()
+        if not dependencies_changed:
+            rescore({task.pk}, {task.pk: task.dependency_multiplier})
+            return task
+
+        before = stored_multipliers(task.owner)
+        if dependencies is not None:
+            set_dependencies(task, dependencies)
+        after = dependency_multipliers(task.owner)
+        rescore({task.pk} | changed_multipliers(before, after), after)
+    return task
+
+
+def delete_task(task):
+    """Delete a task, which drops it from its dependents, and rescore those that changed"""
+    with transaction.atomic():
+        before = stored_multipliers(task.owner)
+        dependents = set(TaskDependency.objects.filter(depends_on=task)
+                         .values_list("task_id", flat=True))
+        # Cascades to the task's edges in both directions
+        task.delete()
+
+        after = dependency_multipliers(task.owner)
+        rescore(changed_multipliers(before, after) | dependents, after)
+
+
+def import_tasks(rows, owner="", project="", today=None):
+    """Create a batch of validated tasks in one transaction and score them.
+
+    ``rows`` hold model field values plus ``dependencies`` as 1-based
+    positions within the batch, as in an analyze request. Tasks, edges
+    and scores are each written with ``bulk_create`` in batches of
+    ``TASK_IMPORT_BATCH_SIZE``. Imported tasks only depend on each other,
+    so no existing task's score changes. Returns the new ids in order.
+    """
+    with transaction.atomic():
+        created = Task.objects.bulk_create(
+            [Task(owner=owner, project=project,
+                  **{name: value for name, value in row.items() if name != "dependencies"})
+             for row in rows],
+            batch_size=batch_size(),
+        )
+        ids = [task.pk for task in created]
+        TaskDependency.objects.bulk_create(
+            (TaskDependency(task_id=pk, depends_on_id=ids[dep - 1])
+             for pk, row in zip(ids, rows) for dep in row["dependencies"]),
+            batch_size=batch_size(),
+        )
+        rescore(ids, dependency_multipliers(owner), today)
+    return ids
+
+
+def refresh_stale_scores(strategy="smart_balance", today=None, owner=""):
+    """Rescore an owner's tasks whose stored scores were computed on an earlier day.
+
+    Tasks with no row for ``strategy`` yet, for example after a new
+    profile was registered, are scored too.
+    """
+    today = today or date.today()
+    stale = set(TaskScore.objects.filter(owner=owner, scored_on__lt=today)
+                .values_list("task_id", flat=True))
+    stale |= set(Task.objects.filter(owner=owner).exclude(scores__strategy=strategy)
+                 .values_list("id", flat=True))
+    if stale:
+        rescore(stale, dependency_multipliers(owner), today)
+    return len(stale)
+
+
+def top_tasks(strategy="smart_balance", limit=10, today=None, after=None, owner="", project=None):
+    """Best stored tasks of an owner under a strategy, read straight off the score index.
+
+    ``after`` is the ``(priority_score, task_id)`` of the last task of the
+    previous page; the next page continues from it on the index instead
+    of counting past an offset. ``project`` narrows the ranking to one
+    project. The ranking is read on the read connection.
+    """
+    today = today or date.today()
+    refresh_stale_scores(strategy, today, owner)
+
+    scores = TaskScore.objects.using(read_alias()).filter(owner=owner, strategy=strategy)
+    if project is not None:
+        scores = scores.filter(task__project=project)
+    if after is not None:
+        score, task_id = after
+        scores = scores.filter(Q(priority_score__lt=score) |
+                               Q(priority_score=score, task_id__gt=task_id))
+    scores = with_dependencies(scores.select_related("task"), "task__")
+    scores = scores.order_by("-priority_score", "task_id")[:limit]
+    ranked = [dict(task_as_dict(score.task), priority_score=score.priority_score)
+              for score in scores]
+    columns = TaskColumns(ranked, today)
+    for position, task in enumerate(ranked):
+        task["explanation"] = describe_score(*columns.explanation_fields(position))
+    return ranked
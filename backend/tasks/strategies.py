@@ -0,0 +1,262 @@
+import hashlib
+import json
+import math
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .curves import PiecewiseLinear
+
+STRATEGY_WEIGHTS = {
+    "fastest_wins": {"urgency": 0.2, "importance": 0.2, "effort": 0.5, "dependency": 0.1},
+    "high_impact": {"urgency": 0.1, "importance": 0.7, "effort": 0.1, "dependency": 0.1},
+    "deadline_driven": {"urgency": 0.6, "importance": 0.2, "effort": 0.1, "dependency": 0.1},
+    "smart_balance": {"urgency": 0.4, "importance": 0.3, "effort": 0.2, "dependency": 0.1}
+}
+
+# Due within N days -> score; overdue tasks score like the first breakpoint
+DEFAULT_URGENCY = {
+    "breakpoints": [[0, 100], [1, 90], [3, 80], [7, 60]],
+    "later": 40,
+    "no_due_date": 50,
+}
+
+# Continuous urgency: score decays from ``peak`` at 0 days left towards
+# ``floor``, tabulated per day up to ``horizon``; later due dates score
+# like the horizon. Exponential halves the distance to the floor every
+# ``half_life`` days; logistic is halfway down at ``midpoint`` days.
+URGENCY_CURVES = {
+    "exponential": {"half_life": 7, "peak": 100, "floor": 0, "horizon": 365},
+    "logistic": {"midpoint": 7, "steepness": 0.5, "peak": 100, "floor": 0, "horizon": 365},
+}
+MAX_HORIZON = 3650
+
+# Estimated hours -> score, linear between points and flat outside them
+DEFAULT_EFFORT = {
+    "breakpoints": [[0.5, 100], [2, 80], [6, 40], [12, 10]],
+}
+
+# Importance 1-10 -> score, one point per level so whole levels are exact
+DEFAULT_IMPORTANCE = {
+    "breakpoints": [[level, level * 8] for level in range(1, 11)],
+}
+
+WEIGHT_NAMES = ("urgency", "importance", "effort", "dependency")
+
+
+class StrategyError(ValueError):
+    """A strategy name or weight profile that cannot be used"""
+
+
+def _number(value, what):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise StrategyError(f"{what} must be a number")
+    return value
+
+
+def _check_keys(section, allowed, what):
+    if not isinstance(section, dict):
+        raise StrategyError(f"{what} must be an object")
+    unknown = set(section) - set(allowed)
+    if unknown:
+        raise StrategyError(f"{what} has unknown keys: {', '.join(sorted(unknown))}")
+
+
+class Strategy:
+    """A validated weight profile compiled into flat scoring functions.
+
+    ``urgency``, ``importance``, ``effort`` and ``score`` close over
+    plain locals and ``PiecewiseLinear`` curves, so scoring a task does no
+    dict lookups and no branching on which strategy is in use.
+    """
+
+    def __init__(self, name, profile):
+        _check_keys(profile, ("weights", "urgency", "importance", "effort"), f"Strategy {name!r}")
+        self.name = name
+        # Kept so worker processes can compile the same strategy
+        self.profile = profile
+
+        weights = profile.get("weights")
+        _check_keys(weights, WEIGHT_NAMES, "weights")
+        missing = [key for key in WEIGHT_NAMES[:3] if key not in weights]
+        if missing:
+            raise StrategyError(f"weights missing: {', '.join(missing)}")
+        self.weights = {key: _number(weights.get(key, 0), f"weights.{key}") for key in WEIGHT_NAMES}
+        if any(value < 0 for value in self.weights.values()):
+            raise StrategyError("weights cannot be negative")
+        if not any(self.weights[key] for key in WEIGHT_NAMES[:3]):
+            raise StrategyError("at least one of urgency, importance or effort needs weight")
+
+        urgency = profile.get("urgency", {})
+        if not isinstance(urgency, dict):
+            raise StrategyError("urgency must be an object")
+        curve = urgency.get("curve", "step")
+        if curve == "step":
+            table, overdue, no_due_date = self._urgency_steps(urgency)
+        elif isinstance(curve, str) and curve in URGENCY_CURVES:
+            table, overdue, no_due_date = self._urgency_curve(curve, urgency)
+        else:
+            raise StrategyError(f"urgency.curve must be one of: step, {', '.join(URGENCY_CURVES)}")
+        self.urgency_table = table
+        self.urgency_curve = PiecewiseLinear(range(len(table)), table)
+        self.overdue = overdue
+        self.no_due_date = no_due_date
+
+        # Scores for days without a due date or overdue are handled by
+        # ``urgency``; everything else is read off a curve
+        self.importance = self._curve(profile, "importance", DEFAULT_IMPORTANCE)
+        self.effort = self._curve(profile, "effort", DEFAULT_EFFORT)
+        self.urgency = self._compile_urgency()
+        self.score = self._compile_score()
+
+        # Strategies sharing curves can share one components pass
+        self.curves = json.dumps([table, overdue, no_due_date,
+                                  self.importance.points(), self.effort.points()])
+        canonical = json.dumps([self.weights, self.curves])
+        self.fingerprint = hashlib.blake2b(canonical.encode(), digest_size=8).hexdigest()
+
+    def _urgency_steps(self, urgency):
+        _check_keys(urgency, ("curve", "breakpoints", "later", "no_due_date", "overdue"), "urgency")
+        urgency = dict(DEFAULT_URGENCY, **urgency)
+        days, scores = self._breakpoints(urgency["breakpoints"], "urgency")
+        if any(not isinstance(day, int) or day < 0 for day in days):
+            raise StrategyError("urgency breakpoints must use whole, non-negative days")
+        later = _number(urgency["later"], "urgency.later")
+        no_due_date = _number(urgency["no_due_date"], "urgency.no_due_date")
+        overdue = _number(urgency.get("overdue", scores[0]), "urgency.overdue")
+
+        # One entry per day up to the last breakpoint, then ``later``
+        table = []
+        for day in range(days[-1] + 1):
+            table.append(next(score for limit, score in zip(days, scores) if day <= limit))
+        table.append(later)
+        return table, overdue, no_due_date
+
+    def _urgency_curve(self, curve, urgency):
+        defaults = URGENCY_CURVES[curve]
+        _check_keys(urgency, ("curve", "no_due_date", "overdue", *defaults), "urgency")
+        options = {key: _number(urgency.get(key, default), f"urgency.{key}")
+                   for key, default in defaults.items()}
+        peak, floor, horizon = options["peak"], options["floor"], options["horizon"]
+        if not isinstance(horizon, int) or not 1 <= horizon <= MAX_HORIZON:
+            raise StrategyError(f"urgency.horizon must be a whole number of days, 1 to {MAX_HORIZON}")
+
+        # The whole curve is evaluated here, once; scoring only indexes it
+        if curve == "exponential":
+            if options["half_life"] <= 0:
+                raise StrategyError("urgency.half_life must be positive")
+            rate = math.log(2) / options["half_life"]
+            table = [floor + (peak - floor) * math.exp(-rate * day) for day in range(horizon + 1)]
+        else:
+            if options["steepness"] <= 0:
+                raise StrategyError("urgency.steepness must be positive")
+            steepness, midpoint = options["steepness"], options["midpoint"]
+            table = [floor + (peak - floor) / (1 + math.exp(min(700, steepness * (day - midpoint))))
+                     for day in range(horizon + 1)]
+
+        no_due_date = _number(urgency.get("no_due_date", DEFAULT_URGENCY["no_due_date"]),
+                              "urgency.no_due_date")
+        overdue = _number(urgency.get("overdue", peak), "urgency.overdue")
+        return table, overdue, no_due_date
+
+    def _curve(self, profile, what, default):
+        section = profile.get(what, {})
+        _check_keys(section, ("breakpoints",), what)
+        section = dict(default, **section)
+        return PiecewiseLinear(*self._breakpoints(section["breakpoints"], what))
+
+    @staticmethod
+    def _breakpoints(points, what):
+        if not isinstance(points, list) or not points:
+            raise StrategyError(f"{what} breakpoints must be a non-empty list")
+        xs, ys = [], []
+        for point in points:
+            if not isinstance(point, (list, tuple)) or len(point) != 2:
+                raise StrategyError(f"{what} breakpoints must be [x, score] pairs")
+            xs.append(_number(point[0], f"{what} breakpoint"))
+            ys.append(_number(point[1], f"{what} breakpoint score"))
+        if any(b <= a for a, b in zip(xs, xs[1:])):
+            raise StrategyError(f"{what} breakpoints must be strictly increasing")
+        return xs, ys
+
+    def _compile_urgency(self):
+        curve, overdue, no_due_date = self.urgency_curve, self.overdue, self.no_due_date
+
+        def urgency(days):
+            if days is None:
+                return no_due_date
+            if days < 0:
+                return overdue
+            return curve(days)
+        return urgency
+
+    def _compile_score(self):
+        wu = self.weights["urgency"]
+        wi = self.weights["importance"]
+        we = self.weights["effort"]
+
+        def score(urgency, importance, effort, dependency):
+            return min(100, round((urgency * wu + importance * wi + effort * we) * dependency, 2))
+        return score
+
+    def __repr__(self):
+        return f"<Strategy {self.name}>"
+
+
+class StrategyRegistry:
+    """Named strategies, validated and compiled when they are registered"""
+
+    def __init__(self):
+        self._strategies = {}
+
+    def register(self, name, profile):
+        if not isinstance(name, str) or not name:
+            raise StrategyError("Strategy name must be a non-empty string")
+        strategy = Strategy(name, profile)
+        self._strategies[name] = strategy
+        return strategy
+
+    def unregister(self, name):
+        self._strategies.pop(name, None)
+
+    def get(self, name):
+        try:
+            return self._strategies[name]
+        except (KeyError, TypeError):
+            raise StrategyError(f"Unknown strategy: {name}")
+
+    def __contains__(self, name):
+        return isinstance(name, str) and name in self._strategies
+
+    def __iter__(self):
+        return iter(self._strategies.values())
+
+    def names(self):
+        return list(self._strategies)
+
+    def fingerprint(self):
+        """Changes whenever any registered strategy is added, removed or altered"""
+        canonical = ",".join(f"{name}:{strategy.fingerprint}"
+                             for name, strategy in sorted(self._strategies.items()))
+        return hashlib.blake2b(canonical.encode(), digest_size=8).hexdigest()
+
+    def load(self, custom_profiles=None):
+        """Register the built-in strategies plus any configured profiles"""
+        self._strategies.clear()
+        for name, weights in STRATEGY_WEIGHTS.items():
+            self.register(name, {"weights": weights})
+        for name, profile in (custom_profiles or {}).items():
+            try:
+                self.register(name, profile)
+            except StrategyError as e:
+                raise ImproperlyConfigured(f"TASK_STRATEGIES[{name!r}]: {e}")
+
+
+registry = StrategyRegistry()
+
+def load_strategies():
+    registry.load(getattr(settings, "TASK_STRATEGIES", {}))
+
+def get_strategy(name):
+    """Compiled strategy for a name; raises StrategyError for unknown names"""
+    return registry.get(name)
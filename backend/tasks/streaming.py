@@ -0,0 +1,147 @@
+import heapq
+import json
+from array import array
+from datetime import date
+
+from django.conf import settings
+
+from .batch import TaskColumns
+from .graph import DependencyIndex
+from .scoring import describe_score
+from .serializers import dumps
+from .strategies import get_strategy
+from .validation import task_record
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+# Tasks are scored in small columnar chunks so memory stays flat
+CHUNK_SIZE = 1000
+
+
+class StreamError(ValueError):
+    """A line of an NDJSON upload that cannot be scored; ``status`` 413 when over a limit"""
+
+    def __init__(self, line, message, status=400):
+        super().__init__(message)
+        self.line = line
+        self.status = status
+
+
+def iter_tasks(lines, raw_lines=None):
+    """Parse and validate NDJSON task lines one at a time, yielding TaskRecords.
+
+    Uploads stop at ``TASK_MAX_BODY_BYTES`` bytes or ``TASK_MAX_TASKS``
+    tasks, counted as lines arrive since a stream has no Content-Length.
+    With a ``raw_lines`` list, each task's line is appended to it.
+    """
+    max_bytes = getattr(settings, "TASK_MAX_BODY_BYTES", None)
+    max_tasks = getattr(settings, "TASK_MAX_TASKS", None)
+    size = count = 0
+    dates = {}
+    for number, raw in enumerate(lines, 1):
+        size += len(raw)
+        if max_bytes is not None and size > max_bytes:
+            raise StreamError(number, f"Request body is over {max_bytes} bytes", status=413)
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            task = json.loads(raw)
+        except ValueError:
+            raise StreamError(number, "Invalid JSON")
+        if not isinstance(task, dict):
+            raise StreamError(number, "Each line must be a task object")
+        record, error = task_record(task, dates)
+        if error:
+            raise StreamError(number, error)
+        count += 1
+        if max_tasks is not None and count > max_tasks:
+            raise StreamError(number, f"More than {max_tasks} tasks in one request", status=413)
+        if raw_lines is not None:
+            raw_lines.append(raw)
+        yield record
+
+
+def iter_chunks(tasks, size=CHUNK_SIZE):
+    chunk = []
+    for task in tasks:
+        chunk.append(task)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_scored_tasks(lines, strategy="smart_balance", today=None):
+    """Yield scored tasks as NDJSON lines in arrival order.
+
+    The whole batch is never in memory, so dependency multipliers come from
+    each task's own dependency count, as in ``calculate_priority_score``.
+    A bad line ends the stream with an ``{"error", "line"}`` record.
+    """
+    today = today or date.today()
+    strategy = get_strategy(strategy)
+    try:
+        for chunk in iter_chunks(iter_tasks(lines)):
+            columns = TaskColumns(chunk, today)
+            scores = columns.priority_scores(strategy)
+            for i, record in enumerate(chunk):
+                scored = dict(record.task, priority_score=scores[i],
+                              explanation=describe_score(*columns.explanation_fields(i)))
+                yield dumps(scored) + b"\n"
+    except StreamError as e:
+        yield dumps({"error": str(e), "line": e.line}) + b"\n"
+
+
+def top_scored_tasks(lines, limit, strategy="smart_balance", today=None):
+    """Consume the stream and return ``(tasks, cycle_aware)`` for the ``limit`` best, best first.
+
+    Per task only its weighted components (one float) and dependency list
+    are kept, for a DependencyIndex over the whole upload at the end. Raw
+    lines are kept only in a bounded heap of the ``2 * limit`` best scores
+    before any cycle penalty. Being on a cycle can only lower a score, so
+    the cycle-aware winners are among these candidates unless penalized
+    ones made room for tasks already dropped; then the best candidates
+    are returned and ``cycle_aware`` is False. Ties break by arrival order
+    like the stable sort. Raises StreamError.
+    """
+    today = today or date.today()
+    strategy = get_strategy(strategy)
+    wu, wi, we = (strategy.weights[name] for name in ("urgency", "importance", "effort"))
+    raw_lines = []
+    weighted = array("d")
+    dependencies = []
+    candidates = []
+    for chunk in iter_chunks(iter_tasks(lines, raw_lines)):
+        urgency, importance, effort, dependency = TaskColumns(chunk, today).components(strategy)
+        for u, i, e, d, record, raw in zip(urgency, importance, effort, dependency, chunk, raw_lines):
+            # Same operation order as Strategy.score, so the final floats match
+            w = float(u * wu + i * wi + e * we)
+            entry = (min(100, round(w * float(d), 2)), -len(weighted), raw)
+            if len(candidates) < 2 * limit:
+                heapq.heappush(candidates, entry)
+            elif entry > candidates[0]:
+                heapq.heapreplace(candidates, entry)
+            weighted.append(w)
+            dependencies.append(record.dependencies)
+        raw_lines.clear()
+
+    multipliers = DependencyIndex(dependencies, dependencies).multipliers
+    del dependencies
+
+    def rank(i):
+        return min(100, round(weighted[i] * multipliers[i], 2)), -i
+
+    kept = {-sequence: raw for _, sequence, raw in candidates}
+    best = heapq.nlargest(limit, range(len(weighted)), key=rank)
+    cycle_aware = all(i in kept for i in best)
+    if not cycle_aware:
+        best = heapq.nlargest(limit, kept, key=rank)
+
+    records = [task_record(json.loads(kept[i]), {})[0] for i in best]
+    columns = TaskColumns(records, today)
+    ranked = [dict(record.task, priority_score=rank(i)[0],
+                   explanation=describe_score(*columns.explanation_fields(position)))
+              for position, (i, record) in enumerate(zip(best, records))]
+    return ranked, cycle_aware
@@ -0,0 +1,37 @@
+import random
+from datetime import date, timedelta
+
+
+def generate_tasks(count, dependency_density=0.5, cycle_rate=0.01, seed=0, today=None):
+    """Reproducible synthetic task list for benchmarks and load tests.
+
+    ``dependency_density`` is the average number of dependencies per task.
+    Dependencies point at earlier tasks, so the graph is acyclic except for
+    a ``cycle_rate`` share of tasks that form a two-task cycle with an
+    earlier one.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    whole, fraction = int(dependency_density), dependency_density - int(dependency_density)
+
+    tasks = []
+    for i in range(count):
+        task = {
+            "title": f"Task {i + 1}",
+            "estimated_hours": round(rng.uniform(0.25, 16), 2),
+            "importance": rng.randint(1, 10),
+            "dependencies": [],
+        }
+        if rng.random() < 0.9:
+            task["due_date"] = (today + timedelta(days=rng.randint(-10, 60))).isoformat()
+
+        wanted = whole + (rng.random() < fraction)
+        if i and wanted:
+            task["dependencies"] = sorted(set(rng.randint(1, i) for _ in range(wanted)))
+        if i and rng.random() < cycle_rate:
+            partner = rng.randint(1, i)
+            if partner not in task["dependencies"]:
+                task["dependencies"].append(partner)
+            tasks[partner - 1]["dependencies"].append(i + 1)
+        tasks.append(task)
+    return tasks
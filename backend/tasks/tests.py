@@ -1,4 +1,10 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connections, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from tasks.scoring import (
     calculate_urgency_score, 
     calculate_importance_score,
@@ -6,9 +12,62 @@ from tasks.scoring import (
     calculate_dependency_score,
     detect_circular_dependencies,
     calculate_priority_score,
-    analyze_and_sort_tasks
+    generate_score_explanation,
+    analyze_and_sort_tasks,
+    analyze_with_strategies
 )
-from datetime import date, timedelta
+from tasks import batch, conditional, db
+from tasks.batch import TaskColumns
+from tasks.cache import ScoreCache, seconds_until_rollover
+from tasks import curves
+from tasks.curves import PiecewiseLinear
+from tasks.graph import DependencyIndex
+from tasks.guard import SQLiteTokenBuckets, TokenBuckets, get_buckets, scan_json
+from tasks.instrumentation import metrics
+from tasks import jobs, store, views
+from tasks.models import AnalysisJob, AnalysisJobResult, Task, TaskDependency, TaskScore
+from tasks.pagination import encode_cursor, rankings
+from tasks.parallel import analyze_in_pool
+from tasks.planner import plan_days, plan_tasks
+from tasks.rankings import RankedList, RankingSession
+from tasks.scoring import EXPLANATIONS, describe_score, score_records
+from tasks.serializers import Projection, dumps
+from tasks.streaming import top_scored_tasks
+from tasks.synthetic import generate_tasks
+from tasks.strategies import STRATEGY_WEIGHTS, StrategyError, StrategyRegistry, get_strategy, registry
+from tasks.validation import TaskRecord, TaskValidationError, as_records, validate_tasks
+from asgiref.sync import sync_to_async
+from datetime import date, datetime, timedelta
+import contextlib
+import gzip
+import io
+import itertools
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import zlib
+from unittest import mock
+
+
+def make_random_tasks(count, seed=0):
+    """Random task dicts covering every urgency and effort branch"""
+    rng = random.Random(seed)
+    today = date.today()
+    tasks = []
+    for i in range(count):
+        task = {
+            'title': f'Task {i}',
+            'estimated_hours': rng.choice([0, 0.25, 0.5, 1, 1.5, 2, 2.5, 3, 6, 7.5, 12, 20, rng.uniform(0, 30)]),
+            'importance': rng.randint(1, 10),
+            'dependencies': rng.sample(range(1, count + 1), rng.randint(0, min(3, count))),
+        }
+        if rng.random() < 0.9:
+            task['due_date'] = (today + timedelta(days=rng.randint(-5, 30))).isoformat()
+        tasks.append(task)
+    return tasks
 
 class ScoringAlgorithmTests(TestCase):
     
@@ -214,3 +273,1565 @@ class ScoringAlgorithmTests(TestCase):
         self.assertGreaterEqual(score, 0)
         # Fixed: Allow both int and float
         self.assertTrue(isinstance(score, (int, float)))
+
+
+class BatchScoringTests(TestCase):
+
+    def test_batch_matches_scalar_scores(self):
+        """Columnar scores are identical to calculate_priority_score"""
+        tasks = make_random_tasks(300)
+        columns = TaskColumns(tasks)
+        for strategy in STRATEGY_WEIGHTS:
+            expected = [calculate_priority_score(task, strategy) for task in tasks]
+            self.assertEqual(columns.priority_scores(get_strategy(strategy)), expected)
+
+    def test_python_fallback_matches_numpy(self):
+        """Scores do not depend on NumPy being installed"""
+        tasks = make_random_tasks(200, seed=1)
+        strategy = get_strategy('smart_balance')
+        expected = TaskColumns(tasks).priority_scores(strategy)
+        numpy_module, batch.np = batch.np, None
+        try:
+            self.assertEqual(TaskColumns(tasks).priority_scores(strategy), expected)
+        finally:
+            batch.np = numpy_module
+
+    def test_analyze_matches_scalar_path(self):
+        """analyze_and_sort_tasks keeps scores, explanations and order"""
+        tasks = make_random_tasks(100, seed=2)
+        index = DependencyIndex(tasks)
+        expected = []
+        for task in tasks:
+            score = calculate_priority_score(task, 'deadline_driven', index=index)
+            expected.append(dict(task, priority_score=score,
+                                 explanation=generate_score_explanation(task, score)))
+        expected.sort(key=lambda x: x['priority_score'], reverse=True)
+        self.assertEqual(analyze_and_sort_tasks(tasks, 'deadline_driven'), expected)
+
+
+class DependencyIndexTests(TestCase):
+
+    def test_cycle_membership_blocks_and_depth(self):
+        """Tasks are labelled with cycle membership, in-degree and depth"""
+        tasks = [
+            {'title': 'A', 'dependencies': [2]},
+            {'title': 'B', 'dependencies': [3]},
+            {'title': 'C', 'dependencies': [2]},  # B <-> C cycle
+            {'title': 'D', 'dependencies': [1, 99]},  # 99 is not in the batch
+            {'title': 'E', 'dependencies': []},
+        ]
+        index = DependencyIndex(tasks)
+        self.assertTrue(index.has_cycle)
+        self.assertEqual(index.cycles, [[1, 2]])
+        self.assertEqual(index.in_cycle, [False, True, True, False, False])
+        self.assertEqual(index.blocks, [1, 2, 1, 0, 0])
+        self.assertEqual(index.depth, [1, 0, 0, 2, 0])
+        self.assertEqual(index.multipliers, [1.2, 0.5, 0.5, 1.5, 1.0])
+
+    def test_dependency_score_reads_index(self):
+        """calculate_dependency_score penalizes every task on a cycle"""
+        tasks = [
+            {'title': 'Task 1', 'dependencies': [2]},
+            {'title': 'Task 2', 'dependencies': [1]},
+            {'title': 'Task 3', 'dependencies': [1]},
+        ]
+        index = DependencyIndex(tasks)
+        self.assertEqual(calculate_dependency_score(tasks[0], index=index), 0.5)
+        self.assertEqual(calculate_dependency_score(tasks[1], all_tasks=tasks), 0.5)
+        self.assertEqual(calculate_dependency_score(tasks[2], index=index), 1.2)
+
+    def test_long_chain_does_not_recurse(self):
+        """A 50k-long dependency chain is handled without hitting the recursion limit"""
+        size = 50000
+        tasks = [{'title': f'T{i}', 'dependencies': [i + 2] if i + 1 < size else []}
+                 for i in range(size)]
+        index = DependencyIndex(tasks)
+        self.assertFalse(index.has_cycle)
+        self.assertEqual(index.depth[0], size - 1)
+
+        tasks[-1]['dependencies'] = [1]
+        self.assertTrue(detect_circular_dependencies(tasks))
+
+
+class StreamingAnalyzeTests(TestCase):
+
+    def post_ndjson(self, tasks, query=''):
+        body = ''.join(json.dumps(task) + '\n' for task in tasks)
+        return self.client.post('/api/tasks/analyze/' + query, data=body,
+                                 content_type='application/x-ndjson')
+
+    def ndjson_lines(self, tasks):
+        return [json.dumps(task).encode() + b'\n' for task in tasks]
+
+    def read_lines(self, response):
+        content = b''.join(response.streaming_content).decode()
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_scored_tasks_stream_in_arrival_order(self):
+        """Each NDJSON line comes back scored, in the order it was sent"""
+        tasks = make_random_tasks(50, seed=3)
+        for task in tasks:
+            task['dependencies'] = []
+        response = self.post_ndjson(tasks, '?strategy=high_impact')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = self.read_lines(response)
+        self.assertEqual([line['title'] for line in lines], [t['title'] for t in tasks])
+        self.assertEqual([line['priority_score'] for line in lines],
+                         [calculate_priority_score(t, 'high_impact') for t in tasks])
+
+    def test_limit_keeps_top_tasks(self):
+        """With a limit only the ranked top tasks are returned"""
+        tasks = make_random_tasks(2500, seed=4)
+        for task in tasks:
+            task['dependencies'] = []
+        response = self.post_ndjson(tasks, '?limit=7')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.read_lines(response), analyze_and_sort_tasks(tasks)[:7])
+
+    def test_limit_penalizes_cycles(self):
+        """Ranked NDJSON applies cycle multipliers like JSON mode; the plain stream says it does not"""
+        tasks = make_random_tasks(300, seed=8)
+        tasks[0]['dependencies'] = [2]
+        tasks[1]['dependencies'] = [1]
+        response = self.post_ndjson(tasks, '?limit=300')
+        self.assertEqual(response['X-Cycle-Aware'], 'true')
+        self.assertEqual(self.read_lines(response), analyze_and_sort_tasks(tasks))
+
+        acyclic = [dict(task, dependencies=task['dependencies'] if i < 2 else [])
+                   for i, task in enumerate(tasks)]
+        acyclic[0].update(importance=10, due_date=date.today().isoformat(), estimated_hours=1)
+        ranked, cycle_aware = top_scored_tasks(self.ndjson_lines(acyclic), 5)
+        self.assertTrue(cycle_aware)
+        self.assertEqual(ranked, analyze_and_sort_tasks(acyclic)[:5])
+
+        response = self.post_ndjson(tasks)
+        self.assertEqual(response['X-Cycle-Aware'], 'false')
+        self.assertEqual(self.read_lines(response)[0]['priority_score'],
+                         calculate_priority_score(tasks[0]))
+
+    def test_limit_flags_winners_lost_to_the_candidate_heap(self):
+        """When penalized candidates leave a dropped task on top, the response says so"""
+        top = {'title': 'Top', 'due_date': date.today().isoformat(), 'importance': 10,
+               'estimated_hours': 1}
+        tasks = [dict(top, title='A', dependencies=[2]), dict(top, title='B', dependencies=[1]),
+                 dict(top, title='C', importance=9), dict(top, title='D', importance=8)]
+        ranked, cycle_aware = top_scored_tasks(self.ndjson_lines(tasks), 1)
+        self.assertFalse(cycle_aware)
+        self.assertEqual([task['title'] for task in ranked], ['A'])
+
+        response = self.post_ndjson(tasks, '?limit=2')
+        self.assertEqual(response['X-Cycle-Aware'], 'true')
+        self.assertEqual(self.read_lines(response), analyze_and_sort_tasks(tasks)[:2])
+
+    def test_invalid_line_is_reported(self):
+        """Validation errors carry the offending line number"""
+        tasks = [{'title': 'ok'}, {'title': 'bad', 'importance': 42}]
+        response = self.post_ndjson(tasks, '?limit=1')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['line'], 2)
+
+        lines = self.read_lines(self.post_ndjson(tasks))
+        self.assertEqual(lines[-1], {'error': 'Importance must be between 1-10', 'line': 2})
+
+
+class TopKRankingTests(TestCase):
+
+    def test_limit_matches_full_sort_prefix(self):
+        """Heap selection returns the same tasks and ties as the full sort"""
+        tasks = make_random_tasks(400, seed=5)
+        full = analyze_and_sort_tasks(tasks, 'fastest_wins')
+        for limit in (1, 3, 50, 400, 1000):
+            self.assertEqual(analyze_and_sort_tasks(tasks, 'fastest_wins', limit), full[:limit])
+
+    def test_ties_keep_input_order(self):
+        """Equal scores stay in their original order"""
+        tasks = [{'title': f'Same {i}', 'importance': 5, 'estimated_hours': 2} for i in range(10)]
+        ranked = analyze_and_sort_tasks(tasks, limit=4)
+        self.assertEqual([t['title'] for t in ranked], ['Same 0', 'Same 1', 'Same 2', 'Same 3'])
+
+    def test_endpoints_accept_limit(self):
+        """Both endpoints honour limit and reject bad values"""
+        tasks = make_random_tasks(20, seed=6)
+        response = self.client.post('/api/tasks/analyze/', data={'tasks': tasks, 'limit': 5},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['tasks'], analyze_and_sort_tasks(tasks, limit=5))
+
+        self.assertEqual(len(self.client.get('/api/tasks/suggest/').json()['suggestions']), 3)
+        self.assertEqual(len(self.client.get('/api/tasks/suggest/?limit=2').json()['suggestions']), 2)
+        self.assertEqual(self.client.get('/api/tasks/suggest/?limit=0').status_code, 400)
+
+
+class TaskStoreTests(TestCase):
+
+    def create(self, **fields):
+        data = {'title': 'Task', 'due_date': date.today().isoformat(),
+                'estimated_hours': 2, 'importance': 5}
+        data.update(fields)
+        response = self.client.post('/api/tasks/', data=data, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def stored_score(self, pk, strategy='smart_balance'):
+        return TaskScore.objects.get(task_id=pk, strategy=strategy).priority_score
+
+    def test_create_stores_score_for_every_strategy(self):
+        """Stored scores match the scalar scoring functions"""
+        task = self.create(title='Write report', importance=9, estimated_hours=1)
+        self.assertEqual(set(task['priority_scores']), set(STRATEGY_WEIGHTS))
+        for strategy, score in task['priority_scores'].items():
+            self.assertEqual(score, calculate_priority_score(task, strategy))
+
+    def test_update_rescores_only_affected_rows(self):
+        """Closing a cycle rescores the tasks on it and nothing else"""
+        first = self.create(title='First')
+        second = self.create(title='Second', dependencies=[first['id']])
+        other = self.create(title='Other')
+        TaskScore.objects.filter(task_id=other['id']).update(priority_score=-1)
+
+        response = self.client.patch(f"/api/tasks/{first['id']}/",
+                                     data={'dependencies': [second['id']]},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        cycle = [dict(first, dependencies=[2]), dict(second, dependencies=[1])]
+        index = DependencyIndex(cycle)
+        self.assertEqual(self.stored_score(first['id']), calculate_priority_score(cycle[0], index=index))
+        self.assertEqual(self.stored_score(second['id']), calculate_priority_score(cycle[1], index=index))
+        self.assertLess(self.stored_score(second['id']), second['priority_scores']['smart_balance'])
+        self.assertEqual(self.stored_score(other['id']), -1)
+
+    def test_field_edits_reuse_stored_multiplier(self):
+        """Edits that keep the dependencies rescore under the stored multiplier, without the graph"""
+        first = self.create(title='First')
+        second = self.create(title='Second', dependencies=[first['id']])
+        self.client.patch(f"/api/tasks/{first['id']}/", data={'dependencies': [second['id']]},
+                          content_type='application/json')
+        self.assertEqual(Task.objects.get(pk=first['id']).dependency_multiplier, 0.5)
+
+        with mock.patch('tasks.store.dependency_multipliers') as rebuild:
+            response = self.client.patch(f"/api/tasks/{first['id']}/",
+                                         data={'importance': 9, 'dependencies': [second['id']]},
+                                         content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        rebuild.assert_not_called()
+        cycle = [dict(first, importance=9, dependencies=[2]), dict(second, dependencies=[1])]
+        self.assertEqual(self.stored_score(first['id']),
+                         calculate_priority_score(cycle[0], index=DependencyIndex(cycle)))
+
+    def test_delete_drops_dependency_and_rescores_dependents(self):
+        """Deleting a task removes it from dependency lists"""
+        first = self.create(title='First')
+        second = self.create(title='Second', dependencies=[first['id']])
+        self.assertEqual(self.client.delete(f"/api/tasks/{first['id']}/").status_code, 204)
+        self.assertEqual(self.client.get(f"/api/tasks/{second['id']}/").json()['dependencies'], [])
+        self.assertFalse(TaskDependency.objects.exists())
+        self.assertEqual(self.stored_score(second['id']),
+                         calculate_priority_score(dict(second, dependencies=[])))
+
+    def test_top_tasks_reads_index_and_refreshes_stale_rows(self):
+        """Top tasks come from the score table; yesterday's rows are rescored"""
+        low = self.create(title='Low', importance=1, estimated_hours=10)
+        high = self.create(title='High', importance=10, estimated_hours=1)
+        TaskScore.objects.filter(task_id=low['id']).update(
+            priority_score=999, scored_on=date.today() - timedelta(days=1))
+
+        response = self.client.get('/api/tasks/top/?limit=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([t['id'] for t in response.json()['tasks']], [high['id']])
+        self.assertEqual(self.stored_score(low['id']), low['priority_scores']['smart_balance'])
+
+    def test_invalid_payloads_are_rejected(self):
+        """Missing fields and unknown dependencies return 400"""
+        response = self.client.post('/api/tasks/', data={'title': 'No date'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/tasks/', data={
+            'title': 'Bad dep', 'due_date': '2025-01-01', 'estimated_hours': 1,
+            'importance': 5, 'dependencies': [12345]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(TASK_OWNER_HEADER_PROXIES=['127.0.0.1'])
+class MultiTenantStoreTests(TestCase):
+
+    def create(self, owner, **fields):
+        data = {'title': 'Task', 'due_date': date.today().isoformat(),
+                'estimated_hours': 2, 'importance': 5}
+        data.update(fields)
+        response = self.client.post('/api/tasks/', data=data, content_type='application/json',
+                                    HTTP_X_TASK_OWNER=owner)
+        self.assertEqual(response.status_code, 201)
+        return response.json()
+
+    def test_owners_only_see_their_tasks(self):
+        """Listing, fetching, ranking and dependencies stay within one owner"""
+        alice = self.create('alice', title='Alice', project='home')
+        self.create('alice', title='Alice work', project='work')
+        bob = self.create('bob', title='Bob', importance=10)
+
+        listed = self.client.get('/api/tasks/', HTTP_X_TASK_OWNER='alice').json()['tasks']
+        self.assertEqual([t['title'] for t in listed], ['Alice', 'Alice work'])
+        listed = self.client.get('/api/tasks/?project=work', HTTP_X_TASK_OWNER='alice').json()
+        self.assertEqual([t['title'] for t in listed['tasks']], ['Alice work'])
+        self.assertEqual(self.client.get('/api/tasks/').json()['tasks'], [])
+
+        self.assertEqual(self.client.get(f"/api/tasks/{bob['id']}/",
+                                         HTTP_X_TASK_OWNER='alice').status_code, 404)
+        top = self.client.get('/api/tasks/top/?project=home', HTTP_X_TASK_OWNER='alice').json()
+        self.assertEqual([t['id'] for t in top['tasks']], [alice['id']])
+
+        response = self.client.post('/api/tasks/', data={
+            'title': 'Steal', 'due_date': '2025-01-01', 'estimated_hours': 1,
+            'importance': 5, 'dependencies': [bob['id']]}, content_type='application/json',
+            HTTP_X_TASK_OWNER='alice')
+        self.assertEqual(response.status_code, 400)
+
+    def test_owner_header_needs_a_trusted_proxy(self):
+        """Clients cannot pick an owner; signed-in users always get their own collection"""
+        alice = self.create('alice', title='Alice')
+        with override_settings(TASK_OWNER_HEADER_PROXIES=[]):
+            self.assertEqual(self.client.get(f"/api/tasks/{alice['id']}/",
+                                             HTTP_X_TASK_OWNER='alice').status_code, 404)
+            self.assertEqual(self.client.get('/api/tasks/', HTTP_X_TASK_OWNER='alice').json()['tasks'], [])
+
+        self.client.force_login(User.objects.create_user('bob'))
+        self.assertEqual(self.client.get('/api/tasks/', HTTP_X_TASK_OWNER='alice').json()['tasks'], [])
+        response = self.client.post('/api/tasks/', data={
+            'title': 'Bob', 'due_date': '2025-01-01', 'estimated_hours': 1, 'importance': 5},
+            content_type='application/json', HTTP_X_TASK_OWNER='alice')
+        self.assertEqual(Task.objects.get(pk=response.json()['id']).owner, 'bob')
+
+    @override_settings(TASK_IMPORT_BATCH_SIZE=3)
+    def test_import_scores_like_analyze(self):
+        """Imported tasks keep positional dependencies and score as /analyze/ does"""
+        tasks = make_random_tasks(10, seed=53)
+        for position, task in enumerate(tasks, 1):
+            task.setdefault('due_date', date.today().isoformat())
+            task.setdefault('estimated_hours', 1)
+            task.setdefault('importance', 5)
+            task['dependencies'] = sorted({dep for dep in task['dependencies'] if dep != position})
+        tasks[0]['dependencies'] = [2]
+        tasks[1]['dependencies'] = [1]
+
+        response = self.client.post('/api/tasks/import/', data={'tasks': tasks, 'project': 'q3'},
+                                    content_type='application/json', HTTP_X_TASK_OWNER='carol')
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['project']), (10, 'q3'))
+        ids = body['ids']
+
+        stored = self.client.get('/api/tasks/', HTTP_X_TASK_OWNER='carol').json()['tasks']
+        self.assertEqual([t['id'] for t in stored], ids)
+        self.assertEqual([t['dependencies'] for t in stored],
+                         [[ids[dep - 1] for dep in task['dependencies']] for task in tasks])
+        analyzed = self.client.post('/api/tasks/analyze/', content_type='application/json',
+                                    data={'tasks': tasks, 'strategy': 'deadline_driven'})
+        analyzed = analyzed.json()['tasks']
+        titles = {t['id']: t['title'] for t in stored}
+        scores = {titles[pk]: score for pk, score in
+                  TaskScore.objects.filter(strategy='deadline_driven', owner='carol')
+                  .values_list('task_id', 'priority_score')}
+        self.assertEqual(scores, {t['title']: t['priority_score'] for t in analyzed})
+
+    def test_import_rejects_bad_rows(self):
+        """Every invalid row is reported and nothing is stored"""
+        good = {'title': 'Ok', 'due_date': '2025-01-01', 'estimated_hours': 1, 'importance': 5}
+        response = self.client.post('/api/tasks/import/', data={'tasks': [
+            good, dict(good, dependencies=[5]), {'title': 'No date', 'importance': 5,
+                                                 'estimated_hours': 1},
+            dict(good, dependencies=[1, 1])]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e['index'] for e in response.json()['errors']], [1, 2, 3])
+        self.assertFalse(Task.objects.exists())
+
+
+class ScoreCacheTests(TestCase):
+
+    def setUp(self):
+        self.cache = ScoreCache('scores')
+        self.cache.clear()
+
+    def test_cached_results_match_uncached(self):
+        """Second pass is served from the cache with identical output"""
+        tasks = make_random_tasks(200, seed=7)
+        expected = analyze_and_sort_tasks(tasks, 'high_impact')
+        self.assertEqual(analyze_and_sort_tasks(tasks, 'high_impact', cache=self.cache), expected)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+        renamed = [dict(task, title=task['title'] + '!') for task in tasks]
+        with mock.patch('tasks.scoring.dependency_index') as graph:
+            ranked = analyze_and_sort_tasks(renamed, 'high_impact', cache=self.cache)
+        graph.assert_not_called()
+        self.assertEqual([t['priority_score'] for t in ranked], [t['priority_score'] for t in expected])
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_keys_change_with_strategy_date_and_graph(self):
+        """A new day, another strategy or other dependencies never read old entries"""
+        task = {'title': 'T', 'due_date': '2025-11-27', 'importance': 5}
+        tasks = as_records([task, dict(task, title='Other')])
+        renamed = as_records([dict(task, title='Renamed'), dict(task, title='Other')])
+        linked = as_records([task, dict(task, dependencies=[1])])
+        today = date.today()
+        balance, fastest = get_strategy('smart_balance'), get_strategy('fastest_wins')
+        key = self.cache.key(tasks, None, balance, today)
+        self.assertNotEqual(key, self.cache.key(tasks, None, fastest, today))
+        self.assertNotEqual(key, self.cache.key(tasks, None, balance, today + timedelta(days=1)))
+        self.assertNotEqual(key, self.cache.key(linked, None, balance, today))
+        self.assertNotEqual(key, self.cache.key(tasks, [1.0, 0.5], balance, today))
+        self.assertEqual(key, self.cache.key(renamed, None, balance, today))
+
+    def test_entries_expire_at_midnight(self):
+        """Entries time out at the next date rollover"""
+        self.assertEqual(seconds_until_rollover(datetime(2025, 11, 27, 23, 59, 30)), 30)
+        self.assertEqual(seconds_until_rollover(datetime(2025, 11, 27, 0, 0)), 86400)
+
+    def test_analyze_endpoint_uses_cache(self):
+        """Repeated analyze requests hit the cache"""
+        tasks = make_random_tasks(10, seed=8)
+        for _ in range(2):
+            response = self.client.post('/api/tasks/analyze/', data={'tasks': tasks},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+        stats = self.client.get('/api/tasks/cache/stats/').json()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+
+class MultiStrategyTests(TestCase):
+
+    def test_matrix_matches_single_strategy_scores(self):
+        """One components pass gives every strategy's scalar scores"""
+        tasks = make_random_tasks(300, seed=9)
+        columns = TaskColumns(tasks)
+        matrix = columns.priority_score_matrix([get_strategy(name) for name in STRATEGY_WEIGHTS])
+        for strategy, scores in zip(STRATEGY_WEIGHTS, matrix):
+            self.assertEqual(scores, [calculate_priority_score(t, strategy) for t in tasks])
+
+    def test_rankings_match_separate_requests(self):
+        """Each ranking equals a separate analyze_and_sort_tasks call"""
+        tasks = make_random_tasks(120, seed=10)
+        rankings = analyze_with_strategies(tasks, list(STRATEGY_WEIGHTS), limit=20)
+        for strategy in STRATEGY_WEIGHTS:
+            self.assertEqual(rankings[strategy], analyze_and_sort_tasks(tasks, strategy, 20))
+
+    def test_endpoint_accepts_all(self):
+        """strategies="all" returns one ranking per strategy"""
+        tasks = make_random_tasks(15, seed=11)
+        response = self.client.post('/api/tasks/analyze/', data={'tasks': tasks, 'strategies': 'all'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['rankings']), set(STRATEGY_WEIGHTS))
+
+        response = self.client.post('/api/tasks/analyze/', data={'tasks': tasks, 'strategies': ['nope']},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class StrategyRegistryTests(TestCase):
+
+    def tearDown(self):
+        registry.unregister('custom')
+
+    def test_builtin_profiles_match_scalar_functions(self):
+        """Compiled default curves reproduce the original component functions"""
+        strategy = get_strategy('smart_balance')
+        for task in make_random_tasks(300, seed=12):
+            days = date.fromisoformat(task['due_date']) - date.today() if 'due_date' in task else None
+            self.assertEqual(strategy.urgency(days.days if days is not None else None),
+                             calculate_urgency_score(task))
+            self.assertEqual(strategy.effort(task['estimated_hours']), calculate_effort_score(task))
+
+    def test_custom_profile_scores_in_every_path(self):
+        """A registered profile is used by scalar, batch and endpoint scoring"""
+        registry.register('custom', {
+            'weights': {'urgency': 0.5, 'importance': 0.25, 'effort': 0.25},
+            'urgency': {'breakpoints': [[0, 100], [5, 70]], 'later': 10},
+            'effort': {'breakpoints': [[1, 100], [4, 0]]},
+        })
+        task = {'title': 'Custom', 'due_date': (date.today() + timedelta(days=4)).isoformat(),
+                'estimated_hours': 2.5, 'importance': 6}
+        # urgency 70, importance 48, effort 50
+        self.assertEqual(calculate_priority_score(task, 'custom'), 59.5)
+
+        tasks = make_random_tasks(100, seed=13)
+        self.assertEqual(TaskColumns(tasks).priority_scores(get_strategy('custom')),
+                         [calculate_priority_score(t, 'custom') for t in tasks])
+
+        response = self.client.post('/api/tasks/analyze/', data={'tasks': [task], 'strategy': 'custom'},
+                                    content_type='application/json')
+        self.assertEqual(response.json()['tasks'][0]['priority_score'], 59.5)
+
+    def test_continuous_urgency_curves(self):
+        """Decay curves are tabulated per day, separate far due dates and score alike in every path"""
+        for curve, options in (('exponential', {'half_life': 10, 'floor': 20, 'horizon': 400}),
+                               ('logistic', {'midpoint': 5, 'steepness': 0.3, 'horizon': 400})):
+            strategy = registry.register('custom', {
+                'weights': {'urgency': 1, 'importance': 0, 'effort': 0},
+                'urgency': dict(options, curve=curve),
+            })
+            self.assertEqual(len(strategy.urgency_table), 401)
+            table = strategy.urgency_table
+            self.assertTrue(all(a > b for a, b in zip(table, table[1:])))
+            self.assertEqual((strategy.urgency(-3), strategy.urgency(None)), (100, 50))
+            self.assertEqual(strategy.urgency(1000), table[-1])
+            self.assertGreater(strategy.urgency(8), strategy.urgency(300))
+            if curve == 'exponential':
+                self.assertAlmostEqual(strategy.urgency(10), 60)
+
+            tasks = make_random_tasks(200, seed=14)
+            tasks.append({'title': 'Far', 'due_date': (date.today() + timedelta(days=300)).isoformat()})
+            scores = TaskColumns(tasks).priority_scores(strategy)
+            self.assertEqual(scores, [calculate_priority_score(t, 'custom') for t in tasks])
+            with mock.patch.object(batch, 'np', None):
+                self.assertEqual(TaskColumns(tasks).priority_scores(strategy), scores)
+
+        self.assertEqual(get_strategy('smart_balance').urgency(300), 40)
+
+    def test_invalid_profiles_rejected_at_registration(self):
+        """Bad profiles fail when registered, unknown names fail on lookup"""
+        local = StrategyRegistry()
+        bad_profiles = [
+            {},
+            {'weights': {'urgency': 1, 'importance': 'high', 'effort': 0}},
+            {'weights': {'urgency': -1, 'importance': 1, 'effort': 1}},
+            {'weights': {'urgency': 1, 'importance': 1, 'effort': 1}, 'extra': 1},
+            {'weights': {'urgency': 1, 'importance': 1, 'effort': 1},
+             'effort': {'breakpoints': [[2, 50], [1, 60]]}},
+            {'weights': {'urgency': 1, 'importance': 1, 'effort': 1},
+             'urgency': {'breakpoints': [[0.5, 100]]}},
+            {'weights': {'urgency': 1, 'importance': 1, 'effort': 1},
+             'urgency': {'curve': 'cubic'}},
+            {'weights': {'urgency': 1, 'importance': 1, 'effort': 1},
+             'urgency': {'curve': 'exponential', 'half_life': 0}},
+            {'weights': {'urgency': 1, 'importance': 1, 'effort': 1},
+             'urgency': {'curve': 'logistic', 'horizon': 10 ** 6}},
+            {'weights': {'urgency': 1, 'importance': 1, 'effort': 1},
+             'urgency': {'curve': 'exponential', 'later': 40}},
+        ]
+        for profile in bad_profiles:
+            with self.assertRaises(StrategyError):
+                local.register('bad', profile)
+        self.assertNotIn('bad', local)
+        with self.assertRaises(StrategyError):
+            get_strategy('no_such_strategy')
+
+        response = self.client.post('/api/tasks/analyze/', data={'tasks': [], 'strategy': 'nope'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class PiecewiseLinearTests(TestCase):
+
+    def random_values(self, rng, low, high, count=2000):
+        """Whole numbers, halves, arbitrary floats and the breakpoints themselves"""
+        values = [rng.randint(low, high) for _ in range(count)]
+        values += [rng.randint(low * 2, high * 2) / 2 for _ in range(count)]
+        values += [rng.uniform(low, high) for _ in range(count)]
+        return values
+
+    def assert_curve_matches(self, curve, reference, values):
+        expected = [reference(value) for value in values]
+        self.assertEqual([curve(value) for value in values], expected)
+        self.assertEqual(curve.evaluate(values).tolist(), expected)
+        floats = [float(value) for value in values]
+        self.assertEqual(curve.evaluate(floats).tolist(), [reference(value) for value in floats])
+        with mock.patch.object(curves, 'np', None):
+            self.assertEqual(curve.evaluate(values), expected)
+
+    def test_default_curves_match_scalar_functions(self):
+        """Effort, importance and urgency curves reproduce the original functions exactly"""
+        rng = random.Random(21)
+        strategy = get_strategy('smart_balance')
+        self.assert_curve_matches(
+            strategy.effort, lambda hours: calculate_effort_score({'estimated_hours': hours}),
+            self.random_values(rng, -2, 30) + [0.5, 2, 6, 12])
+        self.assert_curve_matches(
+            strategy.importance, lambda imp: calculate_importance_score({'importance': imp}),
+            self.random_values(rng, -3, 14) + list(range(1, 11)))
+
+        days = [rng.randint(0, 60) for _ in range(2000)] + list(range(10))
+        due = lambda d: {'due_date': (date.today() + timedelta(days=d)).isoformat()}
+        self.assertEqual(strategy.urgency_curve.evaluate(days).tolist(),
+                         [calculate_urgency_score(due(d)) for d in days])
+
+    def test_random_curves_agree_across_paths(self):
+        """bisect, searchsorted and the pure-Python fallback give the same floats"""
+        rng = random.Random(22)
+        for _ in range(50):
+            xs = sorted(rng.sample(range(-50, 200), rng.randint(1, 8)))
+            xs = [x + rng.choice([0, 0.25, 0.5]) for x in xs]
+            ys = [rng.uniform(-100, 100) for _ in xs]
+            curve = PiecewiseLinear(xs, ys)
+            values = self.random_values(rng, -60, 210, 300) + xs
+            expected = [curve(value) for value in values]
+            self.assertEqual(curve.evaluate(values).tolist(), expected)
+            with mock.patch.object(curves, 'np', None):
+                self.assertEqual(curve.evaluate(values), expected)
+            for value, score in zip(values, expected):
+                self.assertGreaterEqual(score, min(ys) - 1e-9)
+                self.assertLessEqual(score, max(ys) + 1e-9)
+
+        with self.assertRaises(ValueError):
+            PiecewiseLinear([1, 1], [2, 3])
+
+    def test_importance_curve_from_profile(self):
+        """An importance curve in a profile replaces the linear default"""
+        strategy = registry.register('custom', {
+            'weights': {'urgency': 0, 'importance': 1, 'effort': 0},
+            'importance': {'breakpoints': [[5, 0], [10, 100]]},
+        })
+        self.addCleanup(registry.unregister, 'custom')
+        self.assertEqual([strategy.importance(imp) for imp in (1, 5, 8, 10)], [0, 0, 60, 100])
+        tasks = make_random_tasks(100, seed=23)
+        self.assertEqual(TaskColumns(tasks).priority_scores(strategy),
+                         [calculate_priority_score(t, 'custom') for t in tasks])
+
+
+class BenchmarkCommandTests(TestCase):
+
+    def test_synthetic_tasks_are_reproducible(self):
+        """Same seed gives the same tasks; cycle rate controls cycles"""
+        self.assertEqual(generate_tasks(200, seed=3), generate_tasks(200, seed=3))
+        self.assertFalse(DependencyIndex(generate_tasks(500, cycle_rate=0)).has_cycle)
+        self.assertTrue(DependencyIndex(generate_tasks(500, cycle_rate=0.05)).has_cycle)
+
+    def test_bench_writes_json_report(self):
+        """manage.py bench times every stage and flags regressions"""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command('bench', sizes='10,50', repeat=1, output=output, stderr=io.StringIO())
+            with open(output) as f:
+                report = json.load(f)
+            names = {(r['benchmark'], r['size']) for r in report['results']}
+            for size in (10, 50):
+                for name in ('calculate_priority_score', 'detect_circular_dependencies',
+                             'analyze_and_sort_tasks', 'analyze_top10_cached', 'http_analyze'):
+                    self.assertIn((name, size), names)
+
+            for result in report['results']:
+                result['median'] = 1e-9
+            with open(output, 'w') as f:
+                json.dump(report, f)
+            with self.assertRaises(CommandError):
+                call_command('bench', sizes='10', repeat=1, compare=output,
+                             stdout=io.StringIO(), stderr=io.StringIO())
+
+
+class DatabaseTuningTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def test_connections_are_tuned_and_replica_is_read_only(self):
+        """New SQLite connections get the PRAGMAs; the read connection rejects writes"""
+        with connections['default'].cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        with self.assertRaises(DatabaseError):
+            Task.objects.using('replica').create(title='Nope', due_date=date.today(),
+                                                 estimated_hours=1, importance=5)
+
+    def test_rankings_read_from_replica_outside_transactions(self):
+        """Top tasks are read on the replica; inside a transaction on the default database"""
+        self.client.post('/api/tasks/', data={'title': 'Task', 'due_date': date.today().isoformat(),
+                                              'estimated_hours': 1, 'importance': 5},
+                         content_type='application/json')
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get('/api/tasks/top/')
+        self.assertEqual([t['title'] for t in response.json()['tasks']], ['Task'])
+        self.assertTrue(any('tasks_taskscore' in q['sql'] for q in replica.captured_queries))
+
+        with transaction.atomic(), CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(len(store.top_tasks()), 1)
+        self.assertEqual(replica.captured_queries, [])
+
+    def test_load_test_compares_configurations(self):
+        """bench --load-threads ranks through the ORM, on the read alias only when tuned"""
+        aliases = []
+
+        def read_alias():
+            aliases.append(db.read_alias())
+            return aliases[-1]
+
+        stdout = io.StringIO()
+        with mock.patch('tasks.store.read_alias', read_alias):
+            call_command('bench', sizes='10', repeat=1, load_threads=2, load_seconds=0.2,
+                         load_rows=100, stdout=stdout, stderr=io.StringIO())
+        self.assertEqual(set(aliases), {'default', 'replica'})
+        results = {r['benchmark']: r for r in json.loads(stdout.getvalue())['results']}
+        self.assertEqual(results['sqlite_load_default']['size'], 2)
+        self.assertGreater(results['sqlite_load_tuned']['ops_per_second'], 0)
+        self.assertIn('speedup', results['sqlite_load_tuned'])
+
+
+class RequestGuardTests(TestCase):
+
+    def setUp(self):
+        get_buckets().clear()
+
+    def analyze(self, body, **extra):
+        return self.client.post('/api/tasks/analyze/', data=body,
+                                content_type='application/json', **extra)
+
+    @override_settings(TASK_RATE_LIMIT=1, TASK_RATE_LIMIT_BURST=2)
+    def test_rate_limit_per_client(self):
+        """A client past its burst gets 429 with Retry-After; other clients do not"""
+        statuses = [self.client.get('/api/tasks/strategies/').status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        response = self.client.get('/api/tasks/strategies/')
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.client.get('/api/tasks/strategies/',
+                                         REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_token_buckets_refill(self):
+        """Memory and SQLite buckets refill at the rate, capped at the burst"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'buckets.sqlite3')
+            shared = SQLiteTokenBuckets(path)
+            for buckets, other in ((TokenBuckets(), None), (shared, SQLiteTokenBuckets(path))):
+                other = other or buckets
+                self.assertEqual([buckets.take('a', 2, 3, now=100) for _ in range(3)], [0, 0, 0])
+                # A second process sharing the file sees the empty bucket
+                self.assertEqual(other.take('a', 2, 3, now=100), 0.5)
+                self.assertEqual(buckets.take('a', 2, 3, now=100.5), 0)
+                self.assertEqual(buckets.take('b', 2, 3, now=100.5), 0)
+                self.assertEqual([buckets.take('a', 2, 3, now=1000) for _ in range(4)], [0, 0, 0, 0.5])
+            shared.connection().close()
+            other.connection().close()
+
+    @override_settings(TASK_MAX_BODY_BYTES=1000)
+    def test_oversized_body_rejected_before_parsing(self):
+        """Content-Length over the limit is refused without reading the body"""
+        tasks = make_random_tasks(50, seed=61)
+        with mock.patch('tasks.views.json.loads') as loads:
+            response = self.analyze({'tasks': tasks})
+        self.assertEqual(response.status_code, 413)
+        loads.assert_not_called()
+        self.assertEqual(self.analyze({'tasks': tasks[:2]}).status_code, 200)
+
+    @override_settings(TASK_MAX_TASKS=5)
+    def test_task_count_limit(self):
+        """JSON bodies are counted before json.loads, NDJSON as it streams"""
+        tasks = make_random_tasks(6, seed=62)
+        self.assertEqual(self.analyze({'tasks': tasks}).status_code, 413)
+        self.assertEqual(self.analyze({'tasks': tasks[:5]}).status_code, 200)
+
+        body = ''.join(json.dumps(task) + '\n' for task in tasks)
+        response = self.client.post('/api/tasks/analyze/?limit=3', data=body,
+                                    content_type='application/x-ndjson')
+        self.assertEqual((response.status_code, response.json()['line']), (413, 6))
+        response = self.client.post('/api/tasks/analyze/', data=body,
+                                    content_type='application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(lines[-1], {'error': 'More than 5 tasks in one request', 'line': 6})
+
+    def test_deep_nesting_rejected(self):
+        """Bodies nested past TASK_MAX_JSON_DEPTH never reach json.loads"""
+        response = self.analyze('{"tasks": ' + '[' * 5000 + ']' * 5000 + '}')
+        self.assertEqual(response.status_code, 400)
+
+    def test_scan_ignores_brackets_in_strings(self):
+        """Escapes and brackets inside strings do not change the count or depth"""
+        body = json.dumps({'tasks': [{'title': 'a[{"\\', 'meta': {'x': [1]}},
+                                     {'title': '}]]\\"'}, [{}]]}).encode()
+        self.assertEqual(scan_json(body, 5), (3, True))
+        self.assertEqual(scan_json(body, 4), (3, False))
+        self.assertEqual(scan_json(b'{"a": [}', 32)[1], False)
+        self.assertEqual(scan_json(b'[{]}', 32)[1], False)
+
+    def test_scan_counts_alternating_nesting_exactly(self):
+        """Arrays and objects nested in turn count one level each"""
+        def nested(levels):
+            return b'[{"a":' * (levels // 2) + b'1' + b'}]' * (levels // 2)
+        self.assertEqual(scan_json(nested(32), 32), (16, True))
+        self.assertEqual(scan_json(nested(34), 32), (17, False))
+        self.assertEqual(scan_json(b'[{"a":' * 30 + b'1' + b'}]' * 30, 32), (30, False))
+        response = self.analyze('{"tasks": ' + '[{"a":' * 16 + '1' + '}]' * 16 + '}')
+        self.assertEqual(response.status_code, 400)
+
+
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        # A score cache hit would skip the dependency graph stage
+        ScoreCache('scores').clear()
+
+    def analyze(self, query=''):
+        return self.client.post('/api/tasks/analyze/' + query,
+                                data={'tasks': make_random_tasks(30, seed=14), 'limit': 5},
+                                content_type='application/json')
+
+    def test_server_timing_and_debug_block(self):
+        """Every stage shows up in Server-Timing and the debug block"""
+        response = self.analyze('?debug=1')
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        for name in ('decode', 'validate', 'dependency_graph', 'score', 'sort',
+                     'explain', 'serialize', 'total'):
+            self.assertIn(f'{name};dur=', timing)
+        debug = response.json()['debug']
+        self.assertEqual(debug['counts'], {'tasks': 30})
+        self.assertIn('score', debug['stages_ms'])
+        self.assertNotIn('debug', self.analyze().json())
+
+    def test_metrics_endpoint_serves_histograms(self):
+        """Stage histograms are exported in Prometheus text format"""
+        self.analyze()
+        self.analyze()
+        body = self.client.get('/api/tasks/metrics/').content.decode()
+        self.assertIn('task_analyzer_stage_seconds_count{endpoint="analyze",stage="total"} 2', body)
+        self.assertIn('task_analyzer_request_tasks_bucket{endpoint="analyze",le="100"} 2', body)
+
+    def test_disabled_instrumentation_adds_nothing(self):
+        """With the setting off no header, debug block or samples appear"""
+        with self.settings(TASK_INSTRUMENTATION=False):
+            response = self.analyze('?debug=1')
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('debug', response.json())
+        self.assertNotIn('stage=', self.client.get('/api/tasks/metrics/').content.decode())
+
+
+class TaskValidationTests(TestCase):
+
+    def test_records_hold_parsed_fields(self):
+        tasks = make_random_tasks(50, seed=15)
+        records, errors = validate_tasks(tasks)
+        self.assertEqual(errors, [])
+        for task, record in zip(tasks, records):
+            self.assertIs(record.task, task)
+            if task.get('due_date'):
+                self.assertEqual(record.due,
+                                 datetime.strptime(task['due_date'], '%Y-%m-%d').toordinal())
+            else:
+                self.assertIsNone(record.due)
+            self.assertEqual(len(record.dependencies), len(task['dependencies']))
+        self.assertFalse(hasattr(records[0], '__dict__'))
+
+    def test_every_invalid_row_is_reported(self):
+        """All bad rows come back in one 400, with their index"""
+        tasks = make_random_tasks(6, seed=16)
+        tasks[1]['importance'] = '5'
+        tasks[2]['title'] = ''
+        tasks[4]['due_date'] = '26/11/2025'
+        tasks[5]['dependencies'] = 3
+        response = self.client.post('/api/tasks/analyze/', data={'tasks': tasks + [7]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [
+            {'index': 1, 'error': 'Importance must be a number'},
+            {'index': 2, 'error': 'Each task must have a title'},
+            {'index': 4, 'error': 'Due date must be YYYY-MM-DD'},
+            {'index': 5, 'error': 'Dependencies must be a list'},
+            {'index': 6, 'error': 'Each task must be an object'},
+        ])
+        self.assertEqual(response.json()['error'], 'Importance must be a number')
+
+    def test_non_finite_numbers_are_rejected(self):
+        """NaN and infinities are not numbers, in analyze batches and stored tasks"""
+        task = {'title': 'T', 'due_date': '2025-11-27'}
+        for value in (float('nan'), float('inf'), float('-inf')):
+            _, errors = validate_tasks([dict(task, importance=value), dict(task, estimated_hours=value)],
+                                       strict=False)
+            self.assertEqual([e['error'] for e in errors],
+                             ['Importance must be a number', 'Estimated hours must be a number'])
+
+        body = '{"title": "T", "due_date": "2025-11-27", "estimated_hours": %s, "importance": 5}'
+        for literal in ('NaN', 'Infinity'):
+            response = self.client.post('/api/tasks/', data=body % literal,
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+            response = self.client.post('/api/tasks/analyze/', data='{"tasks": [%s]}' % (body % literal),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(Task.objects.exists())
+
+    def test_non_object_body_is_a_client_error(self):
+        response = self.client.post('/api/tasks/analyze/', data=[1, 2],
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_records_and_dicts_rank_identically(self):
+        tasks = make_random_tasks(200, seed=17)
+        records = as_records(tasks)
+        self.assertIsInstance(records[0], TaskRecord)
+        self.assertEqual(analyze_and_sort_tasks(records, 'fastest_wins', limit=20),
+                         analyze_and_sort_tasks(tasks, 'fastest_wins', limit=20))
+        with self.assertRaises(TaskValidationError):
+            as_records([{'title': 'T', 'estimated_hours': 'two'}])
+
+
+@override_settings(TASK_POOL_CHUNK_SIZE=37, TASK_POOL_WORKERS=2)
+class ParallelAnalyzeTests(TestCase):
+
+    def test_pool_matches_inline_ranking(self):
+        """Merged chunk rankings equal the single-threaded ones, ties included"""
+        tasks = make_random_tasks(400, seed=18)
+        tasks += [dict(task, title=task['title'] + ' copy') for task in tasks[:50]]
+        records = as_records(tasks)
+        strategies = ['smart_balance', 'fastest_wins', 'deadline_driven']
+        for limit in (None, 1, 25, 1000):
+            self.assertEqual(analyze_in_pool(records, strategies, limit),
+                             analyze_with_strategies(records, strategies, limit))
+
+    @override_settings(TASK_POOL_MIN_TASKS=100)
+    async def test_async_endpoint_matches_sync_endpoint(self):
+        body = {'tasks': make_random_tasks(300, seed=19), 'strategy': 'high_impact', 'limit': 40}
+        client = AsyncClient()
+        pooled = await client.post('/api/tasks/analyze/async/', data=body,
+                                   content_type='application/json')
+        self.assertEqual(pooled.status_code, 200)
+        inline = await client.post('/api/tasks/analyze/async/',
+                                   data=dict(body, tasks=body['tasks'][:99]),
+                                   content_type='application/json')
+        self.assertEqual(inline.status_code, 200)
+
+        sync_client = self.client
+        for response, tasks in ((pooled, body['tasks']), (inline, body['tasks'][:99])):
+            expected = await sync_to_async(sync_client.post)(
+                '/api/tasks/analyze/', data=dict(body, tasks=tasks),
+                content_type='application/json')
+            self.assertEqual(response.json(), expected.json())
+
+    async def test_async_endpoint_keeps_cpu_work_off_the_loop(self):
+        """ETag hashing, parsing, scoring and serialization run in worker threads"""
+        threads = {}
+
+        def spy(function):
+            def wrapper(*args):
+                threads.setdefault(function.__name__, set()).add(threading.get_ident())
+                return function(*args)
+            return wrapper
+
+        names = ('parse_analyze_request', 'rank_inline', 'analyze_response', 'suggestion_response')
+        with contextlib.ExitStack() as stack:
+            for name in names:
+                stack.enter_context(mock.patch(f'tasks.views.{name}', spy(getattr(views, name))))
+            stack.enter_context(mock.patch('tasks.conditional.request_etag',
+                                           spy(conditional.request_etag)))
+            response = await AsyncClient().post('/api/tasks/analyze/async/',
+                                                data={'tasks': make_random_tasks(20, seed=20)},
+                                                content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            response = await AsyncClient().get('/api/tasks/suggest/async/')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(threads), set(names) | {'request_etag'})
+        self.assertNotIn(threading.get_ident(), set().union(*threads.values()))
+
+    async def test_async_suggest_and_errors(self):
+        client = AsyncClient()
+        response = await client.get('/api/tasks/suggest/async/?limit=2')
+        self.assertEqual(len(response.json()['suggestions']), 2)
+        response = await client.post('/api/tasks/analyze/async/', data={'tasks': [{}]},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((await client.get('/api/tasks/analyze/async/')).status_code, 405)
+
+
+@override_settings(TASK_JOB_WORKERS=0, TASK_JOB_CHUNK_SIZE=23, TASK_JOB_PARTIAL_SIZE=5)
+class AnalysisJobTests(TestCase):
+
+    def submit(self, **body):
+        response = self.client.post('/api/tasks/jobs/', data=body, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        return response.json()['url']
+
+    def test_results_match_synchronous_analyze(self):
+        tasks = make_random_tasks(150, seed=20)
+        url = self.submit(tasks=tasks, strategy='deadline_driven')
+        status = self.client.get(url).json()
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(status['progress'], {'processed': 150, 'total': 150, 'percent': 100.0})
+        self.assertEqual(status['result_count'], 150)
+
+        pages = []
+        next_url = url + 'results/?page_size=40'
+        while next_url:
+            page = self.client.get(next_url).json()
+            pages.extend(page['results'])
+            next_url = page['next']
+        self.assertEqual(pages, analyze_and_sort_tasks(tasks, 'deadline_driven'))
+
+        url = self.submit(tasks=tasks, limit=7)
+        results = self.client.get(url + 'results/').json()['results']
+        self.assertEqual(results, analyze_and_sort_tasks(tasks, limit=7))
+
+    def test_partial_results_while_running(self):
+        """Each chunk saves progress and the best tasks seen so far"""
+        tasks = make_random_tasks(100, seed=21)
+        seen = []
+        original = jobs.analyze_and_sort_tasks
+
+        def observe(records, *args):
+            seen.append(AnalysisJob.objects.values_list('status', 'processed', 'partial_results').get())
+            return original(records, *args)
+
+        with mock.patch.object(jobs, 'analyze_and_sort_tasks', observe):
+            self.submit(tasks=tasks)
+
+        self.assertEqual([processed for _, processed, _ in seen], [0, 23, 46, 69, 92])
+        self.assertEqual({status for status, _, _ in seen}, {'running'})
+        first_chunk = analyze_and_sort_tasks(as_records(tasks)[:23],
+                                             multipliers=DependencyIndex(tasks).multipliers[:23])
+        self.assertEqual(seen[1][2], first_chunk[:5])
+
+    def test_errors(self):
+        response = self.client.post('/api/tasks/jobs/', data={'tasks': [{'title': ''}]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        job = AnalysisJob.objects.create(strategy='smart_balance', total=3)
+        self.assertEqual(self.client.get(f'/api/tasks/jobs/{job.id}/results/').status_code, 409)
+        self.assertEqual(self.client.get(f'/api/tasks/jobs/{job.id}/').json()['status'], 'pending')
+
+        with mock.patch.object(jobs, 'dependency_index', side_effect=RuntimeError('boom')):
+            url = self.submit(tasks=make_random_tasks(5))
+        status = self.client.get(url).json()
+        self.assertEqual((status['status'], status['error']), ('failed', 'boom'))
+
+    def test_lost_workers_fail_and_old_jobs_expire(self):
+        """Quiet jobs are failed on the next poll; finished ones are deleted after the retention"""
+        now = timezone.now()
+        lost = AnalysisJob.objects.create(strategy='smart_balance', status=AnalysisJob.RUNNING,
+                                          heartbeat_at=now - timedelta(hours=1))
+        queued = AnalysisJob.objects.create(strategy='smart_balance')
+        old = AnalysisJob.objects.create(strategy='smart_balance', status=AnalysisJob.DONE,
+                                         finished_at=now - timedelta(days=2))
+        AnalysisJobResult.objects.create(job=old, rank=0, task={'title': 'T'})
+
+        status = self.client.get(f'/api/tasks/jobs/{lost.id}/').json()
+        self.assertEqual((status['status'], status['error']),
+                         ('failed', "The job's worker stopped before it finished"))
+        self.assertEqual(self.client.get(f'/api/tasks/jobs/{queued.id}/').json()['status'], 'pending')
+        self.assertEqual(self.client.get(f'/api/tasks/jobs/{old.id}/').status_code, 404)
+        self.assertFalse(AnalysisJobResult.objects.exists())
+
+        # A worker that gets to a job already failed as stale leaves it failed
+        jobs.run_job(lost.id, as_records(make_random_tasks(5)))
+        self.assertEqual(AnalysisJob.objects.get(pk=lost.id).status, 'failed')
+        self.assertEqual(jobs.expire_jobs(now + timedelta(days=2)), (1, 1))
+
+
+@override_settings(TASK_JOB_WORKERS=2, TASK_JOB_CHUNK_SIZE=50)
+class AnalysisJobWorkerTests(TransactionTestCase):
+
+    def test_job_runs_on_worker_thread(self):
+        tasks = make_random_tasks(300, seed=22)
+        response = self.client.post('/api/tasks/jobs/', data={'tasks': tasks, 'limit': 20},
+                                    content_type='application/json')
+        url = response.json()['url']
+        deadline = time.monotonic() + 30
+        while self.client.get(url).json()['status'] not in ('done', 'failed'):
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.05)
+        results = self.client.get(url + 'results/').json()['results']
+        self.assertEqual(results, analyze_and_sort_tasks(tasks, limit=20))
+
+
+class PlannerTests(TestCase):
+
+    def test_order_respects_dependencies_and_scores(self):
+        tasks = generate_tasks(2000, dependency_density=1.5, cycle_rate=0.01, seed=23)
+        plan = plan_tasks(tasks, 'smart_balance')
+        positions = [task['position'] for task in plan['order']]
+        self.assertEqual(len(positions) + len(plan['blocked']), len(tasks))
+
+        done = set()
+        scores = {task['position']: task['priority_score'] for task in plan['order']}
+        for position in positions:
+            deps = set(tasks[position - 1]['dependencies'])
+            self.assertLessEqual(deps, done)
+            done.add(position)
+
+        # Whatever was ready when a task ran scored no higher than it
+        ran = set()
+        for position in positions:
+            for other in scores:
+                if other not in ran and set(tasks[other - 1]['dependencies']) <= ran:
+                    self.assertLessEqual(scores[other], scores[position])
+            ran.add(position)
+            if len(ran) > 50:
+                break
+
+    def test_cycles_block_their_dependents(self):
+        tasks = [
+            {'title': 'A', 'estimated_hours': 2, 'dependencies': [2]},
+            {'title': 'B', 'estimated_hours': 1, 'dependencies': [1]},
+            {'title': 'C', 'estimated_hours': 1, 'dependencies': [1]},
+            {'title': 'D', 'estimated_hours': 3, 'dependencies': []},
+        ]
+        plan = plan_tasks(tasks)
+        self.assertEqual(plan['cycles'], [[1, 2]])
+        self.assertEqual(plan['blocked'], [1, 2, 3])
+        self.assertEqual([task['title'] for task in plan['order']], ['D'])
+
+    def test_critical_path_follows_longest_chain(self):
+        tasks = [
+            {'title': 'Design', 'estimated_hours': 4, 'dependencies': []},
+            {'title': 'Build', 'estimated_hours': 8, 'dependencies': [1]},
+            {'title': 'Docs', 'estimated_hours': 1, 'dependencies': [1]},
+            {'title': 'Ship', 'estimated_hours': 1, 'dependencies': [2, 3]},
+            {'title': 'Side', 'estimated_hours': 10, 'dependencies': []},
+        ]
+        plan = plan_tasks(tasks)
+        self.assertEqual(plan['critical_path'], {'hours': 13, 'positions': [1, 2, 4]})
+        ship = next(task for task in plan['order'] if task['title'] == 'Ship')
+        self.assertEqual((ship['earliest_start'], ship['earliest_finish']), (12, 13))
+
+    def test_endpoint(self):
+        tasks = make_random_tasks(40, seed=24)
+        response = self.client.post('/api/tasks/plan/', data={'tasks': tasks, 'limit': 5},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['order'], plan_tasks(tasks, limit=5)['order'])
+
+
+class DayPlanTests(TestCase):
+
+    def test_single_day_is_optimal(self):
+        """The DP finds the best subset a brute-force search finds"""
+        rng = random.Random(25)
+        for _ in range(5):
+            tasks = make_random_tasks(12, seed=rng.randrange(1000))
+            for task in tasks:
+                task['dependencies'] = []
+                task['estimated_hours'] = rng.choice([0.5, 1, 1.5, 2, 3, 4, 5])
+            plan = plan_days(tasks, [8])
+            scores = [calculate_priority_score(task) for task in tasks]
+            best = max(
+                sum(scores[i] for i in combo)
+                for size in range(len(tasks) + 1)
+                for combo in itertools.combinations(range(len(tasks)), size)
+                if sum(tasks[i]['estimated_hours'] for i in combo) <= 8
+            )
+            self.assertEqual(plan['solver'], 'dp')
+            self.assertAlmostEqual(plan['total_score'], round(best, 2), places=2)
+
+    def test_week_respects_capacity_and_dependencies(self):
+        tasks = generate_tasks(3000, dependency_density=1.0, cycle_rate=0.01, seed=26)
+        plan = plan_days(tasks, [8, 8, 6, 8, 4], start=date(2025, 11, 24))
+        self.assertEqual([day['date'] for day in plan['days']][:2], ['2025-11-24', '2025-11-25'])
+
+        done = set()
+        for day in plan['days']:
+            self.assertLessEqual(day['hours_planned'], day['hours_available'])
+            for task in day['tasks']:
+                deps = {dep for dep in task['dependencies'] if 1 <= dep <= len(tasks)}
+                self.assertLessEqual(deps, done)
+                done.add(task['position'])
+        self.assertEqual(plan['unplanned'], len(tasks) - len(done))
+
+    def test_greedy_fallback_when_out_of_time(self):
+        tasks = make_random_tasks(200, seed=27)
+        plan = plan_days(tasks, [8, 8], time_limit=0)
+        self.assertEqual(plan['solver'], 'greedy')
+        for day in plan['days']:
+            self.assertLessEqual(day['hours_planned'], 8)
+            self.assertTrue(day['tasks'])
+
+    def test_endpoint(self):
+        tasks = make_random_tasks(60, seed=28)
+        response = self.client.post('/api/tasks/schedule/',
+                                    data={'tasks': tasks, 'hours_per_day': 6, 'days': 5},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['days']), 5)
+        for body in ({'hours_per_day': 30}, {'days': 0}, {'hours_per_day': [8], 'days': 2},
+                     {'start_date': 'monday'}):
+            response = self.client.post('/api/tasks/schedule/', data=dict(body, tasks=tasks),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+
+class RankingSessionTests(TestCase):
+
+    def apply_moves(self, ranking, moves):
+        for move in moves:
+            if move['from'] is not None:
+                del ranking[move['from']]
+            if move['to'] is not None:
+                ranking.insert(move['to'], move['task'])
+
+    def test_ranked_list_tracks_ranks(self):
+        rng = random.Random(29)
+        with mock.patch.object(RankedList, 'LOAD', 4):
+            ranked, expected = RankedList(), []
+            for _ in range(2000):
+                key = (rng.randrange(50), rng.randrange(50))
+                if key in expected:
+                    self.assertEqual(ranked.remove(key), expected.index(key))
+                    expected.remove(key)
+                else:
+                    expected.append(key)
+                    expected.sort()
+                    self.assertEqual(ranked.add(key), expected.index(key))
+                self.assertEqual(len(ranked), len(expected))
+            self.assertEqual(list(ranked), expected)
+            self.assertEqual(ranked.slice(5, 17), expected[5:17])
+            self.assertEqual(ranked.rank(expected[9]), 9)
+
+    def test_initial_ranking_matches_analyze(self):
+        tasks = make_random_tasks(300, seed=30)
+        session = RankingSession(as_records(tasks), 'fastest_wins')
+        view = session.view()
+        for entry in view:
+            entry.pop('task_id')
+        self.assertEqual(view, analyze_and_sort_tasks(tasks, 'fastest_wins'))
+
+    def test_moves_replay_to_the_full_rescore(self):
+        """Replaying moves gives the same ranking as rescoring from scratch"""
+        rng = random.Random(31)
+        session = RankingSession(as_records(make_random_tasks(150, seed=32)))
+        client_view = session.view()
+        for step in range(40):
+            ids = list(session.tasks)
+            diff = {
+                'add': [dict(task, dependencies=rng.sample(ids, rng.randint(0, 2)))
+                        for task in make_random_tasks(rng.randint(0, 2), seed=step)],
+                'update': [{'task_id': pk, 'importance': rng.randint(1, 10),
+                            'dependencies': rng.sample(ids, rng.randint(0, 2))}
+                           for pk in rng.sample(ids, rng.randint(0, 2))],
+                'remove': rng.sample(ids, rng.randint(0, 1)),
+            }
+            diff['update'] = [u for u in diff['update'] if u['task_id'] not in diff['remove']]
+            self.apply_moves(client_view, session.apply(**diff))
+            self.assertEqual(client_view, session.view())
+
+        incremental = session.view()
+        session.rescore_all(session.today)
+        self.assertEqual(incremental, session.view())
+
+    def test_only_affected_tasks_move(self):
+        tasks = make_random_tasks(100, seed=33)
+        for task in tasks:
+            task['dependencies'] = []
+        session = RankingSession(as_records(tasks))
+        moves = session.apply(update=[{'task_id': 7, 'importance': 1}])
+        self.assertEqual([move['task_id'] for move in moves], [7])
+
+    def test_endpoints(self):
+        response = self.client.post('/api/tasks/rankings/',
+                                    data={'tasks': make_random_tasks(20, seed=34), 'limit': 5},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        url = f"/api/tasks/rankings/{response.json()['session']}/"
+        self.assertEqual(len(response.json()['tasks']), 5)
+
+        response = self.client.patch(url, data={'remove': [3], 'add': [{'title': 'New'}]},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([move['task_id'] for move in response.json()['moves']][0], 3)
+        self.assertEqual(self.client.get(url + '?offset=2&limit=3').json()['tasks'],
+                         self.client.get(url).json()['tasks'][2:5])
+        self.assertEqual(self.client.get(url + '?offset=0&limit=3').json()['tasks'],
+                         self.client.get(url).json()['tasks'][:3])
+        self.assertEqual(self.client.get(url + '?offset=-1').status_code, 400)
+
+        response = self.client.patch(url, data={'remove': [3], 'update': [{'task_id': 1, 'importance': 'x'}]},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()['errors']), 2)
+
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class ConditionalRequestTests(TestCase):
+
+    def post(self, body, **headers):
+        return self.client.post('/api/tasks/analyze/', data=body,
+                                content_type='application/json', **headers)
+
+    def test_analyze_etag_and_not_modified(self):
+        body = json.dumps({'tasks': make_random_tasks(30, seed=35), 'strategy': 'high_impact'})
+        first = self.post(body)
+        etag = first['ETag']
+        self.assertEqual(self.post(body)['ETag'], etag)
+
+        with mock.patch('tasks.views.analyze_and_sort_tasks') as analyze:
+            response = self.post(body, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+            self.assertEqual(self.post(body, HTTP_IF_NONE_MATCH=f'W/{etag}').status_code, 304)
+            analyze.assert_not_called()
+
+        other = json.dumps(dict(json.loads(body), strategy='fastest_wins'))
+        self.assertEqual(self.post(other, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_debug_responses_are_not_tagged(self):
+        """Debug timings change every body, so those responses carry no ETag"""
+        body = json.dumps({'tasks': make_random_tasks(5, seed=37)})
+        response = self.client.post('/api/tasks/analyze/?debug=1', data=body,
+                                    content_type='application/json', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('debug', response.json())
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_etag_changes_with_date_version_and_strategies(self):
+        body = json.dumps({'tasks': make_random_tasks(5, seed=36)})
+        etag = self.post(body)['ETag']
+        with mock.patch('tasks.conditional.SCORING_VERSION', 2):
+            self.assertNotEqual(self.post(body)['ETag'], etag)
+        with mock.patch('tasks.conditional.date') as fake_date:
+            fake_date.today.return_value = date.today() + timedelta(days=1)
+            self.assertNotEqual(self.post(body)['ETag'], etag)
+        registry.register('etag_test', {'weights': {'urgency': 1, 'importance': 0, 'effort': 0}})
+        try:
+            self.assertNotEqual(self.post(body)['ETag'], etag)
+        finally:
+            registry.unregister('etag_test')
+        self.assertEqual(self.post(body)['ETag'], etag)
+
+    def test_errors_are_not_tagged(self):
+        response = self.post(json.dumps({'tasks': [{'title': ''}]}))
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('ETag', response)
+
+    def test_suggest_cached_until_midnight(self):
+        response = self.client.get('/api/tasks/suggest/')
+        max_age = int(response['Cache-Control'].split('max-age=')[1])
+        self.assertTrue(0 < max_age <= 86400)
+        self.assertLessEqual(abs(max_age - seconds_until_rollover()), 2)
+        again = self.client.get('/api/tasks/suggest/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertIn('max-age', again['Cache-Control'])
+        self.assertNotEqual(self.client.get('/api/tasks/suggest/?limit=2')['ETag'],
+                            response['ETag'])
+
+
+class SerializationTests(TestCase):
+
+    def post(self, body, **headers):
+        return self.client.post('/api/tasks/analyze/', data=body,
+                                content_type='application/json', **headers)
+
+    def test_compact_and_projected_rankings_match_full(self):
+        tasks = make_random_tasks(60, seed=37)
+        full = self.post({'tasks': tasks, 'limit': 20}).json()['tasks']
+
+        compact = self.post({'tasks': tasks, 'limit': 20, 'format': 'compact'}).json()
+        self.assertEqual(compact['fields'], ['position', 'priority_score'])
+        self.assertEqual([tasks[position - 1]['title'] for position, _ in compact['tasks']],
+                         [task['title'] for task in full])
+        self.assertEqual([score for _, score in compact['tasks']],
+                         [task['priority_score'] for task in full])
+
+        projected = self.post({'tasks': tasks, 'limit': 20,
+                               'fields': 'title,priority_score,explanation'}).json()
+        self.assertNotIn('fields', projected)
+        self.assertEqual(projected['tasks'], [
+            {name: task[name] for name in ('title', 'priority_score', 'explanation')}
+            for task in full])
+
+        rows = self.post({'tasks': tasks, 'format': 'compact', 'fields': ['title', 'due_date'],
+                          'strategies': ['smart_balance', 'fastest_wins']}).json()
+        self.assertEqual(rows['fields'], ['title', 'due_date'])
+        self.assertEqual(len(rows['rankings']['fastest_wins']), 60)
+
+    def test_explanations_are_skipped_when_not_asked_for(self):
+        tasks = make_random_tasks(10, seed=38)
+        with mock.patch('tasks.scoring.describe_score') as describe:
+            analyze_and_sort_tasks(tasks, projection=Projection(compact=True))
+            describe.assert_not_called()
+
+    def test_pool_projection_matches_inline(self):
+        records = as_records(make_random_tasks(200, seed=39))
+        for projection in (Projection(compact=True), Projection(['title', 'explanation'])):
+            self.assertEqual(
+                analyze_in_pool(records, ['high_impact'], 50, projection=projection),
+                analyze_with_strategies(records, ['high_impact'], 50, projection=projection))
+
+    def test_invalid_projection(self):
+        for body in ({'format': 'xml'}, {'fields': []}, {'fields': [1]}, {'fields': {}}):
+            response = self.post(dict(body, tasks=[]))
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/suggest/?format=tsv').status_code, 400)
+        response = self.client.get('/api/tasks/suggest/?format=compact&limit=2')
+        self.assertEqual(len(response.json()['suggestions'][0]), 2)
+
+    @override_settings(TASK_COMPRESS_MIN_BYTES=1000)
+    def test_large_responses_are_compressed(self):
+        body = {'tasks': make_random_tasks(100, seed=40)}
+        plain = self.post(body)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        zipped = self.post(body, HTTP_ACCEPT_ENCODING='br;q=1.0, gzip;q=0.8')
+        self.assertEqual(zipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(zipped.content), plain.content)
+        self.assertLess(len(zipped.content), len(plain.content) / 3)
+        self.assertNotEqual(zipped['ETag'], plain['ETag'])
+
+        deflated = self.post(body, HTTP_ACCEPT_ENCODING='gzip;q=0, deflate')
+        self.assertEqual(deflated['Content-Encoding'], 'deflate')
+        self.assertEqual(zlib.decompress(deflated.content), plain.content)
+
+        small = self.post({'tasks': body['tasks'][:1]}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', small)
+        self.assertNotIn('Accept-Encoding', small.get('Vary', ''))
+
+    @override_settings(TASK_COMPRESS_MIN_BYTES=1000)
+    def test_debug_responses_stay_uncompressed(self):
+        response = self.client.post('/api/tasks/analyze/?debug=1',
+                                    data={'tasks': make_random_tasks(100, seed=41)},
+                                    content_type='application/json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertIn('debug', response.json())
+
+    def test_dumps_matches_stdlib(self):
+        data = {'tasks': make_random_tasks(20, seed=42), 'big': 2 ** 70, 'text': 'caf\u00e9'}
+        self.assertEqual(json.loads(dumps(data)), data)
+
+
+def reference_explanation(days_diff, imp, hours, dependency_count):
+    """describe_score as it was before the explanation table"""
+    explanations = []
+    if days_diff is not None:
+        if days_diff < 0:
+            explanations.append("OVERDUE - Critical")
+        elif days_diff == 0:
+            explanations.append("Due TODAY")
+        elif days_diff <= 2:
+            explanations.append("Due soon")
+    if imp >= 9:
+        explanations.append("Very important")
+    elif imp >= 7:
+        explanations.append("Important")
+    if hours <= 1:
+        explanations.append("Quick task")
+    elif hours >= 4:
+        explanations.append("Takes time")
+    if dependency_count:
+        explanations.append(f"Blocks {dependency_count} tasks")
+    return " + ".join(explanations) if explanations else "Balanced priority"
+
+
+class ExplanationTests(TestCase):
+
+    def post(self, body):
+        return self.client.post('/api/tasks/analyze/', data=body, content_type='application/json')
+
+    def test_table_matches_reference(self):
+        for fields in itertools.product((None, -5, -1, 0, 1, 2, 3, 30), (0, 1, 6.9, 7, 8.5, 9, 10),
+                                        (0, 0.5, 1, 1.5, 3.9, 4, 12), (0, 1, 2, 16, 17, 40)):
+            text = describe_score(*fields)
+            self.assertEqual(text, reference_explanation(*fields))
+            self.assertIs(describe_score(*fields), text)
+        self.assertIn((0, 0, 0, 40), EXPLANATIONS)
+
+    def test_explain_false_skips_explanations(self):
+        tasks = make_random_tasks(20, seed=43)
+        with mock.patch('tasks.scoring.describe_score') as describe:
+            response = self.post({'tasks': tasks, 'explain': False})
+            describe.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all('explanation' not in task for task in response.json()['tasks']))
+
+        rows = self.post({'tasks': tasks, 'format': 'compact', 'explain': True}).json()
+        self.assertEqual(rows['fields'], ['position', 'priority_score', 'explanation'])
+        self.assertEqual(self.post({'tasks': tasks, 'explain': 'yes'}).status_code, 400)
+
+        suggest = self.client.get('/api/tasks/suggest/?explain=false').json()['suggestions']
+        self.assertNotIn('explanation', suggest[0])
+        self.assertEqual(self.client.get('/api/tasks/suggest/?breakdown=2').status_code, 400)
+
+    def test_score_breakdown(self):
+        tasks = make_random_tasks(40, seed=44)
+        for strategy in STRATEGY_WEIGHTS:
+            ranked = self.post({'tasks': tasks, 'strategy': strategy, 'breakdown': True}).json()
+            for task in ranked['tasks']:
+                breakdown = task['score_breakdown']
+                self.assertEqual(set(breakdown), {'urgency', 'importance', 'effort',
+                                                  'dependency_multiplier', 'weighted'})
+                total = sum(breakdown['weighted'].values())
+                self.assertAlmostEqual(min(100, total), task['priority_score'], delta=0.03)
+
+        plain = self.post({'tasks': tasks}).json()['tasks']
+        self.assertNotIn('score_breakdown', plain[0])
+        multi = self.post({'tasks': tasks, 'strategies': ['high_impact', 'fastest_wins'],
+                           'fields': ['position'], 'breakdown': True}).json()['rankings']
+        weights = {name: multi[name][0]['score_breakdown']['weighted'] for name in multi}
+        self.assertNotEqual(weights['high_impact'], weights['fastest_wins'])
+
+    def test_pool_breakdown_matches_inline(self):
+        records = as_records(make_random_tasks(150, seed=45))
+        projection = Projection(['title'], breakdown=True)
+        strategies = ['smart_balance', 'deadline_driven']
+        self.assertEqual(analyze_in_pool(records, strategies, 30, projection=projection),
+                         analyze_with_strategies(records, strategies, 30, projection=projection))
+
+
+class PaginationTests(TestCase):
+
+    def setUp(self):
+        rankings.clear()
+        tasks = make_random_tasks(300, seed=46)
+        self.tasks = tasks + [dict(task, title=task['title'] + ' copy') for task in tasks[:40]]
+
+    def post(self, body):
+        return self.client.post('/api/tasks/analyze/', data=body, content_type='application/json')
+
+    def walk(self, first, **extra):
+        pages = [self.post(first).json()]
+        while pages[-1]['next_cursor']:
+            response = self.post(dict(extra, cursor=pages[-1]['next_cursor']))
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.json())
+        return pages
+
+    def test_pages_concatenate_to_the_full_ranking(self):
+        full = self.post({'tasks': self.tasks, 'strategy': 'fastest_wins'}).json()['tasks']
+        with mock.patch('tasks.pagination.score_records', wraps=score_records) as scored:
+            pages = self.walk({'tasks': self.tasks, 'strategy': 'fastest_wins', 'page_size': 70},
+                              page_size=70)
+            self.assertEqual(scored.call_count, 1)
+        self.assertEqual([len(page['tasks']) for page in pages], [70, 70, 70, 70, 60])
+        self.assertTrue(all(page['total'] == 340 for page in pages))
+        self.assertEqual([task for page in pages for task in page['tasks']], full)
+
+        # Resending the tasks rescores them once the cached ranking is gone
+        cursor = pages[1]['next_cursor']
+        rankings.clear()
+        again = self.post({'tasks': self.tasks, 'cursor': cursor, 'page_size': 70}).json()
+        self.assertEqual(again['tasks'], pages[2]['tasks'])
+
+    def test_compact_pages(self):
+        pages = self.walk({'tasks': self.tasks, 'page_size': 100, 'format': 'compact'},
+                          format='compact')
+        rows = [row for page in pages for row in page['tasks']]
+        self.assertEqual(pages[0]['fields'], ['position', 'priority_score'])
+        self.assertEqual(sorted(position for position, _ in rows), list(range(1, 341)))
+
+    def test_cursor_errors(self):
+        first = self.post({'tasks': self.tasks, 'page_size': 10}).json()
+        cursor = first['next_cursor']
+
+        self.assertEqual(self.post({'cursor': 'not a cursor'}).status_code, 400)
+        self.assertEqual(self.post({'tasks': self.tasks[:5], 'cursor': cursor}).status_code, 400)
+        self.assertEqual(self.post({'tasks': self.tasks, 'page_size': 0}).status_code, 400)
+        self.assertEqual(self.post({'tasks': self.tasks, 'page_size': 5, 'limit': 5}).status_code, 400)
+
+        yesterday = encode_cursor(50.0, 3, 'smart_balance', date.today() - timedelta(days=1),
+                                  'digest')
+        self.assertEqual(self.post({'cursor': yesterday}).status_code, 410)
+        rankings.clear()
+        self.assertEqual(self.post({'cursor': cursor}).status_code, 410)
+
+    def test_stored_tasks_keyset_pages(self):
+        for task in make_random_tasks(25, seed=47):
+            task.setdefault('due_date', date.today().isoformat())
+            task['dependencies'] = []
+            response = self.client.post('/api/tasks/', data=task, content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+        full = self.client.get('/api/tasks/top/?limit=100&strategy=high_impact').json()
+        self.assertIsNone(full['next_cursor'])
+
+        pages = [self.client.get('/api/tasks/top/?limit=4&strategy=high_impact').json()]
+        while pages[-1]['next_cursor']:
+            pages.append(self.client.get('/api/tasks/top/?limit=4&cursor=' +
+                                         pages[-1]['next_cursor']).json())
+        self.assertEqual(len(pages), 7)
+        self.assertTrue(all(page['strategy'] == 'high_impact' for page in pages))
+        self.assertEqual([task for page in pages for task in page['tasks']], full['tasks'])
+
+        analyzed = self.post({'tasks': self.tasks, 'page_size': 3}).json()['next_cursor']
+        self.assertEqual(self.client.get('/api/tasks/top/?cursor=' + analyzed).status_code, 400)
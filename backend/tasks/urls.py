@@ -4,4 +4,20 @@ from . import views
 urlpatterns = [ 
     path("tasks/analyze/", views.analyze_tasks, name="analyze_tasks"), 
     path("tasks/suggest/", views.suggest_tasks, name="suggest_tasks"), 
+    path("tasks/analyze/async/", views.analyze_tasks_async, name="analyze_tasks_async"),
+    path("tasks/suggest/async/", views.suggest_tasks_async, name="suggest_tasks_async"),
+    path("tasks/", views.task_collection, name="task_collection"),
+    path("tasks/<int:pk>/", views.task_detail, name="task_detail"),
+    path("tasks/import/", views.task_import, name="task_import"),
+    path("tasks/top/", views.top_tasks, name="top_tasks"),
+    path("tasks/plan/", views.task_plan, name="task_plan"),
+    path("tasks/schedule/", views.task_schedule, name="task_schedule"),
+    path("tasks/rankings/", views.ranking_sessions, name="ranking_sessions"),
+    path("tasks/rankings/<str:key>/", views.ranking_session_detail, name="ranking_session_detail"),
+    path("tasks/jobs/", views.analysis_jobs, name="analysis_jobs"),
+    path("tasks/jobs/<uuid:job_id>/", views.analysis_job_detail, name="analysis_job_detail"),
+    path("tasks/jobs/<uuid:job_id>/results/", views.analysis_job_results, name="analysis_job_results"),
+    path("tasks/strategies/", views.strategy_list, name="strategy_list"),
+    path("tasks/metrics/", views.metrics_view, name="metrics"),
+    path("tasks/cache/stats/", views.score_cache_stats, name="score_cache_stats"),
 ] 
@@ -0,0 +1,127 @@
+import math
+from datetime import datetime
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def task_error(task):
+    """Return the validation message for a task, or None when it is usable"""
+    if not task.get('title'):
+        return "Each task must have a title"
+    if task.get('importance') and (task['importance'] < 1 or task['importance'] > 10):
+        return "Importance must be between 1-10"
+    if task.get('estimated_hours') and task['estimated_hours'] < 0:
+        return "Estimated hours cannot be negative"
+    return None
+
+
+class TaskRecord:
+    """The scoring fields of one validated task.
+
+    ``due`` is the due date as a proleptic ordinal (None without one), so
+    scoring subtracts integers instead of parsing dates. ``task`` is the
+    original dict, only read back when a task is returned.
+    """
+
+    __slots__ = ('task', 'due', 'importance', 'hours', 'dependencies')
+
+    def __init__(self, task, due, importance, hours, dependencies):
+        self.task = task
+        self.due = due
+        self.importance = importance
+        self.hours = hours
+        self.dependencies = dependencies
+
+
+class TaskValidationError(ValueError):
+    """One or more tasks failed validation; ``errors`` lists them by index"""
+
+    def __init__(self, errors):
+        super().__init__(errors[0]['error'])
+        self.errors = errors
+
+
+def is_number(value):
+    """An int or a finite float; bools, NaN and infinities are not numbers here"""
+    if isinstance(value, float):
+        return math.isfinite(value)
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def task_record(task, dates, strict=True):
+    """Validate one task; returns ``(record, None)`` or ``(None, message)``.
+
+    ``dates`` maps due date strings to ordinals and is shared across a
+    batch, so each distinct date is parsed once. Without ``strict`` only
+    the field types are checked; a missing title or out-of-range numbers
+    are scored as they are, like the scoring functions always have.
+    """
+    if not isinstance(task, dict):
+        return None, "Each task must be an object"
+    if strict and not task.get('title'):
+        return None, "Each task must have a title"
+
+    importance = task.get('importance')
+    if importance is None:
+        importance = 5
+    elif not is_number(importance):
+        return None, "Importance must be a number"
+    elif strict and importance and (importance < 1 or importance > 10):
+        return None, "Importance must be between 1-10"
+
+    hours = task.get('estimated_hours')
+    if hours is None:
+        hours = 0
+    elif not is_number(hours):
+        return None, "Estimated hours must be a number"
+    elif strict and hours < 0:
+        return None, "Estimated hours cannot be negative"
+
+    due = task.get('due_date')
+    if not due:
+        due = None
+    else:
+        ordinal = dates.get(due) if isinstance(due, str) else None
+        if ordinal is None:
+            try:
+                ordinal = datetime.strptime(due, DATE_FORMAT).toordinal()
+            except (TypeError, ValueError):
+                return None, "Due date must be YYYY-MM-DD"
+            dates[due] = ordinal
+        due = ordinal
+
+    dependencies = task.get('dependencies')
+    if dependencies is None:
+        dependencies = []
+    elif not isinstance(dependencies, list):
+        return None, "Dependencies must be a list"
+
+    return TaskRecord(task, due, importance, hours, dependencies), None
+
+
+def validate_tasks(tasks, strict=True):
+    """Validate a whole batch in one pass.
+
+    Returns the records of the valid tasks and an ``{"index", "error"}``
+    entry for every invalid one, so a client sees all problems at once.
+    """
+    records = []
+    errors = []
+    dates = {}
+    for index, task in enumerate(tasks):
+        record, error = task_record(task, dates, strict)
+        if error:
+            errors.append({"index": index, "error": error})
+        else:
+            records.append(record)
+    return records, errors
+
+
+def as_records(tasks):
+    """Records for a task list, type-checking plain dicts; raises TaskValidationError"""
+    if not tasks or isinstance(tasks[0], TaskRecord):
+        return tasks
+    records, errors = validate_tasks(tasks, strict=False)
+    if errors:
+        raise TaskValidationError(errors)
+    return records
@@ -1,90 +1,762 @@
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
+from datetime import date, datetime
 import json
-from .scoring import analyze_and_sort_tasks
+from . import jobs, store
+from .cache import get_score_cache
+from .conditional import conditional
+from .db import read_alias
+from .instrumentation import current_timer, instrumented, metrics, stage
+from .models import AnalysisJob, Task
+from .pagination import CursorError, CursorExpired, analyze_page, decode_cursor, encode_cursor
+from .parallel import analyze_in_pool_async, use_pool
+from .planner import plan_days, plan_tasks
+from .rankings import RankingSession, sessions
+from .scoring import analyze_and_sort_tasks, analyze_with_strategies
+from .serializers import dumps, json_response, parse_projection
+from .strategies import registry
+from .streaming import NDJSON_CONTENT_TYPE, StreamError, stream_scored_tasks, top_scored_tasks
+from .validation import TaskValidationError, is_number, task_error, task_record, validate_tasks
+
+def parse_limit(value):
+    """Positive integer limit from a request value; None means no limit"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError("Limit must be a positive integer")
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("Limit must be a positive integer")
+    if limit < 1:
+        raise ValueError("Limit must be a positive integer")
+    return limit
+
+def parse_offset(value):
+    """Non-negative integer offset from a request value; missing means 0"""
+    if value is None or value == '':
+        return 0
+    try:
+        offset = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("Offset must be a non-negative integer")
+    if offset < 0:
+        raise ValueError("Offset must be a non-negative integer")
+    return offset
+
+def parse_analyze_request(request):
+    """Decode and validate an analyze body.
+
+    Returns ``(options, None)`` with the validated records, strategy,
+    strategies, limit, projection and page, or ``(None, response)`` for a
+    bad request. ``page`` is None unless a ``cursor`` or ``page_size`` asks
+    for one page of the ranking.
+    """
+    try:
+        with stage("decode"):
+            data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return None, JsonResponse({"error": "Invalid JSON"}, status=400)
+    if not isinstance(data, dict):
+        return None, JsonResponse({"error": "Request body must be a JSON object"}, status=400)
+    tasks = data.get('tasks', [])
+    strategy = data.get('strategy', 'smart_balance')
+
+    # Validate tasks data
+    if not isinstance(tasks, list):
+        return None, JsonResponse({"error": "Tasks must be a list"}, status=400)
+
+    try:
+        limit = parse_limit(data.get('limit'))
+        projection = parse_projection(data.get('fields'), data.get('format'),
+                                      data.get('explain'), data.get('breakdown'))
+    except ValueError as e:
+        return None, JsonResponse({"error": str(e)}, status=400)
+
+    # Validate every task in one pass and report all bad rows
+    with stage("validate"):
+        records, errors = validate_tasks(tasks)
+    if errors:
+        return None, JsonResponse({"error": errors[0]["error"], "errors": errors}, status=400)
+    current_timer().count("tasks", len(records))
+
+    # Several strategies in one pass: a list of names or "all"
+    strategies = data.get('strategies')
+    if strategies is not None:
+        if strategies == "all":
+            strategies = registry.names()
+        if (not isinstance(strategies, list) or not strategies or
+                any(name not in registry for name in strategies)):
+            return None, JsonResponse({"error": "Strategies must be \"all\" or a list of known strategies"}, status=400)
+    elif strategy not in registry:
+        return None, JsonResponse({"error": f"Unknown strategy: {strategy}"}, status=400)
+
+    page = None
+    if 'cursor' in data or 'page_size' in data:
+        if limit is not None or strategies is not None:
+            return None, JsonResponse({"error": "Pages rank a single strategy and take page_size instead of limit"}, status=400)
+        try:
+            page_size = parse_limit(data.get('page_size'))
+        except ValueError:
+            return None, JsonResponse({"error": "page_size must be a positive integer"}, status=400)
+        try:
+            cursor = data.get('cursor')
+            cursor = None if cursor is None else decode_cursor(cursor)
+        except CursorError as e:
+            return None, JsonResponse({"error": str(e)}, status=400)
+        page = {
+            "cursor": cursor,
+            "size": min(page_size or getattr(settings, "TASK_PAGE_SIZE", 100), 1000),
+            # Without tasks the ranking can only come from the cache
+            "tasks": tasks if 'tasks' in data else None,
+        }
+
+    return {"records": records, "strategy": strategy, "strategies": strategies, "limit": limit,
+            "projection": projection, "page": page, "data": data}, None
+
+def rank_inline(options):
+    """Rankings by strategy, scored in this thread"""
+    records, limit, projection = options["records"], options["limit"], options["projection"]
+    if options["strategies"] is not None:
+        return analyze_with_strategies(records, options["strategies"], limit, projection=projection)
+    # Analyze and sort tasks
+    strategy = options["strategy"]
+    return {strategy: analyze_and_sort_tasks(records, strategy, limit, cache=get_score_cache(),
+                                             projection=projection)}
+
+def page_response(request, options):
+    """One page of a single-strategy ranking, with ``next_cursor`` for the next"""
+    page = options["page"]
+    try:
+        # The cached ranking keeps the scores, so the score cache is not read
+        body = analyze_page(options["records"], page["tasks"], options["strategy"], page["size"],
+                            page["cursor"], projection=options["projection"])
+    except CursorExpired as e:
+        return JsonResponse({"error": str(e)}, status=410)
+    except CursorError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    with stage("serialize"):
+        if options["projection"].compact:
+            body["fields"] = options["projection"].fields
+        return json_response(request, body)
+
+def analyze_response(request, options, rankings):
+    with stage("serialize"):
+        if options["strategies"] is not None:
+            body = {
+                "strategies": options["strategies"],
+                "rankings": rankings
+            }
+        else:
+            body = {
+                "strategy": options["strategy"],
+                "tasks": rankings[options["strategy"]]
+            }
+        if options["projection"].compact:
+            body["fields"] = options["projection"].fields
+        return json_response(request, body)
 
 @csrf_exempt
+@instrumented("analyze")
+@conditional()
 def analyze_tasks(request):
+    if request.method == "POST" and request.content_type == NDJSON_CONTENT_TYPE:
+        return analyze_tasks_stream(request)
+
     if request.method == "POST":
         try:
-            data = json.loads(request.body)
-            tasks = data.get('tasks', [])
-            strategy = data.get('strategy', 'smart_balance')
-            
-            # Validate tasks data
-            if not isinstance(tasks, list):
-                return JsonResponse({"error": "Tasks must be a list"}, status=400)
-            
-            # Validate each task has required fields
-            for task in tasks:
-                if not task.get('title'):
-                    return JsonResponse({"error": "Each task must have a title"}, status=400)
-                if task.get('importance') and (task['importance'] < 1 or task['importance'] > 10):
-                    return JsonResponse({"error": "Importance must be between 1-10"}, status=400)
-                if task.get('estimated_hours') and task['estimated_hours'] < 0:
-                    return JsonResponse({"error": "Estimated hours cannot be negative"}, status=400)
-            
-            # Analyze and sort tasks
-            analyzed_tasks = analyze_and_sort_tasks(tasks, strategy)
-            
-            return JsonResponse({
-                "strategy": strategy,
-                "tasks": analyzed_tasks
-            })
-            
-        except json.JSONDecodeError:
-            return JsonResponse({"error": "Invalid JSON"}, status=400)
+            options, error = parse_analyze_request(request)
+            if error:
+                return error
+            if options["page"] is not None:
+                return page_response(request, options)
+            return analyze_response(request, options, rank_inline(options))
+
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
     
     return JsonResponse({"error": "Method not allowed"}, status=405)
 
+@instrumented("analyze_async")
+@conditional()
+async def analyze_tasks_async(request):
+    """Async analyze for ASGI servers.
+
+    Batches of at least ``TASK_POOL_MIN_TASKS`` tasks are split into
+    chunks scored in the process pool while the event loop keeps serving
+    other requests; smaller ones are scored in a worker thread, as are
+    parsing, pages and serialization, so the loop never runs CPU work.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed"}, status=405)
+    if request.content_type == NDJSON_CONTENT_TYPE:
+        return JsonResponse({"error": "Use /api/tasks/analyze/ for NDJSON uploads"}, status=415)
+
+    try:
+        options, error = await sync_to_async(parse_analyze_request, thread_sensitive=False)(request)
+        if error:
+            return error
+        if options["page"] is not None:
+            return await sync_to_async(page_response, thread_sensitive=False)(request, options)
+        if use_pool(len(options["records"])):
+            strategies = options["strategies"] or [options["strategy"]]
+            rankings = await analyze_in_pool_async(options["records"], strategies,
+                                                   options["limit"],
+                                                   projection=options["projection"])
+        else:
+            rankings = await sync_to_async(rank_inline, thread_sensitive=False)(options)
+        return await sync_to_async(analyze_response, thread_sensitive=False)(request, options, rankings)
+
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+# csrf_exempt wraps views in a sync function before Django 5.0
+analyze_tasks_async.csrf_exempt = True
+
+def analyze_tasks_stream(request):
+    """NDJSON mode: one task per line in, one scored task per line out.
+
+    Options come from the query string since the body holds only tasks.
+    With ``limit`` the whole upload is read and the best tasks returned
+    ranked, with cycle-aware multipliers as in JSON mode whenever the
+    bounded candidate heap holds the winners; otherwise tasks are scored
+    and sent back as they arrive, from their own dependency counts only.
+    ``X-Cycle-Aware`` tells the client which it got.
+    """
+    strategy = request.GET.get('strategy', 'smart_balance')
+    if strategy not in registry:
+        return JsonResponse({"error": f"Unknown strategy: {strategy}"}, status=400)
+    try:
+        limit = parse_limit(request.GET.get('limit'))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    if limit is None:
+        response = StreamingHttpResponse(stream_scored_tasks(request, strategy),
+                                         content_type=NDJSON_CONTENT_TYPE)
+        response['X-Cycle-Aware'] = 'false'
+        return response
+
+    try:
+        ranked, cycle_aware = top_scored_tasks(request, limit, strategy)
+    except StreamError as e:
+        return JsonResponse({"error": str(e), "line": e.line}, status=e.status)
+
+    response = StreamingHttpResponse((dumps(task) + b"\n" for task in ranked),
+                                     content_type=NDJSON_CONTENT_TYPE)
+    response['X-Cycle-Aware'] = 'true' if cycle_aware else 'false'
+    return response
+
+@csrf_exempt
+@instrumented("plan")
+def task_plan(request):
+    """Dependency-respecting execution order with the critical path and cycles"""
+    if request.method == "POST":
+        options, error = parse_analyze_request(request)
+        if error:
+            return error
+        if options["strategies"] is not None:
+            return JsonResponse({"error": "The planner uses a single strategy"}, status=400)
+
+        plan = plan_tasks(options["records"], options["strategy"], limit=options["limit"])
+        with stage("serialize"):
+            return json_response(request, plan)
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+def parse_hours_per_day(data):
+    """Hours available on each planned day, from ``hours_per_day`` and ``days``"""
+    hours = data.get('hours_per_day', 8)
+    days = data.get('days')
+    if isinstance(hours, list):
+        if days is not None or not 1 <= len(hours) <= 366:
+            raise ValueError("hours_per_day must list 1-366 days, without days")
+    else:
+        days = 1 if days is None else days
+        if isinstance(days, bool) or not isinstance(days, int) or not 1 <= days <= 366:
+            raise ValueError("days must be an integer between 1-366")
+        hours = [hours] * days
+    if any(isinstance(h, bool) or not isinstance(h, (int, float)) or not 0 <= h <= 24
+           for h in hours):
+        raise ValueError("hours_per_day must be between 0-24")
+    return hours
+
+@csrf_exempt
+@instrumented("schedule")
+def task_schedule(request):
+    """Plan a day or week: the best tasks that fit the hours available each day"""
+    if request.method == "POST":
+        options, error = parse_analyze_request(request)
+        if error:
+            return error
+        if options["strategies"] is not None:
+            return JsonResponse({"error": "The planner uses a single strategy"}, status=400)
+
+        data = options["data"]
+        try:
+            hours_per_day = parse_hours_per_day(data)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        start = data.get('start_date')
+        if start is not None:
+            try:
+                start = datetime.strptime(start, '%Y-%m-%d').date()
+            except (TypeError, ValueError):
+                return JsonResponse({"error": "start_date must be YYYY-MM-DD"}, status=400)
+
+        time_limit = data.get('time_limit_ms')
+        if time_limit is not None:
+            try:
+                time_limit = min(parse_limit(time_limit), 10000) / 1000
+            except ValueError:
+                return JsonResponse({"error": "time_limit_ms must be a positive integer"}, status=400)
+
+        plan = plan_days(options["records"], hours_per_day, options["strategy"], start, time_limit)
+        with stage("serialize"):
+            return json_response(request, plan)
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+# Sample tasks for demonstration
+SAMPLE_TASKS = [
+    {
+        "title": "Complete urgent client request",
+        "due_date": "2025-11-26",
+        "estimated_hours": 2,
+        "importance": 9,
+        "dependencies": []
+    },
+    {
+        "title": "Fix critical bug in production", 
+        "due_date": "2025-11-26",
+        "estimated_hours": 3,
+        "importance": 10,
+        "dependencies": [1]
+    },
+    {
+        "title": "Prepare weekly team report",
+        "due_date": "2025-11-27", 
+        "estimated_hours": 1,
+        "importance": 7,
+        "dependencies": []
+    },
+    {
+        "title": "Research new technology",
+        "due_date": "2025-12-05",
+        "estimated_hours": 4,
+        "importance": 6,
+        "dependencies": []
+    }
+]
+
+def suggestion_response(request):
+    try:
+        limit = parse_limit(request.GET.get('limit', 3))
+        projection = parse_projection(request.GET.get('fields'), request.GET.get('format'),
+                                      request.GET.get('explain'), request.GET.get('breakdown'))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    try:
+        # Analyze and get the top tasks (3 by default)
+        top_tasks = analyze_and_sort_tasks(SAMPLE_TASKS, "smart_balance", limit,
+                                           projection=projection)
+        body = {
+            "message": f"Top {limit} suggested tasks for today",
+            "suggestions": top_tasks,
+            "strategy": "smart_balance"
+        }
+        if projection.compact:
+            body["fields"] = projection.fields
+        return json_response(request, body)
+        
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+@instrumented("suggest")
+@conditional(cache_until_midnight=True)
 def suggest_tasks(request):
     if request.method == "GET":
+        return suggestion_response(request)
+    
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+@instrumented("suggest_async")
+@conditional(cache_until_midnight=True)
+async def suggest_tasks_async(request):
+    if request.method == "GET":
+        return await sync_to_async(suggestion_response, thread_sensitive=False)(request)
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+def score_cache_stats(request):
+    if request.method == "GET":
+        cache = get_score_cache()
+        if cache is None:
+            return JsonResponse({"error": "Score cache is disabled"}, status=404)
+        return JsonResponse(cache.stats())
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+def strategy_list(request):
+    if request.method == "GET":
+        return JsonResponse({"strategies": {
+            strategy.name: strategy.weights for strategy in registry
+        }})
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+def metrics_view(request):
+    if request.method == "GET":
+        return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4")
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+TASK_FIELDS = ('title', 'due_date', 'estimated_hours', 'importance', 'dependencies', 'project')
+
+def request_owner(request):
+    """Whose task collection a request uses: the signed-in user's.
+
+    ``X-Task-Owner`` is only believed from a reverse proxy listed in
+    ``TASK_OWNER_HEADER_PROXIES``, which authenticates users itself; from
+    anyone else it is ignored, as any client could claim any owner.
+    Other requests share the anonymous collection.
+    """
+    if request.user.is_authenticated:
+        return request.user.get_username()
+    if request.META.get("REMOTE_ADDR") in getattr(settings, "TASK_OWNER_HEADER_PROXIES", ()):
+        return request.headers.get("X-Task-Owner", "").strip()[:150]
+    return ""
+
+def parse_project(value):
+    if not isinstance(value, str) or len(value) > 100:
+        raise ValueError("project must be a string of at most 100 characters")
+    return value
+
+def parse_task_fields(data, task=None, owner=""):
+    """Validate a stored-task payload; a partial update when ``task`` is given"""
+    if not isinstance(data, dict):
+        raise ValueError("Task must be an object")
+
+    fields = {name: data[name] for name in TASK_FIELDS if name in data}
+    if task is None:
+        missing = [name for name in TASK_FIELDS[:4] if name not in fields]
+        if missing:
+            raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+    merged = dict(store.task_as_dict(task) if task else {}, **fields)
+    for name in ('estimated_hours', 'importance'):
+        if name in fields and not is_number(fields[name]):
+            raise ValueError(f"{name} must be a number")
+    error = task_error(merged)
+    if error:
+        raise ValueError(error)
+
+    if 'due_date' in fields:
         try:
-            # Sample tasks for demonstration
-            sample_tasks = [
-                {
-                    "title": "Complete urgent client request",
-                    "due_date": "2025-11-26",
-                    "estimated_hours": 2,
-                    "importance": 9,
-                    "dependencies": []
-                },
-                {
-                    "title": "Fix critical bug in production", 
-                    "due_date": "2025-11-26",
-                    "estimated_hours": 3,
-                    "importance": 10,
-                    "dependencies": [1]
-                },
-                {
-                    "title": "Prepare weekly team report",
-                    "due_date": "2025-11-27", 
-                    "estimated_hours": 1,
-                    "importance": 7,
-                    "dependencies": []
-                },
-                {
-                    "title": "Research new technology",
-                    "due_date": "2025-12-05",
-                    "estimated_hours": 4,
-                    "importance": 6,
-                    "dependencies": []
-                }
-            ]
-            
-            # Analyze and get top 3 tasks
-            analyzed_tasks = analyze_and_sort_tasks(sample_tasks, "smart_balance")
-            top_3_tasks = analyzed_tasks[:3]
-            
-            return JsonResponse({
-                "message": "Top 3 suggested tasks for today",
-                "suggestions": top_3_tasks,
-                "strategy": "smart_balance"
+            fields['due_date'] = datetime.strptime(fields['due_date'], '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            raise ValueError("due_date must be YYYY-MM-DD")
+
+    if 'dependencies' in fields:
+        dependencies = fields['dependencies']
+        if not isinstance(dependencies, list) or not all(
+                isinstance(dep, int) and not isinstance(dep, bool) for dep in dependencies):
+            raise ValueError("dependencies must be a list of task ids")
+        if len(set(dependencies)) != len(dependencies):
+            raise ValueError("dependencies must not repeat a task")
+        # Only tasks in the same collection can be depended on
+        known = set(Task.objects.filter(owner=owner, id__in=dependencies)
+                    .values_list('id', flat=True))
+        unknown = [dep for dep in dependencies if dep not in known]
+        if unknown:
+            raise ValueError(f"Unknown dependencies: {unknown}")
+
+    if 'project' in fields:
+        parse_project(fields['project'])
+
+    return fields
+
+def parse_import(data):
+    """Rows for ``store.import_tasks`` from an import body; raises TaskValidationError.
+
+    Tasks use the analyze format: all four scoring fields are required
+    and ``dependencies`` are 1-based positions within the import.
+    """
+    tasks = data.get('tasks')
+    if not isinstance(tasks, list):
+        raise TaskValidationError([{"index": None, "error": "Tasks must be a list"}])
+    rows = []
+    errors = []
+    dates = {}
+    for index, task in enumerate(tasks):
+        record, error = task_record(task, dates)
+        if error is None:
+            missing = [name for name in TASK_FIELDS[:4] if task.get(name) is None]
+            if missing:
+                error = f"Missing fields: {', '.join(missing)}"
+            elif not all(type(dep) is int and 1 <= dep <= len(tasks)
+                         for dep in record.dependencies):
+                error = "Dependencies must be positions of tasks in the import"
+            elif len(set(record.dependencies)) != len(record.dependencies):
+                error = "dependencies must not repeat a task"
+        if error:
+            errors.append({"index": index, "error": error})
+            continue
+        rows.append({
+            "title": task['title'],
+            "due_date": date.fromordinal(record.due),
+            "estimated_hours": record.hours,
+            "importance": record.importance,
+            "dependencies": record.dependencies,
+        })
+    if errors:
+        raise TaskValidationError(errors)
+    return rows
+
+def stored_task_response(task, status=200):
+    scores = dict(task.scores.values_list('strategy', 'priority_score'))
+    return JsonResponse(dict(store.task_as_dict(task), priority_scores=scores), status=status)
+
+@csrf_exempt
+def task_collection(request):
+    owner = request_owner(request)
+    if request.method == "GET":
+        tasks = Task.objects.using(read_alias()).filter(owner=owner)
+        if request.GET.get('project') is not None:
+            tasks = tasks.filter(project=request.GET['project'])
+        tasks = [store.task_as_dict(task) for task in store.with_dependencies(tasks).order_by('id')]
+        return json_response(request, {"tasks": tasks})
+
+    if request.method == "POST":
+        try:
+            fields = parse_task_fields(json.loads(request.body), owner=owner)
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        task = store.save_task(Task(owner=owner), fields)
+        return stored_task_response(task, status=201)
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+@csrf_exempt
+def task_import(request):
+    """Create a whole backlog in one request, in batches inside one transaction"""
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+        if not isinstance(data, dict):
+            return JsonResponse({"error": "Request body must be a JSON object"}, status=400)
+        try:
+            project = parse_project(data.get('project', ''))
+            rows = parse_import(data)
+        except TaskValidationError as e:
+            return JsonResponse({"error": str(e), "errors": e.errors}, status=400)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        ids = store.import_tasks(rows, request_owner(request), project)
+        return json_response(request, {"created": len(ids), "project": project, "ids": ids},
+                             status=201)
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+@csrf_exempt
+def task_detail(request, pk):
+    owner = request_owner(request)
+    task = get_object_or_404(Task, pk=pk, owner=owner)
+
+    if request.method == "GET":
+        return stored_task_response(task)
+
+    if request.method in ("PUT", "PATCH"):
+        try:
+            data = json.loads(request.body)
+            fields = parse_task_fields(data, None if request.method == "PUT" else task, owner)
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        if request.method == "PUT":
+            fields.setdefault('dependencies', [])
+        store.save_task(task, fields)
+        return stored_task_response(task)
+
+    if request.method == "DELETE":
+        store.delete_task(task)
+        return HttpResponse(status=204)
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+def top_tasks(request):
+    """Best stored tasks, browsed with keyset cursors over the score index"""
+    if request.method == "GET":
+        today = date.today()
+        strategy = request.GET.get('strategy', 'smart_balance')
+        after = None
+        if request.GET.get('cursor') is not None:
+            try:
+                score, task_id, strategy, day, ranking = decode_cursor(request.GET['cursor'])
+            except CursorError as e:
+                return JsonResponse({"error": str(e)}, status=400)
+            if ranking != "stored":
+                return JsonResponse({"error": "Cursor does not belong to the stored tasks"}, status=400)
+            if day != today.isoformat():
+                return JsonResponse({"error": "Cursor is from an earlier day; scores have changed since"}, status=410)
+            after = (score, task_id)
+        if strategy not in registry:
+            return JsonResponse({"error": f"Unknown strategy: {strategy}"}, status=400)
+        try:
+            limit = parse_limit(request.GET.get('limit', 10))
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        # One extra row tells whether another page follows
+        ranked = store.top_tasks(strategy, limit + 1, today, after, request_owner(request),
+                                 request.GET.get('project'))
+        next_cursor = None
+        if len(ranked) > limit:
+            ranked = ranked[:limit]
+            last = ranked[-1]
+            next_cursor = encode_cursor(last["priority_score"], last["id"], strategy, today, "stored")
+        return json_response(request, {
+            "strategy": strategy,
+            "tasks": ranked,
+            "next_cursor": next_cursor
+        })
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+@csrf_exempt
+def analysis_jobs(request):
+    """Queue an analyze request; the response points at the job to poll"""
+    if request.method == "POST":
+        options, error = parse_analyze_request(request)
+        if error:
+            return error
+        if options["strategies"] is not None:
+            return JsonResponse({"error": "Jobs rank a single strategy"}, status=400)
+
+        jobs.expire_jobs()
+        job = jobs.submit_job(options["records"], options["strategy"], options["limit"])
+        response = JsonResponse({
+            "id": str(job.id),
+            "status": job.status,
+            "url": f"/api/tasks/jobs/{job.id}/"
+        }, status=202)
+        response["Location"] = f"/api/tasks/jobs/{job.id}/"
+        return response
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+def analysis_job_detail(request, job_id):
+    jobs.expire_jobs()
+    job = get_object_or_404(AnalysisJob, pk=job_id)
+
+    if request.method == "GET":
+        return JsonResponse(jobs.job_status(job))
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+def analysis_job_results(request, job_id):
+    jobs.expire_jobs()
+    job = get_object_or_404(AnalysisJob, pk=job_id)
+
+    if request.method == "GET":
+        if job.status != AnalysisJob.DONE:
+            return JsonResponse({"error": f"Job is {job.status}", "status": job.status}, status=409)
+        try:
+            page = parse_limit(request.GET.get('page', 1))
+            page_size = min(parse_limit(request.GET.get('page_size', 100)), 1000)
+        except ValueError:
+            return JsonResponse({"error": "page and page_size must be positive integers"}, status=400)
+
+        total = job.results.count()
+        has_next = page * page_size < total
+        return json_response(request, {
+            "id": str(job.id),
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "next": f"/api/tasks/jobs/{job.id}/results/?page={page + 1}&page_size={page_size}" if has_next else None,
+            "results": jobs.job_results(job, page, page_size)
+        })
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+@csrf_exempt
+def ranking_sessions(request):
+    """Start a server-side ranking that later requests edit with diffs"""
+    if request.method == "POST":
+        options, error = parse_analyze_request(request)
+        if error:
+            return error
+        if options["strategies"] is not None:
+            return JsonResponse({"error": "A ranking session uses a single strategy"}, status=400)
+
+        session = RankingSession(options["records"], options["strategy"])
+        key = sessions.create(session)
+        return json_response(request, {
+            "session": key,
+            "strategy": options["strategy"],
+            "size": len(session.ranking),
+            "tasks": session.view(0, options["limit"])
+        }, status=201)
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
+
+@csrf_exempt
+def ranking_session_detail(request, key):
+    session = sessions.get(key)
+    if session is None:
+        return JsonResponse({"error": "Unknown or expired session"}, status=404)
+
+    if request.method == "GET":
+        try:
+            offset = parse_offset(request.GET.get('offset'))
+            limit = parse_limit(request.GET.get('limit'))
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        with session.lock:
+            session.refresh()
+            return json_response(request, {
+                "session": key,
+                "size": len(session.ranking),
+                "tasks": session.view(offset, None if limit is None else offset + limit)
             })
-            
-        except Exception as e:
-            return JsonResponse({"error": str(e)}, status=500)
-    
-    return JsonResponse({"error": "Method not allowed"}, status=405)
\ No newline at end of file
+
+    if request.method in ("POST", "PATCH"):
+        try:
+            diff = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+        if not isinstance(diff, dict) or any(
+                not isinstance(diff.get(op, []), list) for op in ("add", "update", "remove")):
+            return JsonResponse({"error": "add, update and remove must be lists"}, status=400)
+
+        with session.lock:
+            reset = session.refresh()
+            try:
+                moves = session.apply(diff.get("add", []), diff.get("update", []),
+                                      diff.get("remove", []))
+            except TaskValidationError as e:
+                return JsonResponse({"error": str(e), "errors": e.errors}, status=400)
+            if reset:
+                # A new day changes every urgency score; send the whole ranking
+                return json_response(request, {"session": key, "size": len(session.ranking),
+                                               "reset": True, "tasks": session.view()})
+            return json_response(request, {"session": key, "size": len(session.ranking),
+                                           "moves": moves})
+
+    if request.method == "DELETE":
+        sessions.delete(key)
+        return HttpResponse(status=204)
+
+    return JsonResponse({"error": "Method not allowed"}, status=405)
@@ -2,6 +2,9 @@
 let tasks = [];
 let editingIndex = -1; // -1 means not editing, otherwise index of task being edited
 let completedTasks = [];
+const PAGE_SIZE = 50; // Results are fetched a page at a time
+let nextCursor = null;
+let shownResults = 0;
 
 // DOM Content Loaded
 document.addEventListener('DOMContentLoaded', function() {
@@ -227,7 +230,8 @@ async function analyzeTasks() {
             },
             body: JSON.stringify({
                 tasks: tasks,
-                strategy: strategy
+                strategy: strategy,
+                page_size: PAGE_SIZE
             })
         });
         
@@ -237,6 +241,7 @@ async function analyzeTasks() {
         
         const data = await response.json();
         displayResults(data.tasks);
+        showNextPageButton(data.next_cursor);
         showNotification('Tasks analyzed successfully!', 'success');
         
     } catch (error) {
@@ -248,16 +253,75 @@ async function analyzeTasks() {
     }
 }
 
+// Fetch the next page of the current ranking
+async function loadMoreResults() {
+    if (!nextCursor) {
+        return;
+    }
+
+    try {
+        let response = await fetch('http://127.0.0.1:8000/api/tasks/analyze/', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ cursor: nextCursor, page_size: PAGE_SIZE })
+        });
+
+        // The server dropped the ranking; send the tasks again with the cursor
+        if (response.status === 410) {
+            response = await fetch('http://127.0.0.1:8000/api/tasks/analyze/', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ tasks: tasks, cursor: nextCursor, page_size: PAGE_SIZE })
+            });
+        }
+
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        const data = await response.json();
+        displayResults(data.tasks, true);
+        showNextPageButton(data.next_cursor);
+
+    } catch (error) {
+        console.error('Error loading more results:', error);
+        showNotification(`Failed to load more results: ${error.message}`, 'error');
+    }
+}
+
+// Show a "Load more" button while the ranking has more pages
+function showNextPageButton(cursor) {
+    nextCursor = cursor;
+    const existing = document.getElementById('loadMore');
+    if (existing) {
+        existing.remove();
+    }
+    if (cursor) {
+        document.getElementById('results').insertAdjacentHTML('beforeend',
+            '<button id="loadMore" onclick="loadMoreResults()" class="analyze-btn">Load more</button>');
+    }
+}
+
 // Display analysis results
-function displayResults(analyzedTasks) {
+function displayResults(analyzedTasks, append = false) {
     const resultsElement = document.getElementById('results');
     
-    if (analyzedTasks.length === 0) {
+    if (!append) {
+        shownResults = 0;
+    }
+    if (analyzedTasks.length === 0 && !append) {
         resultsElement.innerHTML = '<p>No tasks to display</p>';
         return;
     }
     
-    resultsElement.innerHTML = analyzedTasks.map((task, index) => {
+    const offset = shownResults;
+    shownResults += analyzedTasks.length;
+    const html = analyzedTasks.map((task, position) => {
+        const index = offset + position;
         const priorityClass = getPriorityClass(task.priority_score);
         const priorityBadge = getPriorityBadge(task.priority_score);
         
@@ -296,6 +360,12 @@ function displayResults(analyzedTasks) {
             </div>
         `;
     }).join('');
+
+    if (append) {
+        resultsElement.insertAdjacentHTML('beforeend', html);
+    } else {
+        resultsElement.innerHTML = html;
+    }
 }
 
 // Get priority class based on score